@@ -3,6 +3,7 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.shortcuts import get_object_or_404, redirect, render
+from myshop.db_routers import replica_reads
 from orders.models import Order
 from .forms import UserUpdateForm
 
@@ -31,13 +32,15 @@ def register(request):
     return render(request, "registration/register.html", {"form": form})
 
 @login_required
+@replica_reads()
 def dashboard(request):
-    orders = request.user.orders.order_by("-created")
+    orders = request.user.orders.order_by("-created").prefetch_related("items")
     return render(request, "accounts/dashboard.html", {"orders": orders})
 
 @login_required
+@replica_reads()
 def order_detail(request, pk):
-    order = get_object_or_404(Order, pk=pk, user=request.user)
+    order = get_object_or_404(Order.objects.prefetch_related("items__product"), pk=pk, user=request.user)
     return render(request, "accounts/order_detail.html", {"order": order})
 
 @login_required
@@ -0,0 +1,13 @@
+"""
+Micro-benchmarks for helpers on the request/checkout hot path.
+
+    python -m benchmarks                    # run everything, print a table
+    python -m benchmarks -k cart --save     # only cart.*, append to history
+    python -m benchmarks --compare          # diff against the last saved run
+
+Benchmarks run against a throwaway test database filled with seeded
+synthetic data, at several sizes each. Saved runs are appended to
+benchmarks/results/history.jsonl (one JSON object per benchmark/size)
+together with the git commit, so slowdowns can be traced to a change.
+Numbers are only comparable between runs on the same machine.
+"""
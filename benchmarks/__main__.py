@@ -0,0 +1,62 @@
+"""python -m benchmarks --help"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("-k", dest="pattern", default="", help="only benchmarks whose name contains this")
+    parser.add_argument("--sizes", type=lambda s: tuple(int(x) for x in s.split(",")),
+                        help="comma-separated sizes overriding each benchmark's defaults")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing loop")
+    parser.add_argument("--save", action="store_true", help="append results to the history file")
+    parser.add_argument("--compare", action="store_true", help="diff against the last saved run")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="slowdown that counts as a regression with --compare (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myshop.settings")
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from . import cases  # noqa: F401  (registers the benchmarks)
+    from .harness import REGISTRY, last_run, run, save
+
+    names = [n for n in REGISTRY if args.pattern in n]
+    previous = last_run() if args.compare else {}
+
+    setup_test_environment()  # DEBUG off, locmem email; like the test suite
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    results, regressed = [], False
+    try:
+        print(f"{'benchmark':<34}{'size':>6}{'median µs':>14}{'min µs':>12}{'loops':>8}")
+        for result in run(names, seed=args.seed, repeat=args.repeat, min_time=args.min_time, sizes=args.sizes):
+            results.append(result)
+            line = f"{result.name:<34}{result.size:>6}{result.median_us:>14.2f}{result.min_us:>12.2f}{result.loops:>8}"
+            before = previous.get((result.name, result.size))
+            if before:
+                change = (result.median_us - before["median_us"]) / before["median_us"]
+                line += f"   {change:+.0%} vs {before['commit'] or 'last run'}"
+                if change > args.tolerance:
+                    line += "  << slower"
+                    regressed = True
+            print(line, flush=True)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    if args.save:
+        save(results)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
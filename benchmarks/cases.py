@@ -0,0 +1,145 @@
+"""
+The benchmarks. Each one sets up seeded synthetic data for its size and
+returns the call to time. Import order matters only for the table.
+"""
+from __future__ import annotations
+
+import string
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib import admin
+
+from cart.cart import Cart
+from cart.forms import CartAddProductForm
+from myshop.metrics import CART_ADDS, WEBHOOKS
+from orders.admin import export_to_csv
+from orders.forms import UK_POSTCODE_PATTERN, normalize_uk_postcode
+from orders.models import Order
+from shop.models import Category, Product, Team
+
+from .harness import bench
+
+LISTING_SIZES = (10, 100, 1000)
+
+
+class _Session(dict):
+    modified = False
+
+
+class _Request:
+    def __init__(self, cart):
+        self.session = _Session({settings.CART_SESSION_ID: cart})
+
+
+def _products(n: int) -> list[Product]:
+    """At least n saved products (created on demand, reused across benchmarks)."""
+    have = Product.objects.count()
+    if have < n:
+        category, _ = Category.objects.get_or_create(slug="bench", defaults={"name": "Bench"})
+        team, _ = Team.objects.get_or_create(name="Bench FC")
+        Product.objects.bulk_create(
+            Product(category=category, team=team, name=f"Shirt {i}", slug=f"shirt-{i}", price=Decimal("49.99"))
+            for i in range(have, n)
+        )
+    return list(Product.objects.order_by("id")[:n])
+
+
+def _cart_dict(products, rng) -> dict:
+    return {
+        str(p.id): {"quantity": rng.randint(1, 5), "price": str(p.price)}
+        for p in products
+    }
+
+
+def _postcode(rng) -> str:
+    letters = "ABCDEFGHJKLMNOPRSTUWYZ"
+    outward = rng.choice(["SW1A", "M1", "B33", "CR2", "DN55", "EC1A", "W1A", "LS10"])
+    inward = f"{rng.randint(0, 9)}{rng.choice(letters)}{rng.choice(letters)}"
+    sep = rng.choice(["", " ", "  "])
+    return (outward + sep + inward).lower() if rng.random() < 0.3 else outward + sep + inward
+
+
+# --- cart ---
+
+@bench("cart.iter", sizes=(1, 10, 50))
+def cart_iter(size, rng):
+    request = _Request(_cart_dict(_products(size), rng))
+    return lambda: list(Cart(request))
+
+
+@bench("cart.get_total_price", sizes=(1, 10, 50))
+def cart_total(size, rng):
+    request = _Request(_cart_dict(_products(size), rng))
+    return lambda: Cart(request).get_total_price()
+
+
+@bench("cart.add_product_form")
+def cart_add_form(size, rng):
+    data = {"quantity": str(rng.randint(1, 20)), "override": "False"}
+    return lambda: CartAddProductForm(data).is_valid()
+
+
+# --- checkout ---
+
+@bench("orders.normalize_uk_postcode", sizes=(100, 1000))
+def postcode_normalize(size, rng):
+    codes = [_postcode(rng) for _ in range(size)]
+    return lambda: [normalize_uk_postcode(c) for c in codes]
+
+
+@bench("orders.UK_POSTCODE_PATTERN", sizes=(100, 1000))
+def postcode_pattern(size, rng):
+    codes = [_postcode(rng) for _ in range(size)]
+    # a few typos so the failure path is measured too
+    codes += ["".join(rng.choices(string.ascii_uppercase + string.digits, k=7)) for _ in range(size // 10)]
+    match = UK_POSTCODE_PATTERN.match
+    return lambda: [match(c) for c in codes]
+
+
+@bench("orders.get_stripe_url", sizes=(100, 1000))
+def stripe_url(size, rng):
+    prefixes = ("pi_", "cs_test_", "ch_", "")
+    orders = [
+        Order(id=i, stripe_id=rng.choice(prefixes) + "".join(rng.choices(string.ascii_letters, k=24)) if i % 5 else "")
+        for i in range(size)
+    ]
+    return lambda: [o.get_stripe_url() for o in orders]
+
+
+# --- admin / listings ---
+
+@bench("orders.export_to_csv", sizes=LISTING_SIZES)
+def csv_export(size, rng):
+    have = Order.objects.count()
+    if have < size:
+        Order.objects.bulk_create(
+            Order(
+                first_name=rng.choice(["Ann", "Bob", "Cat", "Dev"]), last_name="Bench",
+                email=f"bench{i}@example.com", address=f"{i} Bench Street",
+                postal_code=normalize_uk_postcode(_postcode(rng)), city="London",
+                paid=rng.random() < 0.8,
+            )
+            for i in range(have, size)
+        )
+    model_admin = admin.site._registry[Order]
+    queryset = Order.objects.order_by("id")[:size]
+    return lambda: export_to_csv(model_admin, None, queryset.all())
+
+
+@bench("shop.product_get_absolute_url", sizes=LISTING_SIZES)
+def product_urls(size, rng):
+    products = [Product(id=i + 1, slug=f"retro-shirt-{rng.randint(1, 10**6)}") for i in range(size)]
+    return lambda: [p.get_absolute_url() for p in products]
+
+
+# --- metrics ---
+
+@bench("metrics.counter_inc")
+def counter_inc(size, rng):
+    return CART_ADDS.inc
+
+
+@bench("metrics.labelled_counter_inc")
+def labelled_counter_inc(size, rng):
+    return lambda: WEBHOOKS.labels("checkout.session.completed", "paid").inc()
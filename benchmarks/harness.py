@@ -0,0 +1,98 @@
+"""Registry, timing and result history for the benchmark suite."""
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+HISTORY = Path(__file__).resolve().parent / "results" / "history.jsonl"
+
+REGISTRY: dict[str, "Benchmark"] = {}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    sizes: tuple[int, ...]
+    make: object  # make(size, rng) -> zero-arg callable to time
+
+
+def bench(name: str, sizes=(1,)):
+    """
+    Register a benchmark. The decorated function gets (size, rng), does its
+    setup untimed, and returns the zero-argument callable that is measured.
+    """
+    def decorator(make):
+        REGISTRY[name] = Benchmark(name, tuple(sizes), make)
+        return make
+    return decorator
+
+
+@dataclass
+class Result:
+    name: str
+    size: int
+    median_us: float
+    min_us: float
+    loops: int
+    repeat: int
+
+
+def measure(fn, repeat=5, min_time=0.2) -> tuple[float, float, int]:
+    """(median, min) seconds per call, using timeit's autorange for the loop count."""
+    timer = timeit.Timer(fn)
+    loops, elapsed = timer.autorange()
+    loops = max(1, int(min_time / (elapsed / loops)))
+    runs = [t / loops for t in timer.repeat(repeat=repeat, number=loops)]
+    return statistics.median(runs), min(runs), loops
+
+
+def run(names, seed=0, repeat=5, min_time=0.2, sizes=None):
+    """Yield a Result per (benchmark, size); `sizes` overrides each benchmark's own."""
+    import random
+
+    for name in names:
+        benchmark = REGISTRY[name]
+        for size in sizes or benchmark.sizes:
+            fn = benchmark.make(size, random.Random(f"{seed}:{name}:{size}"))
+            median, best, loops = measure(fn, repeat=repeat, min_time=min_time)
+            yield Result(name, size, round(median * 1e6, 3), round(best * 1e6, 3), loops, repeat)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=HISTORY.parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def save(results, path=HISTORY):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "ts": int(time.time()),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+    }
+    with path.open("a") as fh:
+        for result in results:
+            fh.write(json.dumps({**meta, **asdict(result)}, sort_keys=True) + "\n")
+
+
+def last_run(path=HISTORY) -> dict[tuple[str, int], dict]:
+    """The most recent saved result for every (name, size)."""
+    latest = {}
+    if path.exists():
+        for line in path.read_text().splitlines():
+            if line.strip():
+                row = json.loads(line)
+                latest[(row["name"], row["size"])] = row
+    return latest
@@ -0,0 +1,38 @@
+import random
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, TestCase
+
+from benchmarks import cases  # noqa: F401  (registers the benchmarks)
+from benchmarks.harness import REGISTRY, Result, last_run, measure, save
+
+
+class BenchmarkCasesTests(TestCase):
+    def test_every_benchmark_runs_at_its_smallest_size(self):
+        self.assertIn("cart.iter", REGISTRY)
+        for name, benchmark in REGISTRY.items():
+            with self.subTest(name):
+                fn = benchmark.make(min(benchmark.sizes), random.Random(0))
+                fn()
+
+    def test_cart_iter_sees_seeded_items(self):
+        fn = REGISTRY["cart.iter"].make(10, random.Random(0))
+        self.assertEqual(len(fn()), 10)
+
+
+class HarnessTests(SimpleTestCase):
+    def test_measure_returns_per_call_times(self):
+        median, best, loops = measure(lambda: None, repeat=2, min_time=0.01)
+        self.assertGreater(loops, 1)
+        self.assertLessEqual(best, median)
+
+    def test_history_keeps_latest_result_per_benchmark(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "history.jsonl"
+            save([Result("x", 10, 5.0, 4.0, 100, 5)], path)
+            save([Result("x", 10, 7.0, 6.0, 100, 5), Result("y", 1, 1.0, 1.0, 10, 5)], path)
+            latest = last_run(path)
+        self.assertEqual(latest[("x", 10)]["median_us"], 7.0)
+        self.assertIn(("y", 1), latest)
+        self.assertIn("commit", latest[("x", 10)])
@@ -4,14 +4,25 @@ from django.conf import settings
 from shop.models import Product
 
 
+def _line_key(product_id, variant_id=None) -> str:
+    # one line per product, or per size for products that have sizes
+    return f"{product_id}:{variant_id}" if variant_id else str(product_id)
+
+
+def _product_id(key: str) -> str:
+    return key.partition(":")[0]
+
+
 class Cart:
     def __init__(self, request):
         """Initialize the cart stored in the session."""
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # an empty cart isn't written to the session: a visitor who never adds
+        # anything doesn't get a session row (see cart/sessions)
+        self.cart = self.session.get(settings.CART_SESSION_ID) or {}
+        # Product rows fetched by __iter__, reused by later passes over the same
+        # cart in one request (the header total, the cart table, the checkout)
+        self._products = {}
 
     def __iter__(self):
         """
@@ -20,19 +31,23 @@ class Cart:
         are removed from the session to avoid template/url errors.
         """
         cart_copy = self.cart.copy()
-        product_ids = list(cart_copy.keys())
 
         # attach products that still exist
-        products = Product.objects.filter(id__in=product_ids)
-        for product in products:
-            cart_copy[str(product.id)]["product"] = product
+        missing = [pid for pid in self.product_ids() if pid not in self._products]
+        if missing:
+            for product in Product.objects.filter(id__in=missing):
+                self._products[str(product.id)] = product
+        for key in cart_copy:
+            pid = _product_id(key)
+            if pid in self._products:
+                cart_copy[key]["product"] = self._products[pid]
 
         # prune orphans (no Product attached)
-        stale_keys = [pid for pid, data in cart_copy.items() if "product" not in data]
+        stale_keys = [key for key, data in cart_copy.items() if "product" not in data]
         if stale_keys:
-            for pid in stale_keys:
-                self.cart.pop(pid, None)
-                cart_copy.pop(pid, None)
+            for key in stale_keys:
+                self.cart.pop(key, None)
+                cart_copy.pop(key, None)
             self.save()
 
         # yield normalized items
@@ -45,31 +60,41 @@ class Cart:
         """Count all items in the cart."""
         return sum(item["quantity"] for item in self.cart.values())
 
-    def add(self, product, quantity=1, override_quantity=False):
-        """Add a product to the cart or update its quantity."""
-        pid = str(product.id)
-        if pid not in self.cart:
-            self.cart[pid] = {"quantity": 0, "price": str(product.price)}
+    def product_ids(self) -> list[str]:
+        """Ids of the products in the cart (a product in two sizes is listed once)."""
+        return list(dict.fromkeys(_product_id(key) for key in self.cart))
+
+    def add(self, product, quantity=1, override_quantity=False, variant=None):
+        """Add a product (in the given size, if it has sizes) to the cart or update its quantity."""
+        key = _line_key(product.id, variant and variant.id)
+        if key not in self.cart:
+            self.cart[key] = {"quantity": 0, "price": str(product.price)}
+            if variant is not None:
+                self.cart[key].update(variant=variant.id, size=variant.size)
         if override_quantity:
-            self.cart[pid]["quantity"] = quantity
+            self.cart[key]["quantity"] = quantity
         else:
-            self.cart[pid]["quantity"] += quantity
+            self.cart[key]["quantity"] += quantity
         self.save()
 
     def save(self):
-        """Mark the session as modified to ensure it is saved."""
+        """Store the cart in the session (or drop it once empty) and mark it modified."""
+        if self.cart:
+            self.session[settings.CART_SESSION_ID] = self.cart
+        else:
+            self.session.pop(settings.CART_SESSION_ID, None)
         self.session.modified = True
 
-    def remove(self, product):
-        """Remove a product from the cart."""
-        pid = str(product.id)
-        if pid in self.cart:
-            del self.cart[pid]
+    def remove(self, product, variant_id=None):
+        """Remove a product (or one size of it) from the cart."""
+        key = _line_key(product.id, variant_id)
+        if key in self.cart:
+            del self.cart[key]
             self.save()
 
     def clear(self):
         """Remove cart entirely from the session."""
-        self.session.pop(settings.CART_SESSION_ID, None)
+        self.cart = {}
         self.save()
 
     def get_total_price(self):
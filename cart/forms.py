@@ -13,3 +13,20 @@ class CartAddProductForm(forms.Form):
         initial=False,
         widget=forms.HiddenInput,
     )
+    variant = forms.TypedChoiceField(
+        choices=(),
+        coerce=int,
+        empty_value=None,
+        required=False,
+        label="Size",
+        widget=forms.HiddenInput,
+    )
+
+    def __init__(self, *args, variants=(), **kwargs):
+        """`variants`: the product's sizes still in stock; when it has sizes one must be picked."""
+        super().__init__(*args, **kwargs)
+        if variants:
+            field = self.fields["variant"]
+            field.choices = [(variant.id, variant.size) for variant in variants]
+            field.required = True
+            field.widget = forms.Select(choices=field.choices)
@@ -0,0 +1,93 @@
+# cart/sessions/__init__.py
+"""
+Session engines that only persist sessions worth keeping.
+
+Django writes a session as soon as anything touches it. Here a session is
+treated as empty, so it is neither saved nor given a cookie, until it holds one
+of SESSION_PERSIST_KEYS: a cart, an order in checkout, a login or a flash
+message. Anonymous browsing then costs no session write at all.
+
+    SESSION_ENGINE = "cart.sessions.cached_db"   # or db, cache, signed_cookies
+    SESSION_SERIALIZER = "cart.sessions.CompactJSONSerializer"
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import VALID_KEY_CHARS
+from django.core.signing import JSONSerializer
+from django.utils.crypto import get_random_string
+
+DEFAULT_PERSIST_KEYS = ("order_id", "_auth_user_id", "_messages")
+
+
+def persist_keys():
+    return getattr(
+        settings,
+        "SESSION_PERSIST_KEYS",
+        (getattr(settings, "CART_SESSION_ID", "cart"), *DEFAULT_PERSIST_KEYS),
+    )
+
+
+class SelectivePersistenceMixin:
+    """Mixed into a SessionStore: empty unless it holds a key worth persisting."""
+
+    def is_empty(self):
+        if super().is_empty():
+            return True
+        if not hasattr(self, "_session_cache"):
+            # not loaded this request; don't load it just to answer
+            return False
+        return not any(key in self._session_cache for key in persist_keys())
+
+    def _get_new_session_key(self):
+        # Django looks the random key up first, one query per new session; create()
+        # saves with must_create and retries on the (vanishingly rare) collision anyway
+        return get_random_string(32, VALID_KEY_CHARS)
+
+
+class CompactJSONSerializer(JSONSerializer):
+    """
+    JSON with the cart packed as [[product_id, quantity, price_pence], ...]
+    instead of {"<id>": {"quantity": q, "price": "p"}}, roughly halving its
+    size; a line for one size of a product adds [..., variant_id, size].
+    Sessions written by the plain JSONSerializer load unchanged.
+    """
+
+    def dumps(self, obj):
+        key = getattr(settings, "CART_SESSION_ID", "cart")
+        cart = obj.get(key)
+        if isinstance(cart, dict):
+            obj = {**obj, key: [_pack(pid, item) for pid, item in cart.items()]}
+        return super().dumps(obj)
+
+    def loads(self, data):
+        obj = super().loads(data)
+        key = getattr(settings, "CART_SESSION_ID", "cart")
+        cart = obj.get(key) if isinstance(obj, dict) else None
+        if isinstance(cart, list):
+            obj[key] = dict(_unpack(row) for row in cart)
+        return obj
+
+
+def _pack(pid, item):
+    pid = int(pid) if str(pid).isdigit() else pid
+    price = item["price"]
+    try:
+        pence = Decimal(price) * 100
+        if pence == pence.to_integral_value():
+            price = int(pence)
+    except (InvalidOperation, TypeError):
+        pass
+    if "variant" in item:
+        return [int(str(pid).partition(":")[0]), item["quantity"], price, item["variant"], item["size"]]
+    return [pid, item["quantity"], price]
+
+
+def _unpack(row):
+    pid, quantity, price, *variant = row
+    if isinstance(price, int):
+        price = str(Decimal(price).scaleb(-2))
+    if variant:
+        variant_id, size = variant
+        return f"{pid}:{variant_id}", {"quantity": quantity, "price": price, "variant": variant_id, "size": size}
+    return str(pid), {"quantity": quantity, "price": price}
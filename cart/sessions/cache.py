@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.cache import SessionStore as _SessionStore
+
+from . import SelectivePersistenceMixin
+
+
+class SessionStore(SelectivePersistenceMixin, _SessionStore):
+    pass
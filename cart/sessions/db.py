@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.db import SessionStore as _SessionStore
+
+from . import SelectivePersistenceMixin
+
+
+class SessionStore(SelectivePersistenceMixin, _SessionStore):
+    pass
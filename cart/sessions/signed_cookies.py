@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.signed_cookies import SessionStore as _SessionStore
+
+from . import SelectivePersistenceMixin
+
+
+class SessionStore(SelectivePersistenceMixin, _SessionStore):
+    pass
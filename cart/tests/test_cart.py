@@ -101,9 +101,9 @@ class CartTests(TestCase):
         self.cart.clear()
         self.assertNotIn("cart", self.request.session)
 
-        # Re-create a Cart: __init__ will create an empty cart key again
+        # Re-create a Cart: an empty cart isn't written back to the session
         fresh_cart = Cart(self.request)
-        self.assertIn("cart", self.request.session)
+        self.assertNotIn("cart", self.request.session)
         self.assertEqual(fresh_cart.cart, {})
         self.assertEqual(len(fresh_cart), 0)
         self.assertTrue(self.request.session.modified)
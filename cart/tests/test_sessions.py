@@ -0,0 +1,129 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.signing import JSONSerializer
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cart.sessions import CompactJSONSerializer
+from cart.sessions.db import SessionStore
+from shop.models import Category, Product, Team
+
+
+@override_settings(SESSION_ENGINE="cart.sessions.db", CART_SESSION_ID="cart")
+class SelectivePersistenceTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        team = Team.objects.create(name="Team")
+        self.product = Product.objects.create(
+            category=cat, name="Prod", slug="prod", price=Decimal("9.99"), available=True, team=team
+        )
+
+    def test_browsing_without_a_cart_stores_no_session(self):
+        self.client.get(reverse("shop:product_list"))
+        self.client.get(reverse("shop:product_detail", args=[self.product.id, self.product.slug]))
+        self.client.get(reverse("cart:cart_detail"))
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertNotIn("sessionid", self.client.cookies)
+
+    def test_adding_to_the_cart_persists_the_session(self):
+        self.client.post(reverse("cart:cart_add", args=[self.product.id]), {"quantity": 2})
+        session = Session.objects.get()
+        self.assertEqual(
+            session.get_decoded()["cart"],
+            {str(self.product.id): {"quantity": 2, "price": "9.99"}},
+        )
+
+    def test_login_persists_the_session(self):
+        user = User.objects.create_user("shopper", password="pw")
+        self.client.force_login(user)
+        self.client.get(reverse("shop:product_list"))
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_emptying_the_cart_drops_the_cookie(self):
+        url = reverse("cart:cart_add", args=[self.product.id])
+        self.client.post(url, {"quantity": 1})
+        response = self.client.post(reverse("cart:cart_remove", args=[self.product.id]))
+        self.assertEqual(response.cookies["sessionid"].value, "")
+
+    def test_a_clashing_new_key_is_retried(self):
+        Session.objects.create(session_key="k" * 32, session_data="", expire_date=timezone.now())
+        store = SessionStore()
+        with patch("cart.sessions.get_random_string", side_effect=["k" * 32, "n" * 32]):
+            store.create()
+        self.assertEqual(store.session_key, "n" * 32)
+        self.assertEqual(Session.objects.count(), 2)
+
+
+@override_settings(SESSION_ENGINE="cart.sessions.signed_cookies", CART_SESSION_ID="cart")
+class SignedCookieSessionTests(TestCase):
+    def test_cart_round_trips_through_the_cookie(self):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        product = Product.objects.create(
+            category=cat, name="Prod", slug="prod", price=Decimal("10.00"), available=True,
+            team=Team.objects.create(name="Team"),
+        )
+        self.client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 3})
+        self.assertEqual(self.client.session["cart"], {str(product.id): {"quantity": 3, "price": "10.00"}})
+        self.assertEqual(Session.objects.count(), 0)
+
+
+@override_settings(CART_SESSION_ID="cart")
+class CompactJSONSerializerTests(SimpleTestCase):
+    session = {
+        "cart": {str(i): {"quantity": i % 5 + 1, "price": f"{i}.99"} for i in range(1, 21)},
+        "order_id": 7,
+    }
+
+    def test_round_trip(self):
+        serializer = CompactJSONSerializer()
+        self.assertEqual(serializer.loads(serializer.dumps(self.session)), self.session)
+
+    def test_smaller_than_plain_json(self):
+        compact = CompactJSONSerializer().dumps(self.session)
+        plain = JSONSerializer().dumps(self.session)
+        self.assertLess(len(compact), len(plain) * 0.6)
+
+    def test_reads_sessions_written_by_the_plain_serializer(self):
+        plain = JSONSerializer().dumps(self.session)
+        self.assertEqual(CompactJSONSerializer().loads(plain), self.session)
+
+    def test_sized_lines_round_trip(self):
+        session = {"cart": {
+            "3:12": {"quantity": 2, "price": "50.00", "variant": 12, "size": "XL"},
+            "4": {"quantity": 1, "price": "4.99"},
+        }}
+        serializer = CompactJSONSerializer()
+        self.assertEqual(serializer.loads(serializer.dumps(session)), session)
+
+    def test_prices_that_are_not_whole_pence_are_kept_as_strings(self):
+        session = {"cart": {"1": {"quantity": 1, "price": "0.125"}}}
+        serializer = CompactJSONSerializer()
+        self.assertEqual(serializer.loads(serializer.dumps(session)), session)
+
+
+class ClearExpiredSessionsTests(TestCase):
+    def test_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"old{i:05}", session_data="", expire_date=now - timedelta(days=1)) for i in range(25)]
+            + [Session(session_key="live", session_data="", expire_date=now + timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command("clear_expired_sessions", batch_size=10, stdout=out)
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["live"])
+        self.assertIn("Deleted 25 expired sessions in 3 batch(es)", out.getvalue())
+
+    def test_max_batches_stops_early(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f"old{i:05}", session_data="", expire_date=now - timedelta(days=1)) for i in range(25)
+        )
+        call_command("clear_expired_sessions", batch_size=10, max_batches=1, stdout=StringIO())
+        self.assertEqual(Session.objects.count(), 15)
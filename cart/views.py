@@ -1,5 +1,9 @@
+from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
+from myshop.metrics import CART_ADDS
+from myshop.ratelimit import ratelimit
+from shop import drops, inventory
 from shop.models import Product
 
 from .cart import Cart
@@ -7,25 +11,37 @@ from .forms import CartAddProductForm
 
 
 @require_POST
+@ratelimit("cart")
 def cart_add(request, product_id):
+    if drops.needs_admission(request, [product_id]):
+        return redirect("shop:drop_waiting", product_id)
     cart = Cart(request)
-    product = get_object_or_404(Product, id=product_id)
-    form = CartAddProductForm(request.POST)
+    # the sizes with the product joined in: one query for a product with sizes
+    sizes = inventory.variants_for(product_id, with_product=True)
+    product = sizes[0].product if sizes else get_object_or_404(Product, id=product_id)
+    in_stock = {variant.id: variant for variant in sizes if variant.available > 0}
+    if sizes and not in_stock:
+        messages.error(request, f"Sorry, {product.name} has sold out.")
+        return redirect(product)
+    form = CartAddProductForm(request.POST, variants=in_stock.values())
     if form.is_valid():
         cd = form.cleaned_data
         cart.add(
             product=product,
             quantity=cd['quantity'],
             override_quantity=cd['override'],
+            variant=in_stock.get(cd['variant']),
         )
+        CART_ADDS.inc()
     return redirect('cart:cart_detail')
 
 
 @require_POST
+@ratelimit("cart")
 def cart_remove(request, product_id):
     cart = Cart(request)
     product = get_object_or_404(Product, id=product_id)
-    cart.remove(product)
+    cart.remove(product, request.POST.get('variant'))
     return redirect('cart:cart_detail')
 
 
@@ -33,6 +49,6 @@ def cart_detail(request):
     cart = Cart(request)
     for item in cart:
         item['update_quantity_form'] = CartAddProductForm(
-            initial={'quantity': item['quantity'], 'override': True}
+            initial={'quantity': item['quantity'], 'override': True, 'variant': item.get('variant')}
         )
     return render(request, 'cart/detail.html', {'cart': cart})
\ No newline at end of file
@@ -0,0 +1,26 @@
+# gunicorn.conf.py (gunicorn reads it from the working directory)
+"""
+The web dyno runs several gunicorn workers, each with its own Prometheus
+counters. Point them all at one multiprocess directory so /metrics adds up
+every worker rather than reporting whichever one answered the scrape.
+prometheus_client reads PROMETHEUS_MULTIPROC_DIR at import, so it is set
+here, in the master, before any worker loads the app.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "myshop-prometheus"))
+
+
+def on_starting(server):
+    # files left by a previous run would be counted again
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
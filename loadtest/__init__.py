@@ -0,0 +1,23 @@
+"""
+End-to-end load test: browse -> cart -> checkout -> payment -> webhook.
+
+Runs scripted user journeys against a running server (normally the dev
+server) with a local Stripe stub standing in for api.stripe.com, and
+reports p50/p95/p99 latency and requests/second for every step.
+
+    # terminal 1: the site, talking to the stub
+    STRIPE_API_BASE=http://127.0.0.1:12111 STRIPE_SECRET_KEY=sk_test_stub \\
+    STRIPE_WEBHOOK_SECRET=whsec_loadtest RATELIMIT_ENABLED=False PERF_SAMPLE_RATE=0 \\
+    TASK_EXECUTION_MODE=thread python manage.py runserver --noreload
+
+    # terminal 2: 10 users x 20 journeys, save the numbers as the baseline
+    python -m loadtest --users 10 --iterations 20 --save-baseline loadtest/baseline.json
+
+    # later: same run, diffed against the baseline (exit code 1 on regression)
+    python -m loadtest --users 10 --iterations 20 --compare loadtest/baseline.json
+
+The shop needs products to browse: python manage.py seed_perf_data --scale 0.05
+Leave DEBUG on: with DEBUG=False the session and CSRF cookies are Secure and
+the harness talks plain http, so every POST would be refused.
+The harness does not import Django, so it can run from any machine.
+"""
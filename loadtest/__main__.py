@@ -0,0 +1,85 @@
+"""python -m loadtest --help"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import report
+from .journeys import JourneyError, Recorder, VirtualUser
+from .stripe_stub import StripeStubServer
+
+
+def _user_loop(base_url, recorder, stub, secret, iterations, seed):
+    user = VirtualUser(base_url, recorder, stub, secret, random.Random(seed))
+    failures = []
+    for _ in range(iterations):
+        try:
+            user.run()
+        except JourneyError as exc:
+            failures.append(str(exc))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=5, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=10, help="journeys per user")
+    parser.add_argument("--seed", type=int, default=1, help="seed for product/search choices")
+    parser.add_argument("--stub-port", type=int, default=12111, help="port for the Stripe stub")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds the stub waits per call")
+    parser.add_argument(
+        "--webhook-secret",
+        default=os.environ.get("STRIPE_WEBHOOK_SECRET", "whsec_loadtest"),
+        help="must match the server's STRIPE_WEBHOOK_SECRET",
+    )
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/rps drift (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    stub = StripeStubServer(port=args.stub_port, latency=args.stub_latency).start()
+    recorder = Recorder()
+    print(f"Stripe stub on {stub.url}; {args.users} users x {args.iterations} journeys against {args.base_url}")
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            futures = [
+                pool.submit(_user_loop, args.base_url, recorder, stub, args.webhook_secret,
+                            args.iterations, args.seed + n)
+                for n in range(args.users)
+            ]
+            failures = [msg for f in futures for msg in f.result()]
+    finally:
+        stub.stop()
+    wall = time.perf_counter() - start
+
+    summary = report.summarize(recorder, wall)
+    print(report.format_table(summary))
+    print(f"wall time {wall:.2f}s, {len(failures)} failed journeys")
+    for msg in sorted(set(failures))[:10]:
+        print(f"  {msg}")
+
+    if args.save_baseline:
+        report.save_baseline(args.save_baseline, summary, {
+            "base_url": args.base_url, "users": args.users, "iterations": args.iterations,
+            "seed": args.seed, "wall_seconds": round(wall, 2),
+        })
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.compare:
+        lines, regressed = report.compare(report.load_baseline(args.compare), summary, args.tolerance)
+        print(f"\ncompared with {args.compare}:")
+        print("\n".join(lines))
+        if regressed:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
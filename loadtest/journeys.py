@@ -0,0 +1,113 @@
+"""
+Scripted user journeys.
+
+Each virtual user has its own requests.Session (cookies, CSRF token) and
+walks list -> search -> detail -> cart_add -> order_create -> payment ->
+webhook. Every step is timed into a shared Recorder; an unexpected status
+aborts that journey and is counted as an error for the step.
+
+Every virtual user comes from the same address, so start the server with
+RATELIMIT_ENABLED=False or the search limit will answer 429s.
+"""
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from .stripe_stub import StripeStubServer, completed_event, sign_payload
+
+STEPS = ("list", "search", "detail", "cart_add", "order_create", "payment", "webhook")
+
+CHECKOUT = {
+    "first_name": "Load", "last_name": "Test", "email": "loadtest@example.com",
+    "address": "1 Test Street", "postal_code": "SW1A 1AA", "city": "London",
+}
+SEARCH_TERMS = ("united", "home", "away", "1990", "retro")
+
+_PRODUCT_LINK = re.compile(r'href="(/shop/product/(\d+)/[\w-]+/)"')
+_SESSION_ID = re.compile(r"(cs_test_\w+)")
+
+
+class JourneyError(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, step, seconds, ok=True):
+        with self._lock:
+            if ok:
+                self.latencies[step].append(seconds)
+            else:
+                self.errors[step] += 1
+
+
+class VirtualUser:
+    def __init__(
+        self, base_url: str, recorder: Recorder, stub: StripeStubServer, webhook_secret: str, rng: random.Random
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.stub = stub
+        self.webhook_secret = webhook_secret
+        self.rng = rng
+        self.http = requests.Session()
+
+    def _request(self, step, method, path, expect, **kwargs):
+        kwargs.setdefault("allow_redirects", False)
+        if method == "POST" and "csrftoken" in self.http.cookies:
+            kwargs.setdefault("headers", {})["X-CSRFToken"] = self.http.cookies["csrftoken"]
+        start = time.perf_counter()
+        try:
+            resp = self.http.request(method, self.base_url + path, timeout=30, **kwargs)
+        except requests.RequestException as exc:
+            self.recorder.add(step, 0, ok=False)
+            raise JourneyError(f"{step}: {exc}") from exc
+        elapsed = time.perf_counter() - start
+        ok = resp.status_code in expect
+        self.recorder.add(step, elapsed, ok=ok)
+        if not ok:
+            raise JourneyError(f"{step}: {method} {path} -> {resp.status_code}")
+        return resp
+
+    def run(self):
+        resp = self._request("list", "GET", "/shop/", expect={200})
+        links = _PRODUCT_LINK.findall(resp.text)
+        if not links:
+            raise JourneyError("list: no products on /shop/ (seed some data first)")
+
+        self._request("search", "GET", "/shop/search/", expect={200}, params={"q": self.rng.choice(SEARCH_TERMS)})
+
+        detail_path, product_id = self.rng.choice(links)
+        self._request("detail", "GET", detail_path, expect={200})
+
+        self._request(
+            "cart_add", "POST", f"/cart/add/{product_id}/", expect={302},
+            data={"quantity": self.rng.randint(1, 3)},
+        )
+        self._request("order_create", "POST", "/orders/create/", expect={302}, data=CHECKOUT)
+
+        resp = self._request("payment", "POST", "/payment/process/", expect={302, 303})
+        match = _SESSION_ID.search(resp.headers.get("Location", ""))
+        session = self.stub.sessions.get(match.group(1)) if match else None
+        if session is None:
+            raise JourneyError("payment: no stub Checkout Session (is STRIPE_API_BASE set on the server?)")
+
+        payload = json.dumps(completed_event(session)).encode()
+        self._request(
+            "webhook", "POST", "/payment/webhook/", expect={200}, data=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Stripe-Signature": sign_payload(payload, self.webhook_secret),
+            },
+        )
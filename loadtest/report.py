@@ -0,0 +1,91 @@
+"""Latency percentiles, throughput and baseline comparison."""
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+
+from .journeys import STEPS, Recorder
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no samples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(recorder: Recorder, wall_seconds: float) -> dict:
+    """{step: {count, errors, rps, p50_ms, p95_ms, p99_ms}} in journey order."""
+    summary = {}
+    for step in STEPS:
+        values = recorder.latencies.get(step, [])
+        errors = recorder.errors.get(step, 0)
+        if not values and not errors:
+            continue
+        summary[step] = {
+            "count": len(values),
+            "errors": errors,
+            "rps": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return summary
+
+
+def format_table(summary: dict) -> str:
+    lines = [f"{'step':<14}{'count':>7}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for step, s in summary.items():
+        lines.append(
+            f"{step:<14}{s['count']:>7}{s['errors']:>8}{s['rps']:>9.2f}"
+            f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def save_baseline(path, summary: dict, meta: dict):
+    Path(path).write_text(json.dumps({"meta": meta, "steps": summary}, indent=2, sort_keys=True) + "\n")
+
+
+def load_baseline(path) -> dict:
+    return json.loads(Path(path).read_text())["steps"]
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.2) -> tuple[list[str], bool]:
+    """
+    Diff `current` against `baseline`. A step regresses when its p95 grows or
+    its rps drops by more than `tolerance` (0.2 = 20%), or it starts failing.
+    Returns (report lines, regressed?).
+    """
+    lines, regressed = [], False
+    for step, cur in current.items():
+        base = baseline.get(step)
+        if base is None:
+            lines.append(f"{step:<14}new step, no baseline")
+            continue
+        notes = []
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            notes.append("p95 regression")
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - tolerance):
+            notes.append("throughput regression")
+        if cur["errors"] > base["errors"]:
+            notes.append("new errors")
+        regressed = regressed or bool(notes)
+        lines.append(
+            f"{step:<14}p95 {base['p95_ms']:>8.2f} -> {cur['p95_ms']:>8.2f} ms ({_delta(base['p95_ms'], cur['p95_ms'])})"
+            f"   rps {base['rps']:>7.2f} -> {cur['rps']:>7.2f} ({_delta(base['rps'], cur['rps'])})"
+            + (f"   << {', '.join(notes)}" if notes else "")
+        )
+    for step in baseline.keys() - current.keys():
+        lines.append(f"{step:<14}missing from this run")
+        regressed = True
+    return lines, regressed
+
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old:+.0%}"
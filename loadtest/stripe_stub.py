@@ -0,0 +1,166 @@
+"""
+A tiny in-process stand-in for the Stripe API, plus webhook signing.
+
+Only the endpoints the shop calls are implemented:
+    POST /v1/checkout/sessions        (payment:process)
+    GET  /v1/checkout/sessions/<id>   (payment:completed fallback)
+    GET  /v1/checkout/sessions        (reconcile: newest first, filtered by
+                                       created[gte|gt|lte|lt], paged with
+                                       limit and starting_after)
+Sessions are kept in memory so the harness can replay a matching
+checkout.session.completed webhook for each one.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SESSIONS_PATH = "/v1/checkout/sessions"
+CREATED_FILTERS = {
+    "gte": lambda created, bound: created >= bound,
+    "gt": lambda created, bound: created > bound,
+    "lte": lambda created, bound: created <= bound,
+    "lt": lambda created, bound: created < bound,
+}
+
+
+def _form_to_dict(body: str) -> dict:
+    """Stripe's form encoding (metadata[order_id]=1) -> {"metadata": {"order_id": "1"}}."""
+    data: dict = {}
+    for key, values in parse_qs(body, keep_blank_values=True).items():
+        if "[" in key:
+            outer, inner = key.split("[", 1)
+            data.setdefault(outer, {})[inner.split("]", 1)[0]] = values[0]
+        else:
+            data[key] = values[0]
+    return data
+
+
+class StripeStubServer:
+    """Serves the API over HTTP at `url` (point STRIPE_API_BASE there); payment/tests patches stripe instead."""
+
+    def __init__(self, host="127.0.0.1", port=12111, latency=0.0):
+        self.latency = latency
+        self.sessions: dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stripe-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create_session(self, params: dict) -> dict:
+        with self._lock:
+            n = next(self._ids)
+        session = {
+            "id": f"cs_test_stub{n:08d}",
+            "object": "checkout.session",
+            "mode": params.get("mode", "payment"),
+            "payment_status": "unpaid",
+            "status": "open",
+            "payment_intent": f"pi_stub{n:08d}",
+            "client_reference_id": params.get("client_reference_id"),
+            "metadata": params.get("metadata", {}),
+            "created": int(time.time()),
+            "url": f"{self.url}/pay/cs_test_stub{n:08d}",
+        }
+        self.sessions[session["id"]] = session
+        return session
+
+    def list_sessions(self, params: dict) -> dict:
+        """One page of sessions, newest first, the way Stripe's list endpoints page."""
+        created = params.get("created", {})
+        sessions = [
+            s for s in reversed(list(self.sessions.values()))
+            if all(CREATED_FILTERS[op](s["created"], int(bound)) for op, bound in created.items())
+        ]
+        after = params.get("starting_after")
+        if after:
+            ids = [s["id"] for s in sessions]
+            sessions = sessions[ids.index(after) + 1:] if after in ids else []
+        limit = min(int(params.get("limit", 10)), 100)
+        return {
+            "object": "list",
+            "url": SESSIONS_PATH,
+            "data": sessions[:limit],
+            "has_more": len(sessions) > limit,
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):  # keep the report readable
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Request-Id", "req_stub")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if self.path != SESSIONS_PATH:
+                    return self._reply(404, {"error": {"message": f"stub: no route {self.path}"}})
+                length = int(self.headers.get("Content-Length") or 0)
+                params = _form_to_dict(self.rfile.read(length).decode())
+                self._reply(200, stub.create_session(params))
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlsplit(self.path)
+                if url.path == SESSIONS_PATH:
+                    return self._reply(200, stub.list_sessions(_form_to_dict(url.query)))
+                session = None
+                if url.path.startswith(SESSIONS_PATH + "/"):
+                    session = stub.sessions.get(url.path.rsplit("/", 1)[-1])
+                if session is None:
+                    return self._reply(404, {"error": {"message": "stub: no such session"}})
+                self._reply(200, session)
+
+        return Handler
+
+
+def completed_event(session: dict) -> dict:
+    """The checkout.session.completed event Stripe would send once `session` is paid."""
+    session.update(payment_status="paid", status="complete")
+    return {
+        "id": f"evt_{session['id']}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "created": int(time.time()),
+        "data": {"object": dict(session)},
+    }
+
+
+def sign_payload(payload: bytes, secret: str, timestamp: int | None = None) -> str:
+    """A Stripe-Signature header value that stripe.Webhook.construct_event accepts."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
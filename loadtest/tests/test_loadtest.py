@@ -0,0 +1,105 @@
+import json
+
+import stripe
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from loadtest.journeys import Recorder
+from loadtest.report import compare, percentile, summarize
+from loadtest.stripe_stub import StripeStubServer, completed_event, sign_payload
+from orders.models import Order, OrderItem
+from payment.reconcile import reconcile_payments
+from shop.models import Category, Product
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test_stub", STRIPE_WEBHOOK_SECRET="whsec_loadtest")
+class StubRoundTripTests(TestCase):
+    """The stub and signed webhook replay work against the real views."""
+
+    def setUp(self):
+        self.stub = StripeStubServer(port=0).start()
+        self.addCleanup(self.stub.stop)
+        self.addCleanup(setattr, stripe, "api_base", stripe.api_base)
+
+        cat = Category.objects.create(name="Cat", slug="cat")
+        product = Product.objects.create(category=cat, name="P", slug="p", price="10.00")
+        self.order = Order.objects.create(
+            first_name="A", last_name="B", email="a@example.com",
+            address="1 Street", postal_code="SW1A 1AA", city="London",
+        )
+        OrderItem.objects.create(order=self.order, product=product, price="10.00", quantity=1)
+        session = self.client.session
+        session["order_id"] = self.order.id
+        session.save()
+
+    def test_checkout_and_webhook_against_stub(self):
+        with self.settings(STRIPE_API_BASE=self.stub.url):
+            resp = self.client.post(reverse("payment:process"))
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(resp["Location"].startswith(self.stub.url))
+
+        [session] = self.stub.sessions.values()
+        self.assertEqual(session["client_reference_id"], str(self.order.id))
+        self.assertEqual(session["metadata"], {"order_id": str(self.order.id)})
+
+        payload = json.dumps(completed_event(session)).encode()
+        resp = self.client.post(
+            reverse("payment:stripe-webhook"), payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, "whsec_loadtest"),
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.paid)
+        self.assertEqual(self.order.stripe_id, session["payment_intent"])
+
+    def test_wrong_secret_is_rejected(self):
+        payload = json.dumps(completed_event(self.stub.create_session({"client_reference_id": "1"}))).encode()
+        resp = self.client.post(
+            reverse("payment:stripe-webhook"), payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, "whsec_other"),
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    def test_reconcile_pages_through_stub(self):
+        paid = self.stub.create_session({"client_reference_id": str(self.order.id)})
+        completed_event(paid)
+        for ref in ("998", "999"):
+            self.stub.create_session({"client_reference_id": ref})
+        old = self.stub.create_session({"client_reference_id": "997"})
+        old["created"] -= 3600
+
+        with self.settings(STRIPE_API_BASE=self.stub.url):
+            report = reconcile_payments(since=old["created"] + 1, page_size=2)
+
+        self.assertEqual(report.pages, 2)
+        self.assertEqual(report.sessions_scanned, 3)
+        self.assertEqual(report.unmatched, 2)
+        self.assertEqual(report.marked_paid, 1)
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.paid)
+
+
+class ReportTests(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_summary_and_regression_diff(self):
+        recorder = Recorder()
+        for ms in (10, 20, 30, 40):
+            recorder.add("list", ms / 1000)
+        recorder.add("webhook", 0, ok=False)
+        summary = summarize(recorder, wall_seconds=2.0)
+        self.assertEqual(summary["list"]["count"], 4)
+        self.assertEqual(summary["list"]["rps"], 2.0)
+        self.assertEqual(summary["list"]["p95_ms"], 40.0)
+        self.assertEqual(summary["webhook"]["errors"], 1)
+
+        _, regressed = compare(summary, summary)
+        self.assertFalse(regressed)
+        slower = {**summary, "list": {**summary["list"], "p95_ms": 60.0}}
+        lines, regressed = compare(summary, slower, tolerance=0.2)
+        self.assertTrue(regressed)
+        self.assertIn("p95 regression", "\n".join(lines))
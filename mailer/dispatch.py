@@ -0,0 +1,177 @@
+# mailer/dispatch.py
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _compiled(template_name: str):
+    """Parse each email template once per process."""
+    return get_template(template_name)
+
+
+def render_email(name: str, context: dict) -> tuple[str, str, str]:
+    """Render subject, plain-text and HTML bodies from mailer/<name>/."""
+    subject = _compiled(f"mailer/{name}/subject.txt").render(context)
+    text = _compiled(f"mailer/{name}/body.txt").render(context)
+    html = _compiled(f"mailer/{name}/body.html").render(context)
+    return " ".join(subject.split()), text, html
+
+
+def queue_mail(
+    name: str,
+    context: dict,
+    to: list[str],
+    from_email: str | None = None,
+    reply_to: list[str] | None = None,
+) -> OutgoingEmail:
+    """
+    Render a templated email and put it on the outgoing queue.
+    Never talks to SMTP, so it is safe to call from a web request.
+    """
+    subject, text, html = render_email(name, context)
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+        body_text=text,
+        body_html=html,
+    )
+
+
+def _quota_remaining(now) -> int:
+    """How many more messages the provider's per-minute quota allows right now."""
+    per_minute = getattr(settings, "MAILER_MAX_PER_MINUTE", 120)
+    # rows another drainer has claimed count too: they are about to be sent
+    sent = OutgoingEmail.objects.filter(
+        Q(sent_at__gte=now - timedelta(minutes=1))
+        | Q(status=OutgoingEmail.STATUS_SENDING, next_attempt_at__gt=now)
+    ).count()
+    return max(per_minute - sent, 0)
+
+
+def _to_message(row: OutgoingEmail) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body_text,
+        from_email=row.from_email,
+        to=row.to,
+        reply_to=row.reply_to or None,
+    )
+    if row.body_html:
+        message.attach_alternative(row.body_html, "text/html")
+    return message
+
+
+def _schedule_retry(row: OutgoingEmail, exc: Exception, now) -> None:
+    # the attempt was counted when the row was claimed
+    row.last_error = f"{type(exc).__name__}: {exc}"
+    if row.attempts >= getattr(settings, "MAILER_MAX_ATTEMPTS", 5):
+        row.status = OutgoingEmail.STATUS_FAILED
+        logger.error("Email %s failed permanently: %s", row.id, row.last_error)
+    else:
+        row.status = OutgoingEmail.STATUS_PENDING
+        backoff = getattr(settings, "MAILER_RETRY_BACKOFF", 60) * 2 ** (row.attempts - 1)
+        row.next_attempt_at = now + timedelta(seconds=backoff)
+        logger.warning("Email %s failed (attempt %s), retrying in %ss", row.id, row.attempts, backoff)
+
+
+def _claim(limit: int, now, lease) -> list[OutgoingEmail]:
+    """
+    Mark up to `limit` due rows as sending, leased to this drainer until
+    `lease`, and return them. A short transaction of its own: no row lock
+    is held while SMTP is talked to. Claiming counts as an attempt, so a
+    row whose drainers keep dying before they record it is given up on
+    after MAILER_MAX_ATTEMPTS like any other failure.
+    """
+    max_attempts = getattr(settings, "MAILER_MAX_ATTEMPTS", 5)
+    with transaction.atomic():
+        rows = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutgoingEmail.STATUS_PENDING, OutgoingEmail.STATUS_SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        spent = [row.id for row in rows if row.attempts >= max_attempts]
+        if spent:
+            OutgoingEmail.objects.filter(pk__in=spent).update(
+                status=OutgoingEmail.STATUS_FAILED, last_error="Lease ran out on the last attempt"
+            )
+            logger.error("Emails %s failed permanently: lease ran out on the last attempt", spent)
+        rows = [row for row in rows if row.id not in spent]
+        if rows:
+            OutgoingEmail.objects.filter(pk__in=[row.id for row in rows]).update(
+                status=OutgoingEmail.STATUS_SENDING, next_attempt_at=lease, attempts=F("attempts") + 1
+            )
+    for row in rows:
+        row.status, row.next_attempt_at = OutgoingEmail.STATUS_SENDING, lease
+        row.attempts += 1
+    return rows
+
+
+def drain_queue(batch_size: int | None = None) -> int:
+    """
+    Send one batch of due messages over a single SMTP connection.
+    Rows are claimed in one short transaction, sent outside any transaction
+    and their results written in a second one, for the rows still leased to
+    this drainer. A drainer that dies (or stalls past its lease) mid-batch
+    leaves its rows "sending" until the lease runs out; they are then sent
+    again, so a message may (rarely) go out twice but is never lost.
+    Returns the number of messages sent.
+    """
+    now = timezone.now()
+    limit = min(batch_size or getattr(settings, "MAILER_BATCH_SIZE", 50), _quota_remaining(now))
+    if limit <= 0:
+        return 0
+
+    lease = now + timedelta(seconds=getattr(settings, "MAILER_LEASE_SECONDS", 300))
+    rows = _claim(limit, now, lease)
+    if not rows:
+        return 0
+
+    sent = 0
+    handled = set()
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for row in rows:
+                handled.add(row.id)
+                try:
+                    connection.send_messages([_to_message(row)])
+                except Exception as exc:
+                    _schedule_retry(row, exc, now)
+                else:
+                    row.status = OutgoingEmail.STATUS_SENT
+                    row.sent_at = timezone.now()
+                    sent += 1
+    except Exception as exc:
+        # could not open (or cleanly close) the connection
+        for row in rows:
+            if row.id not in handled:
+                _schedule_retry(row, exc, now)
+
+    # a row whose lease ran out may already be another drainer's: leave it be
+    with transaction.atomic():
+        recorded = OutgoingEmail.objects.filter(
+            status=OutgoingEmail.STATUS_SENDING, next_attempt_at=lease
+        ).bulk_update(rows, ["status", "last_error", "next_attempt_at", "sent_at"])
+    if recorded < len(rows):
+        logger.warning("Mail queue: %s rows were reclaimed before they were recorded", len(rows) - recorded)
+
+    logger.info("Mail queue: sent %s of %s", sent, len(rows))
+    return sent
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from mailer.tasks import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Send pending queued emails now (normally done by the periodic Celery task)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-batches", type=int, default=10)
+
+    def handle(self, *args, **options):
+        sent = send_queued_mail(max_batches=options["max_batches"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} email(s)."))
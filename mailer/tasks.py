@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from .dispatch import drain_queue
+
+
+@shared_task
+def send_queued_mail(max_batches: int = 10) -> int:
+    """
+    Drain the outgoing mail queue, one SMTP connection per batch.
+    Stops early once the queue is empty or the provider quota is used up.
+    """
+    total = 0
+    for _ in range(max_batches):
+        sent = drain_queue()
+        total += sent
+        if not sent:
+            break
+    return total
@@ -0,0 +1,189 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mailer.dispatch import drain_queue, queue_mail
+from mailer.models import OutgoingEmail
+from mailer.tasks import send_queued_mail
+from orders.models import Order
+from orders.tasks import order_created
+
+
+class FlakyBackend(EmailBackend):
+    """Locmem backend that refuses any message addressed to fail@example.com."""
+
+    def send_messages(self, messages):
+        if any("fail@example.com" in m.to for m in messages):
+            raise ConnectionError("550 mailbox unavailable")
+        return super().send_messages(messages)
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class PeekingBackend(EmailBackend):
+    """Locmem backend that records each message's row status as SMTP sees it."""
+
+    seen = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            PeekingBackend.seen.append(OutgoingEmail.objects.get(subject=message.subject).status)
+        return super().send_messages(messages)
+
+
+class StallingBackend(EmailBackend):
+    """Locmem backend so slow that another drainer reclaims the row mid-send."""
+
+    def send_messages(self, messages):
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now() + timedelta(hours=1), attempts=F("attempts") + 1)
+        return super().send_messages(messages)
+
+
+class QueueMailTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(
+            first_name="Ann", last_name="B", email="ann@example.com",
+            address="1 Street", postal_code="SW1A 1AA", city="London",
+        )
+
+    def test_order_created_task_only_queues(self):
+        order_created(self.order.id)
+        self.assertEqual(len(mail.outbox), 0)
+        row = OutgoingEmail.objects.get()
+        self.assertEqual(row.to, ["ann@example.com"])
+        self.assertEqual(row.subject, f"Order nr. {self.order.id}")
+        self.assertIn("Dear Ann", row.body_text)
+        self.assertIn("<strong>", row.body_html)
+
+    def test_drain_sends_multipart_messages(self):
+        queue_mail("payment_completed", {"order": self.order}, [self.order.email])
+        self.assertEqual(drain_queue(), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        msg = mail.outbox[0]
+        self.assertEqual(msg.subject, f"Order #{self.order.id} paid")
+        self.assertEqual(msg.alternatives[0][1], "text/html")
+        row = OutgoingEmail.objects.get()
+        self.assertEqual(row.status, OutgoingEmail.STATUS_SENT)
+        self.assertIsNotNone(row.sent_at)
+
+    @override_settings(EMAIL_BACKEND="mailer.tests.test_mailer.CountingBackend")
+    def test_batch_reuses_one_connection(self):
+        CountingBackend.opened = 0
+        for _ in range(5):
+            queue_mail("order_created", {"order": self.order}, [self.order.email])
+        self.assertEqual(drain_queue(), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+
+    @override_settings(MAILER_MAX_PER_MINUTE=3)
+    def test_rate_limited_to_quota(self):
+        for _ in range(5):
+            queue_mail("order_created", {"order": self.order}, [self.order.email])
+        self.assertEqual(send_queued_mail(), 3)
+        self.assertEqual(OutgoingEmail.objects.filter(status="pending").count(), 2)
+
+    @override_settings(
+        EMAIL_BACKEND="mailer.tests.test_mailer.FlakyBackend",
+        MAILER_RETRY_BACKOFF=10,
+        MAILER_MAX_ATTEMPTS=2,
+    )
+    def test_failures_retry_with_backoff_then_give_up(self):
+        queue_mail("order_created", {"order": self.order}, ["fail@example.com"])
+        queue_mail("order_created", {"order": self.order}, [self.order.email])
+
+        self.assertEqual(drain_queue(), 1)
+        failed = OutgoingEmail.objects.get(to=["fail@example.com"])
+        self.assertEqual(failed.status, OutgoingEmail.STATUS_PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("550", failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=5))
+
+        # not due yet
+        self.assertEqual(drain_queue(), 0)
+
+        OutgoingEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        drain_queue()
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, OutgoingEmail.STATUS_FAILED)
+
+    @override_settings(EMAIL_BACKEND="mailer.tests.test_mailer.PeekingBackend")
+    def test_rows_are_claimed_before_smtp_and_recorded_after(self):
+        PeekingBackend.seen = []
+        queue_mail("order_created", {"order": self.order}, [self.order.email])
+        self.assertEqual(drain_queue(), 1)
+        self.assertEqual(PeekingBackend.seen, [OutgoingEmail.STATUS_SENDING])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_SENT)
+
+    @override_settings(MAILER_LEASE_SECONDS=60)
+    def test_claimed_rows_wait_for_the_lease_to_run_out(self):
+        queue_mail("order_created", {"order": self.order}, [self.order.email])
+        # another drainer claimed it and hasn't reported back
+        OutgoingEmail.objects.update(
+            status=OutgoingEmail.STATUS_SENDING, next_attempt_at=timezone.now() + timedelta(seconds=60)
+        )
+        self.assertEqual(drain_queue(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # ... and died: once the lease is up the message is sent after all
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_queue(), 1)
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_SENT)
+
+    @override_settings(MAILER_MAX_ATTEMPTS=2)
+    def test_a_claim_counts_as_an_attempt(self):
+        queue_mail("order_created", {"order": self.order}, [self.order.email])
+        # a drainer claimed it twice and died both times
+        OutgoingEmail.objects.update(
+            status=OutgoingEmail.STATUS_SENDING, attempts=2, next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        with self.assertLogs("mailer.dispatch", "ERROR"):
+            self.assertEqual(drain_queue(), 0)
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_FAILED)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(EMAIL_BACKEND="mailer.tests.test_mailer.StallingBackend")
+    def test_results_are_not_written_over_another_drainers_claim(self):
+        queue_mail("order_created", {"order": self.order}, [self.order.email])
+        with self.assertLogs("mailer.dispatch", "WARNING"):
+            drain_queue()
+        row = OutgoingEmail.objects.get()
+        self.assertEqual(row.status, OutgoingEmail.STATUS_SENDING)
+        self.assertEqual(row.attempts, 2)
+        self.assertGreater(row.next_attempt_at, timezone.now())
+
+    @override_settings(MAILER_MAX_PER_MINUTE=3)
+    def test_rows_claimed_elsewhere_count_against_the_quota(self):
+        for _ in range(3):
+            queue_mail("order_created", {"order": self.order}, [self.order.email])
+        OutgoingEmail.objects.filter(pk__in=OutgoingEmail.objects.values("pk")[:2]).update(
+            status=OutgoingEmail.STATUS_SENDING, next_attempt_at=timezone.now() + timedelta(seconds=60)
+        )
+        self.assertEqual(drain_queue(), 1)
+
+
+class ContactViewTests(TestCase):
+    @patch("django.core.mail.get_connection")
+    def test_contact_queues_without_touching_smtp(self, mock_get_connection):
+        resp = self.client.post(
+            reverse("shop:contact"),
+            {"name": "Sam", "email": "sam@example.com", "message": "Hi & hello"},
+        )
+        self.assertEqual(resp.status_code, 302)
+        mock_get_connection.assert_not_called()
+
+        row = OutgoingEmail.objects.get()
+        self.assertEqual(row.reply_to, ["sam@example.com"])
+        self.assertIn("Hi & hello", row.body_text)
+        self.assertIn("Hi &amp; hello", row.body_html)
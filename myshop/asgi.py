@@ -11,6 +11,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from myshop.celery import start_periodic_tasks
+from myshop.warmup import warm_up_on_startup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myshop.settings')
 
 application = get_asgi_application()
+
+warm_up_on_startup()
+start_periodic_tasks()
@@ -0,0 +1,23 @@
+# myshop/asyncviews.py
+"""
+Helpers for the async twins of the catalog and payment views.
+
+With ASYNC_VIEWS=True (serve myshop.asgi:application with an ASGI server
+such as uvicorn or daphne) the URLconfs route to the *_async views:
+database reads use the async ORM and Stripe calls go through stripe's
+*_async methods (httpx), so a request waiting on Stripe doesn't hold a
+thread. Under wsgi.py the flag stays off and the sync views are used
+exactly as before.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+
+# Templates, context processors (the cart, request.user) and the session
+# middleware are sync; render in the sync thread once the slow I/O is done.
+arender = sync_to_async(render)
+
+
+def pick(sync_view, async_view):
+    """The view to route to: async_view when ASYNC_VIEWS is on."""
+    return async_view if getattr(settings, "ASYNC_VIEWS", False) else sync_view
@@ -0,0 +1,363 @@
+# myshop/cache.py
+"""
+Two-tier cache: a small per-process LRU (L1) in front of a shared cache (L2,
+Redis in production), plus stampede-safe recomputation.
+
+    CACHES = {"default": {
+        "BACKEND": "myshop.cache.TieredCache",
+        "LOCATION": REDIS_URL,
+        "OPTIONS": {"L1_MAX_ENTRIES": 1000, "L1_TIMEOUT": 30},
+    }}
+
+Reads try L1, then L2 (filling L1). Writes and deletes go to L2 and are
+broadcast on a Redis pub/sub channel so every process drops its L1 copy;
+L1_TIMEOUT caps how stale a process can be if a broadcast is missed.
+
+get_or_compute() wraps a value with a "fresh until" stamp and:
+  * collapses concurrent misses into one computation, within a process
+    (threading) and across processes (a short lock key in L2);
+  * keeps serving the stale value for `stale_ttl` seconds after it expires
+    while one caller refreshes it in the background.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Delete a lock only if it still holds our token: after LOCK_TIMEOUT it may
+# have expired and been taken by another caller.
+_RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class LRU:
+    """Bounded, thread-safe LRU with per-entry expiry (monotonic clock)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None):
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.l1 = LRU(int(options.get("L1_MAX_ENTRIES", 1000)))
+        self.l1_timeout = float(options.get("L1_TIMEOUT", 30))
+        self.channel = options.get("INVALIDATION_CHANNEL", "myshop:cache:invalidate")
+        self.lock_timeout = float(options.get("LOCK_TIMEOUT", 10))
+
+        l2_params = {k: v for k, v in params.items() if k not in ("BACKEND", "OPTIONS")}
+        l2_params["OPTIONS"] = options.get("L2_OPTIONS", {})
+        backend = import_string(options.get("L2_BACKEND", "django.core.cache.backends.redis.RedisCache"))
+        self.l2 = backend(server, l2_params)
+
+        self._origin = f"{os.getpid()}:{id(self)}"
+        self._subscriber = None
+        self._subscriber_lock = threading.Lock()
+        self._inflight: dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+        self._refresher = None
+
+    # --- pub/sub invalidation ---
+
+    def _redis(self):
+        client = getattr(self.l2, "_cache", None)
+        return client.get_client(write=True) if hasattr(client, "get_client") else None
+
+    def _ensure_subscriber(self):
+        if self._subscriber is not None:
+            return
+        with self._subscriber_lock:
+            if self._subscriber is not None:
+                return
+            redis = self._redis()
+            if redis is None:  # L2 isn't Redis (tests, local dev): nothing to listen to
+                self._subscriber = False
+                return
+            self._subscriber = threading.Thread(
+                target=self._listen, args=(redis,), name="cache-invalidation", daemon=True,
+            )
+            self._subscriber.start()
+
+    def _listen(self, redis):
+        while True:
+            try:
+                pubsub = redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # anything cached before we (re)subscribed may have missed a broadcast
+                self.l1.clear()
+                for message in pubsub.listen():
+                    self._on_invalidate(message["data"])
+            except Exception:
+                logger.warning("Cache invalidation listener lost Redis; retrying", exc_info=True)
+                time.sleep(1)
+
+    def _on_invalidate(self, data):
+        payload = json.loads(data)
+        if payload.get("origin") == self._origin:
+            return
+        if payload.get("clear"):
+            self.l1.clear()
+        for key in payload.get("keys", ()):
+            self.l1.pop(key)
+
+    def _broadcast(self, keys=(), clear=False):
+        redis = self._redis()
+        if redis is None:
+            return
+        try:
+            redis.publish(self.channel, json.dumps({"origin": self._origin, "keys": list(keys), "clear": clear}))
+        except Exception:
+            # L1_TIMEOUT still bounds staleness elsewhere
+            logger.warning("Cache invalidation broadcast failed", exc_info=True)
+
+    def _l1_ttl(self, timeout):
+        """Seconds to keep a value in L1: the cache timeout, capped at L1_TIMEOUT."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    # --- Django cache API ---
+
+    def get(self, key, default=None, version=None):
+        self._ensure_subscriber()
+        made = self.make_and_validate_key(key, version=version)
+        value = self.l1.get(made)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self.l1.set(made, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_subscriber()
+        made = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout, version=version)
+        self.l1.set(made, value, self._l1_ttl(timeout))
+        self._broadcast([made])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_subscriber()
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            made = self.make_and_validate_key(key, version=version)
+            self.l1.set(made, value, self._l1_ttl(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        self.l1.pop(made)
+        deleted = self.l2.delete(key, version=version)
+        self._broadcast([made])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_and_validate_key(key, version=version) for key in keys]
+        for key in made:
+            self.l1.pop(key)
+        self.l2.delete_many(keys, version=version)
+        self._broadcast(made)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        # counters live in L2 only, so every process sees the same number
+        made = self.make_and_validate_key(key, version=version)
+        self.l1.pop(made)
+        value = self.l2.incr(key, delta, version=version)
+        self._broadcast([made])
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+        self._broadcast(clear=True)
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    # --- stampede protection ---
+
+    def get_or_compute(self, key, compute, timeout=300, stale_ttl=60, version=None):
+        """
+        Return the cached value for `key`, computing it with `compute()` at most
+        once at a time across all processes. For `stale_ttl` seconds after
+        `timeout` the old value is served while a background refresh runs.
+        """
+        envelope = self.get(key, version=version)
+        now = time.time()
+        if envelope is not None:
+            value, fresh_until = envelope
+            if now < fresh_until:
+                return value
+            # stale: serve it, and let whoever wins the lock refresh it
+            token = self._acquire(key, version)
+            if token:
+                self._refresh_in_background(key, compute, timeout, stale_ttl, version, token)
+            return value
+        return self._compute_once(key, compute, timeout, stale_ttl, version)
+
+    def _store(self, key, value, timeout, stale_ttl, version):
+        self.set(key, (value, time.time() + timeout), timeout + stale_ttl, version=version)
+
+    def _lock_key(self, key):
+        return f"lock:{key}"
+
+    def _acquire(self, key, version) -> int | None:
+        """Take the lock for `key`; returns this caller's token, or None if someone holds it."""
+        # an int, which RedisCache stores as its digits rather than pickled (see _release)
+        token = secrets.randbits(62) + 1
+        return token if self.l2.add(self._lock_key(key), token, self.lock_timeout, version=version) else None
+
+    def _release(self, key, token, version):
+        """Drop the lock, unless it expired and another caller holds it now."""
+        lock_key = self._lock_key(key)
+        redis = self._redis()
+        if redis is not None:
+            redis.eval(_RELEASE_LOCK, 1, self.l2.make_and_validate_key(lock_key, version=version), token)
+        elif self.l2.get(lock_key, version=version) == token:
+            # no Redis (tests, local dev): not atomic, but L2 is per-process there anyway
+            self.l2.delete(lock_key, version=version)
+
+    def _compute_once(self, key, compute, timeout, stale_ttl, version):
+        made = self.make_and_validate_key(key, version=version)
+        with self._inflight_lock:
+            event = self._inflight.get(made)
+            leader = event is None
+            if leader:
+                event = self._inflight[made] = threading.Event()
+        if not leader:
+            # another thread in this process is computing it
+            event.wait(self.lock_timeout)
+            envelope = self.get(key, version=version)
+            return envelope[0] if envelope is not None else compute()
+        try:
+            return self._compute_across_processes(key, compute, timeout, stale_ttl, version)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(made, None)
+            event.set()
+
+    def _compute_across_processes(self, key, compute, timeout, stale_ttl, version):
+        token = self._acquire(key, version)
+        if token:
+            try:
+                value = compute()
+                self._store(key, value, timeout, stale_ttl, version)
+                return value
+            finally:
+                self._release(key, token, version)
+        # someone else is computing it: poll L2 (not L1) until it lands
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            envelope = self.l2.get(key, version=version)
+            if envelope is not None:
+                return envelope[0]
+            delay = min(delay * 2, 0.2)
+        logger.warning("Timed out waiting for %s to be computed elsewhere; computing it here", key)
+        value = compute()
+        self._store(key, value, timeout, stale_ttl, version)
+        return value
+
+    def _refresh_in_background(self, key, compute, timeout, stale_ttl, version, token):
+        if self._refresher is None:
+            self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self._refresher.submit(self._refresh, key, compute, timeout, stale_ttl, version, token)
+
+    def _refresh(self, key, compute, timeout, stale_ttl, version, token):
+        from django.db import connections
+
+        try:
+            self._store(key, compute(), timeout, stale_ttl, version)
+        except Exception:
+            logger.exception("Background refresh of %s failed; stale value kept", key)
+        finally:
+            self._release(key, token, version)
+            connections.close_all()
+
+
+def redis_client(cache):
+    """The redis-py client behind a RedisCache or TieredCache, else None."""
+    backend = getattr(cache, "l2", cache)
+    client = getattr(backend, "_cache", None)
+    return client.get_client(write=True) if hasattr(client, "get_client") else None
+
+
+def get_or_compute(key, compute, timeout=300, stale_ttl=60, alias="default"):
+    """
+    get_or_compute() on the given cache, with a plain get/set fallback for
+    backends that aren't tiered (LocMemCache in development and tests).
+    """
+    from django.core.cache import caches
+
+    cache = caches[alias]
+    if isinstance(cache, TieredCache):
+        return cache.get_or_compute(key, compute, timeout=timeout, stale_ttl=stale_ttl)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
@@ -1,12 +1,239 @@
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from celery import Celery
+from celery import Celery, Task, signals
+from celery.schedules import maybe_schedule
+from celery.utils import uuid
+from kombu import Queue
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myshop.settings')
 
+logger = logging.getLogger(__name__)
 
-app = Celery('myshop')
+EXECUTION_MODES = ('eager', 'thread', 'worker')
+
+
+def get_execution_mode():
+    """
+    How .delay()/.apply_async() run tasks (settings.TASK_EXECUTION_MODE):
+      eager  - inline in the caller (tests); the task's exceptions propagate
+      thread - in-process thread pool, caller returns immediately (single dyno);
+               PeriodicRunner stands in for beat
+      worker - published to the broker for `celery worker` (production)
+    """
+    from django.conf import settings
+
+    return getattr(settings, 'TASK_EXECUTION_MODE', 'worker')
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        from django.conf import settings
+
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TASK_THREAD_WORKERS', 2),
+            thread_name_prefix='task',
+        )
+    return _executor
+
+
+def _run_offloaded(task, args, kwargs, task_id):
+    from django.db import connections
+
+    try:
+        return task.apply(args, kwargs, task_id=task_id, throw=True)
+    except Exception:
+        logger.exception('Offloaded task %s[%s] failed', task.name, task_id)
+    finally:
+        # each pool thread has its own DB connections; don't leak them
+        connections.close_all()
+
+
+class ShopTask(Task):
+    def apply_async(self, args=None, kwargs=None, task_id=None, **options):
+        mode = get_execution_mode()
+        if mode == 'eager':
+            # raise like task_eager_propagates did, rather than hide the error in the result
+            return self.apply(args, kwargs, task_id=task_id or uuid(), throw=True, **options)
+        if mode == 'thread':
+            return _get_executor().submit(_run_offloaded, self, args, kwargs, task_id or uuid())
+        return super().apply_async(args, kwargs, task_id=task_id, **options)
+
+
+app = Celery('myshop', task_cls=ShopTask)
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
-app.conf.task_always_eager = True
-app.conf.task_eager_propagates = True
\ No newline at end of file
+
+# --- Queue topology ---
+# Run payment/order work on its own workers so a backlog of heavy jobs
+# (PDFs, exports, reconciliation) can never delay paid-order emails:
+#   celery -A myshop worker -Q payments,orders,mail,default
+#   celery -A myshop worker -Q bulk
+app.conf.task_default_queue = 'default'
+app.conf.task_queues = (
+    Queue('payments'),
+    Queue('orders'),
+    Queue('mail'),
+    Queue('default'),
+    Queue('bulk'),
+)
+# First match wins, so specific task names go before the per-module globs.
+# With the Redis broker 0 is the *highest* priority.
+app.conf.task_routes = {
+    'payment.tasks.reconcile_stripe_payments': {'queue': 'bulk', 'priority': 9},
+    'payment.tasks.*': {'queue': 'payments', 'priority': 0},
+    'orders.tasks.*': {'queue': 'orders', 'priority': 3},
+    'mailer.tasks.*': {'queue': 'mail', 'priority': 3},
+}
+app.conf.task_default_priority = 5
+app.conf.broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+# Nobody reads task results; don't write them to Redis.
+app.conf.task_ignore_result = True
+
+
+# --- Periodic tasks without beat (thread mode) ---
+def _relay_outbox():
+    from django.db import connections
+
+    from outbox.relay import relay_pending
+
+    try:
+        while relay_pending():
+            pass
+    except Exception:
+        logger.exception('Outbox relay pass failed')
+    finally:
+        connections.close_all()
+
+
+class PeriodicRunner(threading.Thread):
+    """
+    `celery beat` needs a broker, so in thread mode this daemon thread runs
+    CELERY_BEAT_SCHEDULE instead, plus an outbox relay pass each minute for
+    rows whose on-commit relay was lost. Due tasks go to the thread pool.
+    Every web process runs its own copy; the jobs tolerate overlapping
+    (mail rows are leased, stock releases and outbox rows are claimed with
+    conditional updates, reconciliation is idempotent).
+    """
+
+    def __init__(self, schedule=None):
+        """`schedule` is in CELERY_BEAT_SCHEDULE's format; the default is that plus the relay pass."""
+        super().__init__(name='periodic-tasks', daemon=True)
+        from django.conf import settings
+
+        # a worker imports every app's tasks module at startup; there is no worker here
+        app.loader.import_default_modules()
+
+        default = schedule is None
+        if default:
+            schedule = getattr(settings, 'CELERY_BEAT_SCHEDULE', {})
+        self.entries = {
+            name: (maybe_schedule(entry['schedule'], app=app), self._task_call(entry))
+            for name, entry in schedule.items()
+        }
+        if default:
+            self.entries['relay-outbox'] = (maybe_schedule(60, app=app), lambda: _get_executor().submit(_relay_outbox))
+        self.last_run = {}
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def _task_call(entry):
+        def call():
+            app.tasks[entry['task']].apply_async(entry.get('args', ()), entry.get('kwargs', {}))
+        return call
+
+    def tick(self) -> float:
+        """Start whatever is due (everything, the first time); returns seconds until the next is."""
+        now = app.now()
+        waits = []
+        for name, (schedule, call) in self.entries.items():
+            if name not in self.last_run or schedule.is_due(self.last_run[name]).is_due:
+                self.last_run[name] = now
+                try:
+                    call()
+                except Exception:
+                    logger.exception('Periodic task %s could not be started', name)
+            waits.append(schedule.is_due(self.last_run[name]).next)
+        return min(waits, default=60)
+
+    def run(self):
+        while not self.stopped.wait(self.tick()):
+            pass
+
+
+_periodic = None
+_periodic_lock = threading.Lock()
+
+
+def start_periodic_tasks():
+    """Start the PeriodicRunner in thread mode (once per process; called by wsgi.py/asgi.py)."""
+    global _periodic
+    if get_execution_mode() != 'thread':
+        return None
+    with _periodic_lock:
+        if _periodic is None:
+            _periodic = PeriodicRunner()
+            _periodic.start()
+            logger.info('Running the beat schedule in-process: %s', ', '.join(_periodic.entries))
+    return _periodic
+
+
+# --- Per-task metrics ---
+_started = {}
+
+
+def _queue_of(task):
+    info = getattr(task.request, 'delivery_info', None) or {}
+    return info.get('routing_key') or app.conf.task_default_queue
+
+
+@signals.task_prerun.connect
+def _task_prerun(task_id=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    from .metrics import TASK_DURATION, TASK_SUCCEEDED, record_db_pool_stats
+
+    started = _started.pop(task_id, None)
+    queue = _queue_of(task)
+    if started is not None:
+        TASK_DURATION.labels(task.name, queue).observe(time.perf_counter() - started)
+    if state == 'SUCCESS':
+        TASK_SUCCEEDED.labels(task.name, queue).inc()
+    record_db_pool_stats()
+
+
+@signals.task_retry.connect
+def _task_retry(sender=None, **kwargs):
+    from .metrics import TASK_RETRIES
+
+    TASK_RETRIES.labels(sender.name).inc()
+
+
+@signals.task_failure.connect
+def _task_failure(sender=None, exception=None, **kwargs):
+    from .metrics import TASK_FAILURES
+
+    TASK_FAILURES.labels(sender.name, type(exception).__name__).inc()
+
+
+@signals.worker_ready.connect
+def _start_metrics_exporter(**kwargs):
+    port = os.environ.get('CELERY_METRICS_PORT')
+    if port:
+        from .metrics import start_metrics_server
+
+        start_metrics_server(int(port))
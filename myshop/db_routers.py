@@ -0,0 +1,167 @@
+# myshop/db_routers.py
+"""
+Read-replica routing.
+
+    DATABASE_REPLICA_URLS=postgres://replica-1/...,postgres://replica-2/...
+
+adds "replica1", "replica2", ... to DATABASES and lists them in
+REPLICA_DATABASES. ReplicaRouter then sends reads of REPLICA_APPS models (the
+catalog) to a random replica, and so does any view wrapped in @replica_reads
+(account order history). Everything else, and every write, uses "default".
+
+Read-your-writes: ReplicaStickinessMiddleware pins a request to the primary
+for any non-GET/HEAD request and for REPLICA_STICKY_SECONDS afterwards (a
+cookie), so a customer sees their own cart, order or address change even if a
+replica lags. Payment and webhook code is wrapped in @use_primary.
+
+Locally, two SQLite files stand in for primary and replica:
+
+    cp db.sqlite3 replica.sqlite3
+    DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3 python manage.py runserver
+"""
+from __future__ import annotations
+
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PRIMARY = "default"
+STICKY_COOKIE = "db_primary_until"
+
+_pinned: ContextVar[bool] = ContextVar("db_pinned_to_primary", default=False)
+_replica_ok: ContextVar[bool] = ContextVar("db_replica_reads", default=False)
+
+
+def replicas() -> list[str]:
+    return list(getattr(settings, "REPLICA_DATABASES", ()))
+
+
+class _Flag:
+    """
+    Set a context flag for a with-block, or around every call of a decorated
+    view (sync or async; asgiref carries it into sync_to_async threads).
+    """
+
+    def __init__(self, var: ContextVar):
+        self.var = var
+        self.token = None
+
+    def __enter__(self):
+        self.token = self.var.set(True)
+
+    def __exit__(self, *exc):
+        self.var.reset(self.token)
+
+    def __call__(self, func):
+        var = self.var
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def inner(*args, **kwargs):
+                token = var.set(True)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    var.reset(token)
+        else:
+            @wraps(func)
+            def inner(*args, **kwargs):
+                token = var.set(True)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    var.reset(token)
+        return inner
+
+
+def use_primary() -> _Flag:
+    """Send every read in this block (or decorated function) to the primary."""
+    return _Flag(_pinned)
+
+
+def replica_reads() -> _Flag:
+    """Let reads of any model in this block go to a replica, unless pinned to the primary."""
+    return _Flag(_replica_ok)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or _pinned.get():
+            return PRIMARY
+        if _replica_ok.get() or model._meta.app_label in getattr(settings, "REPLICA_APPS", ("shop",)):
+            return random.choice(aliases)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        pool = {PRIMARY, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema through replication
+        return db not in replicas()
+
+
+class ReplicaStickinessMiddleware:
+    """Pin writes, and the requests that follow them for a few seconds, to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        writing, pinned = self._pin(request)
+        if pinned:
+            with use_primary():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        return self._stick(response) if writing else response
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        writing, pinned = self._pin(request)
+        if pinned:
+            with use_primary():
+                response = await self.get_response(request)
+        else:
+            response = await self.get_response(request)
+        return self._stick(response) if writing else response
+
+    def _pin(self, request) -> tuple[bool, bool]:
+        writing = request.method not in ("GET", "HEAD", "OPTIONS")
+        try:
+            sticky = float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        return writing, writing or sticky
+
+    def _stick(self, response):
+        seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+        response.set_cookie(
+            STICKY_COOKIE,
+            f"{time.time() + seconds:.3f}",
+            max_age=seconds,
+            httponly=True,
+            samesite="Lax",
+            secure=settings.SESSION_COOKIE_SECURE,
+        )
+        return response
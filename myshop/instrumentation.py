@@ -0,0 +1,229 @@
+# myshop/instrumentation.py
+"""
+Per-request performance instrumentation.
+
+A sampled request gets a RequestStats object (stored in a contextvar) that
+collects query count/time, the slowest SQL, template render time, outbound
+HTTP time and the render time that cached template fragments saved. The middleware reports them as a Server-Timing header
+(staff and SERVER_TIMING_ALLOWED_IPS only) and one JSON log line on the
+"myshop.perf" logger.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import EXTERNAL_CALL_DURATION
+from .ratelimit import client_ip
+
+logger = logging.getLogger("myshop.perf")
+
+_current: ContextVar["RequestStats | None"] = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = (
+        "queries", "db_time", "slowest_sql", "slowest_time",
+        "template_time", "template_depth", "http_calls", "http_time",
+        "fragment_hits", "fragment_misses", "fragment_saved",
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_sql = ""
+        self.slowest_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.http_calls = 0
+        self.http_time = 0.0
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+        self.fragment_saved = 0.0  # what the cache hits took to render when they were stored
+
+
+def current_stats() -> RequestStats | None:
+    """Stats for the request being handled, or None when it isn't sampled."""
+    return _current.get()
+
+
+class QueryTimer:
+    """DB execute_wrapper that times every query into the request's stats."""
+
+    def __init__(self, stats: RequestStats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.stats
+            stats.queries += 1
+            stats.db_time += elapsed
+            if elapsed > stats.slowest_time:
+                stats.slowest_time = elapsed
+                stats.slowest_sql = sql
+
+
+@contextmanager
+def track_http(service: str = "http", operation: str = ""):
+    """
+    Time an outbound HTTP call (e.g. Stripe): always into the latency
+    histogram, and into the current request's stats when it is sampled.
+    """
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        EXTERNAL_CALL_DURATION.labels(service, operation).observe(elapsed)
+        if stats is not None:
+            stats.http_calls += 1
+            stats.http_time += elapsed
+
+
+_template_timer_installed = False
+
+
+def _install_template_timer():
+    """
+    Wrap the Django template backend's render() once per process so that
+    top-level renders (render(), render_to_string()) are timed.
+    """
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return original_render(self, context, request)
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:  # nested renders are already inside the outer one
+                stats.template_time += time.perf_counter() - start
+
+    Template.render = timed_render
+    _template_timer_installed = True
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+class PerformanceMiddleware:
+    """
+    Sample PERF_SAMPLE_RATE of requests (0.0–1.0) and report where their
+    time went. Unsampled requests pay for a single random() call.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _install_template_timer()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with self._timing_queries(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._report(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        # the ORM runs in the request's sync_to_async thread, not on the event
+        # loop, and connections are per thread: install the timer over there
+        timing = await sync_to_async(self._timing_queries)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(timing.close)()
+            _current.reset(token)
+        return self._report(request, response, stats, time.perf_counter() - start)
+
+    @staticmethod
+    def _sampled() -> bool:
+        rate = getattr(settings, "PERF_SAMPLE_RATE", 0.0)
+        return rate > 0 and random.random() < rate
+
+    @staticmethod
+    def _timing_queries(stats: RequestStats) -> ExitStack:
+        """Time queries on the calling thread's connections until the stack is closed."""
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(QueryTimer(stats)))
+        return stack
+
+    @staticmethod
+    def _shows_timing(request) -> bool:
+        if client_ip(request) in getattr(settings, "SERVER_TIMING_ALLOWED_IPS", ()):
+            return True
+        user = getattr(request, "user", None)
+        return bool(user and user.is_staff)
+
+    def _report(self, request, response, stats: RequestStats, total: float):
+        if self._shows_timing(request):
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={_ms(stats.db_time)};desc="{stats.queries} queries"',
+                f"tpl;dur={_ms(stats.template_time)}",
+                f'http;dur={_ms(stats.http_time)};desc="{stats.http_calls} calls"',
+                f'frag-saved;dur={_ms(stats.fragment_saved)};desc="{stats.fragment_hits} hits, {stats.fragment_misses} misses"',
+                f"total;dur={_ms(total)}",
+            ])
+
+        match = getattr(request, "resolver_match", None)
+        logger.info(json.dumps({
+            "event": "request_perf",
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": _ms(total),
+            "db_queries": stats.queries,
+            "db_ms": _ms(stats.db_time),
+            "slowest_sql_ms": _ms(stats.slowest_time),
+            "slowest_sql": stats.slowest_sql[:500],
+            "template_ms": _ms(stats.template_time),
+            "http_calls": stats.http_calls,
+            "http_ms": _ms(stats.http_time),
+            "fragment_hits": stats.fragment_hits,
+            "fragment_misses": stats.fragment_misses,
+            "fragment_saved_ms": _ms(stats.fragment_saved),
+        }))
+        return response
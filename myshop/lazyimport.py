@@ -0,0 +1,49 @@
+# myshop/lazyimport.py
+"""
+Defer heavy imports until first use.
+
+    stripe = lazy_import("stripe")
+
+binds a stand-in that imports the real module the first time an attribute is
+read or set (stripe.api_key = ..., stripe.checkout.Session.create(...)). A
+process that never takes a payment never pays for `import stripe` (~0.3s).
+`python manage.py profile_startup` shows what is still imported eagerly.
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name)  # thread-safe; later calls are a dict hit
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str):
+    """The module itself if something already imported it, else a LazyModule."""
+    return sys.modules.get(name) or LazyModule(name)
@@ -0,0 +1,179 @@
+# myshop/metrics.py
+"""
+Prometheus metrics shared by web and worker processes.
+
+When PROMETHEUS_MULTIPROC_DIR is set (prefork workers, several gunicorn
+workers) prometheus_client writes samples to files in that directory and
+the exporter aggregates them, so every process reports into one view.
+gunicorn.conf.py sets it for the web workers; it has to be in the
+environment before prometheus_client is imported, so a Django setting
+can't do it. Celery workers run one process each and export on their own
+CELERY_METRICS_PORT.
+
+Counters/histograms are updated inline (`python -m benchmarks -k metrics`
+times them). Gauges that describe shop state (unpaid orders, outbox
+backlog) are read from the database instead, so they are right whichever
+process serves /metrics; the aggregates are cached for
+METRICS_STATE_CACHE_SECONDS, so scrapers polling often, or several of them,
+cost two queries per interval rather than two per scrape.
+"""
+import os
+from datetime import timedelta
+
+from django.core.signals import request_finished
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, start_http_server
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# --- Celery tasks ---
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Task run time in seconds.",
+    ["task", "queue"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+TASK_SUCCEEDED = Counter("celery_task_succeeded_total", "Tasks that finished successfully.", ["task", "queue"])
+TASK_RETRIES = Counter("celery_task_retries_total", "Task retries requested.", ["task"])
+TASK_FAILURES = Counter("celery_task_failures_total", "Tasks that raised.", ["task", "exception"])
+
+# --- Shop ---
+CART_ADDS = Counter("shop_cart_adds_total", "Products added to (or updated in) a cart.")
+ORDERS_CREATED = Counter("shop_orders_created_total", "Orders created at checkout.", ["customer"])
+WEBHOOKS = Counter(
+    "shop_stripe_webhooks_total",
+    "Stripe webhook deliveries by event type and what we did with them.",
+    ["event_type", "outcome"],
+)
+RATELIMIT_REQUESTS = Counter(
+    "shop_ratelimit_requests_total", "Rate-limited endpoint requests by scope and decision.", ["scope", "result"]
+)
+STOCK_RESERVATIONS = Counter(
+    "shop_stock_reservations_total",
+    "Checkout stock holds: reserved, out_of_stock, released (expired unpaid) or oversold (paid too late).",
+    ["result"],
+)
+FRAGMENT_CACHE = Counter(
+    "shop_fragment_cache_total", "Cached template fragment lookups ({% fragment %}).", ["fragment", "result"]
+)
+EXTERNAL_CALL_DURATION = Histogram(
+    "shop_external_call_duration_seconds",
+    "Latency of outbound API calls (Stripe) in seconds.",
+    ["service", "operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2.5, 5, 10),
+)
+
+# --- Database connection pools (DB_POOL) ---
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Connections held by the pool, idle or in use.", ["alias"], multiprocess_mode="livesum"
+)
+DB_POOL_IDLE = Gauge("db_pool_connections_idle", "Idle connections in the pool.", ["alias"], multiprocess_mode="livesum")
+DB_POOL_WAITING = Gauge(
+    "db_pool_requests_waiting", "Callers queued for a connection right now.", ["alias"], multiprocess_mode="livesum"
+)
+DB_POOL_REQUESTS = Counter("db_pool_requests_total", "Connections requested from the pool.", ["alias"])
+DB_POOL_QUEUED = Counter("db_pool_requests_queued_total", "Requests that had to wait for a connection.", ["alias"])
+DB_POOL_WAIT = Counter("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", ["alias"])
+DB_POOL_ERRORS = Counter("db_pool_request_errors_total", "Requests that timed out waiting for a connection.", ["alias"])
+DB_POOL_LOST = Counter("db_pool_connections_lost_total", "Connections that failed the checkout health check.", ["alias"])
+
+
+def record_db_pool_stats():
+    """Move this process's psycopg pool counters into the DB_POOL_* metrics."""
+    from django.conf import settings
+    from django.db import connections
+
+    if not getattr(settings, "DB_POOL", False):
+        return
+    for alias in connections:
+        if not connections.settings[alias].get("OPTIONS", {}).get("pool"):
+            continue
+        stats = connections[alias].pool.pop_stats()
+        DB_POOL_CONNECTIONS.labels(alias).set(stats.get("pool_size", 0))
+        DB_POOL_IDLE.labels(alias).set(stats.get("pool_available", 0))
+        DB_POOL_WAITING.labels(alias).set(stats.get("requests_waiting", 0))
+        DB_POOL_REQUESTS.labels(alias).inc(stats.get("requests_num", 0))
+        DB_POOL_QUEUED.labels(alias).inc(stats.get("requests_queued", 0))
+        DB_POOL_WAIT.labels(alias).inc(stats.get("requests_wait_ms", 0) / 1000)
+        DB_POOL_ERRORS.labels(alias).inc(stats.get("requests_errors", 0))
+        DB_POOL_LOST.labels(alias).inc(stats.get("connections_lost", 0))
+
+
+def _record_db_pool_stats(**kwargs):
+    record_db_pool_stats()
+
+
+request_finished.connect(_record_db_pool_stats, dispatch_uid="myshop.metrics.db_pool")
+
+
+class ShopStateCollector:
+    """Gauges computed from the database (two aggregate queries, cached between scrapes)."""
+
+    cache_key = "metrics:shop_state"
+
+    def __init__(self, stale_after=timedelta(hours=1)):
+        self.stale_after = stale_after
+
+    def state(self, now) -> dict:
+        from django.conf import settings
+        from django.core.cache import cache
+        from django.db.models import Count, Min, Q
+
+        from orders.models import Order
+        from outbox.models import OutboxMessage
+
+        timeout = getattr(settings, "METRICS_STATE_CACHE_SECONDS", 30)
+        if timeout and (state := cache.get(self.cache_key)) is not None:
+            return state
+
+        state = Order.objects.filter(paid=False).aggregate(
+            unpaid=Count("id"),
+            stale=Count("id", filter=Q(created__lt=now - self.stale_after)),
+        )
+        pending = Q(failed_at__isnull=True)
+        state.update(OutboxMessage.objects.filter(sent_at__isnull=True).aggregate(
+            backlog=Count("id", filter=pending),
+            oldest=Min("created", filter=pending),
+            dead=Count("id", filter=~pending),
+        ))
+        if timeout:
+            cache.set(self.cache_key, state, timeout)
+        return state
+
+    def collect(self):
+        from django.utils import timezone
+
+        now = timezone.now()
+        state = self.state(now)
+
+        yield GaugeMetricFamily("shop_orders_unpaid", "Orders not (yet) marked paid.", value=state["unpaid"])
+        yield GaugeMetricFamily(
+            "shop_orders_unpaid_stale",
+            f"Unpaid orders older than {int(self.stale_after.total_seconds())}s (abandoned or missed webhooks).",
+            value=state["stale"],
+        )
+        yield GaugeMetricFamily("outbox_backlog", "Outbox messages not yet relayed to Celery.", value=state["backlog"])
+        # from the cached timestamp, so the age keeps growing between refreshes
+        age = (now - state["oldest"]).total_seconds() if state["oldest"] else 0
+        yield GaugeMetricFamily("outbox_oldest_age_seconds", "Age of the oldest unrelayed outbox message.", value=age)
+        yield GaugeMetricFamily("outbox_dead_letters", "Outbox messages the relay gave up on.", value=state["dead"])
+
+
+def get_registry():
+    """Registry to export: aggregated across processes in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def exposition() -> bytes:
+    """Text exposition for /metrics: process metrics plus database-backed shop gauges."""
+    state = CollectorRegistry(auto_describe=False)
+    state.register(ShopStateCollector())
+    return generate_latest(get_registry()) + generate_latest(state)
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0"):
+    """Serve /metrics for scraping from a process without a web server (Celery workers)."""
+    return start_http_server(port, addr=addr, registry=get_registry())
@@ -0,0 +1,80 @@
+# myshop/query_budgets.py
+"""
+Maximum number of SQL queries each view may run, keyed by URL name.
+
+Counts include session/auth lookups and savepoints. Measured with a
+6-item cart and a user with 5 orders, plus a little headroom; a view
+that needs more should be fixed (select_related/prefetch_related/
+bulk_create) rather than have its budget raised.
+
+Checked by myshop/tests/test_querybudget.py and, with DEBUG on, logged
+by QueryBudgetMiddleware. "namespace:*" covers a whole namespace.
+"""
+
+QUERY_BUDGETS = {
+    "home": 4,
+    "metrics": 3,
+
+    # shop
+    "shop:product_list": 7,
+    "shop:product_list_by_category": 8,
+    "shop:product_list_by_team": 8,
+    "shop:product_detail": 6,
+    "shop:search": 6,
+    "shop:contact": 4,
+    # limited drops: the status poll and holding page are cache-only once warm
+    "shop:drop_waiting": 2,
+    "shop:drop_status": 1,
+
+    # cart
+    "cart:cart_detail": 4,
+    # a visitor's first add: drops list (until cached), sizes, product, and the new
+    # session's savepoint + INSERT + release (no exists() check, see cart/sessions)
+    "cart:cart_add": 6,
+    "cart:cart_remove": 6,
+
+    # orders (order_create POST: session, order, items, outbox row, savepoints).
+    # Sized lines add two UPDATEs whatever their number: stock is taken from the
+    # shard rows and the variant rows in one statement each (inventory.take_lines),
+    # and those are two tables, so this is one more than an unsized checkout's 12.
+    "orders:order_create": 13,
+    "orders:admin_order_detail": 6,
+    "orders:admin_order_pdf": 6,
+    "orders:admin_sales": 6,  # rollup tables only: totals, days, teams, categories
+
+    # payment
+    "payment:process": 7,
+    "payment:completed": 10,  # includes the mark-paid fallback
+    "payment:canceled": 4,
+    # webhook: order, paid UPDATE, rollups (one UPDATE per row, or savepoint + INSERT
+    # for the day's first sale), outbox row, savepoints; one team and category here
+    "payment:stripe-webhook": 14,
+
+    # accounts
+    "accounts:signup": 6,
+    "accounts:register": 6,
+    "accounts:dashboard": 6,
+    "accounts:order_detail": 7,
+    "accounts:profile": 5,
+    "accounts:delete_account": 8,
+    "accounts:account": 4,
+
+    # django.contrib.auth.urls
+    "login": 6,
+    "logout": 4,
+    "password_change": 4,
+    "password_change_done": 3,
+    "password_reset": 4,
+    "password_reset_done": 3,
+    "password_reset_confirm": 4,
+    "password_reset_complete": 3,
+
+    # addresses
+    "addresses:list": 5,
+    "addresses:create": 5,
+    "addresses:update": 5,
+    "addresses:delete": 5,
+
+    # Django admin changelists/forms are not ours to tune
+    "admin:*": 30,
+}
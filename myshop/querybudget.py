@@ -0,0 +1,205 @@
+# myshop/querybudget.py
+"""
+Query budgets and N+1 detection.
+
+QueryRecorder is a DB execute_wrapper that remembers every query together
+with the template line (and project code line) that triggered it. Queries
+that share a *shape* (same SQL once parameters are stripped) and repeat
+more than N_PLUS_ONE_THRESHOLD times are reported as a likely N+1.
+
+Budgets live in myshop/query_budgets.py, keyed by URL name.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+from .query_budgets import QUERY_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+# our own instrumentation shows up in every stack; never blame it
+_SKIP_FILES = ("myshop/querybudget.py", "myshop/instrumentation.py")
+
+_IN_LIST = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def query_shape(sql: str) -> str:
+    """SQL with parameters, literals and IN-list lengths collapsed."""
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _STRING.sub("?", sql)
+    return _NUMBER.sub("?", sql)
+
+
+def _origin():
+    """Best-effort "who ran this query": (template line, project code line)."""
+    template_line = code_line = None
+    frame = sys._getframe(2)
+    while frame is not None and not (template_line and code_line):
+        if template_line is None:
+            node = frame.f_locals.get("self")
+            # type() rather than isinstance(): `self` may be a lazy object we must not evaluate
+            if issubclass(type(node), Node) and getattr(node, "origin", None) and getattr(node, "token", None):
+                template_line = f"{node.origin.template_name}:{node.token.lineno}"
+        if code_line is None:
+            filename = frame.f_code.co_filename
+            if (
+                filename.startswith(BASE_DIR)
+                and "site-packages" not in filename
+                and not filename.endswith(_SKIP_FILES)
+            ):
+                code_line = f"{Path(filename).relative_to(BASE_DIR)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return template_line, code_line
+
+
+@dataclass
+class RecordedQuery:
+    sql: str
+    shape: str
+    template_line: str | None
+    code_line: str | None
+
+
+@dataclass
+class RepeatedQuery:
+    shape: str
+    count: int
+    locations: list[str] = field(default_factory=list)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries: list[RecordedQuery] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        template_line, code_line = _origin()
+        self.queries.append(RecordedQuery(sql, query_shape(sql), template_line, code_line))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold: int | None = None) -> list[RepeatedQuery]:
+        """Shapes executed more than `threshold` times (likely N+1)."""
+        if threshold is None:
+            threshold = getattr(settings, "N_PLUS_ONE_THRESHOLD", 3)
+        counts = Counter(q.shape for q in self.queries)
+        found = []
+        for shape, count in counts.items():
+            if count <= threshold:
+                continue
+            locations = []
+            for q in self.queries:
+                if q.shape == shape:
+                    where = " / ".join(filter(None, [q.template_line, q.code_line])) or "unknown"
+                    if where not in locations:
+                        locations.append(where)
+            found.append(RepeatedQuery(shape, count, locations))
+        return found
+
+
+@contextmanager
+def record_queries():
+    """Record queries on every database connection for the duration of the block."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(recorder))
+        yield recorder
+
+
+def budget_for(view_name: str | None) -> int | None:
+    """Declared budget for a URL name; "namespace:*" entries act as a fallback."""
+    if not view_name:
+        return None
+    if view_name in QUERY_BUDGETS:
+        return QUERY_BUDGETS[view_name]
+    namespace = view_name.rpartition(":")[0]
+    return QUERY_BUDGETS.get(f"{namespace}:*") if namespace else None
+
+
+def describe(view_name, recorder: QueryRecorder, budget) -> list[str]:
+    """Human-readable problems for one request; empty if it's within budget."""
+    problems = []
+    if budget is not None and len(recorder) > budget:
+        problems.append(f"{view_name}: {len(recorder)} queries, budget is {budget}")
+    for rep in recorder.repeated():
+        problems.append(
+            f"{view_name}: possible N+1, {rep.count}x {rep.shape[:200]}\n"
+            f"    from: {'; '.join(rep.locations[:5])}"
+        )
+    return problems
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin:
+
+        with self.assertQueryBudget("shop:product_list"):
+            self.client.get(reverse("shop:product_list"))
+
+    Fails when the block exceeds QUERY_BUDGETS[view_name] or repeats a query shape.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, view_name, budget=None):
+        if budget is None:
+            budget = budget_for(view_name)
+        if budget is None:
+            self.fail(f"No query budget declared for {view_name!r} in myshop/query_budgets.py")
+        with record_queries() as recorder:
+            yield recorder
+        problems = describe(view_name, recorder, budget)
+        if problems:
+            self.fail("\n".join(problems))
+
+
+class QueryBudgetMiddleware:
+    """Dev-only: log views that blow their query budget or run N+1 queries."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        self._check(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # record on the request's sync_to_async thread, where the ORM runs
+        recording = record_queries()
+        recorder = await sync_to_async(recording.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.__exit__)(None, None, None)
+        self._check(request, recorder)
+        return response
+
+    def _check(self, request, recorder: QueryRecorder):
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else None
+        for problem in describe(view_name or request.path, recorder, budget_for(view_name)):
+            logger.warning(problem)
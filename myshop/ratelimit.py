@@ -0,0 +1,175 @@
+# myshop/ratelimit.py
+"""
+Token-bucket rate limits for endpoints that cost real database work.
+
+    @ratelimit("search")
+    def search(request): ...
+
+RATE_LIMITS["search"] = {"rate": "30/m", "burst": 20, "key": "ip"} gives
+every client a bucket of `burst` tokens, refilled at `rate`; each request
+takes one. `key` says who a bucket belongs to: "ip", "session" or "user"
+(the latter two fall back to the IP for visitors without one). An optional
+`methods` tuple limits only those methods. Scopes missing from RATE_LIMITS,
+or RATELIMIT_ENABLED=False, turn the decorator into a pass-through.
+
+Buckets live in the default cache. On Redis a bucket is updated by one Lua
+script call, so concurrent workers can't both spend the last token; other
+backends (local memory in development and tests) update it under a process
+lock. A throttled request gets a bare 429 with Retry-After before the view
+runs; shop_ratelimit_requests_total counts the decisions. If the cache is
+down, requests are let through.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .cache import redis_client
+from .metrics import RATELIMIT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# KEYS[1] = bucket; ARGV = refill per second, burst, ttl. Returns {allowed, tokens left}.
+_TAKE_TOKEN = """
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+_local_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # tokens per second
+    burst: int
+    key: str = "ip"
+    methods: tuple[str, ...] = ()
+
+    @classmethod
+    def parse(cls, config: dict) -> "Limit":
+        count, _, unit = config["rate"].partition("/")
+        rate = int(count) / _UNITS[unit[:1] or "s"]
+        return cls(rate, int(config.get("burst", count)), config.get("key", "ip"), tuple(config.get("methods", ())))
+
+    @property
+    def ttl(self) -> int:
+        """Seconds for an untouched bucket to refill completely (then it can be forgotten)."""
+        return max(1, math.ceil(self.burst / self.rate))
+
+    def retry_after(self, tokens: float) -> int:
+        return max(1, math.ceil((1 - tokens) / self.rate))
+
+
+def limit_for(scope: str) -> Limit | None:
+    if not getattr(settings, "RATELIMIT_ENABLED", True):
+        return None
+    config = getattr(settings, "RATE_LIMITS", {}).get(scope)
+    return Limit.parse(config) if config else None
+
+
+def client_ip(request) -> str:
+    """REMOTE_ADDR, or the address RATELIMIT_PROXY_COUNT trusted proxies saw."""
+    proxies = getattr(settings, "RATELIMIT_PROXY_COUNT", 0)
+    forwarded = [a.strip() for a in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if a.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def identity(request, key: str) -> str:
+    if key == "user":
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+    elif key == "session":
+        session = getattr(request, "session", None)
+        if session is not None and session.session_key:
+            return f"session:{session.session_key}"
+    return f"ip:{client_ip(request)}"
+
+
+def take_token(bucket: str, limit: Limit) -> tuple[bool, float]:
+    """Spend one token from `bucket`; returns (allowed, tokens left)."""
+    redis = redis_client(cache)
+    if redis is not None:
+        allowed, tokens = redis.eval(_TAKE_TOKEN, 1, cache.make_key(bucket), limit.rate, limit.burst, limit.ttl)
+        return bool(allowed), float(tokens)
+
+    with _local_lock:
+        now = time.time()
+        tokens, ts = cache.get(bucket) or (limit.burst, now)
+        tokens = min(limit.burst, tokens + max(0.0, now - ts) * limit.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(bucket, (tokens, now), limit.ttl)
+    return allowed, tokens
+
+
+def check(request, scope: str) -> HttpResponse | None:
+    """A 429 response if `request` is over the `scope` limit, else None."""
+    limit = limit_for(scope)
+    if limit is None or (limit.methods and request.method not in limit.methods):
+        return None
+    try:
+        allowed, tokens = take_token(f"ratelimit:{scope}:{identity(request, limit.key)}", limit)
+    except Exception:
+        logger.warning("Rate limit check for %s failed; letting the request through", scope, exc_info=True)
+        return None
+    RATELIMIT_REQUESTS.labels(scope, "allowed" if allowed else "throttled").inc()
+    if allowed:
+        return None
+    response = HttpResponse("Too many requests. Please slow down.\n", status=429, content_type="text/plain")
+    response["Retry-After"] = str(limit.retry_after(tokens))
+    return response
+
+
+def ratelimit(scope: str):
+    """Apply RATE_LIMITS[scope] to a sync or async view."""
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def _async_view(request, *args, **kwargs):
+                # the cache clients are sync
+                throttled = await sync_to_async(check)(request, scope)
+                if throttled is not None:
+                    return throttled
+                return await view(request, *args, **kwargs)
+
+            return _async_view
+
+        @functools.wraps(view)
+        def _view(request, *args, **kwargs):
+            throttled = check(request, scope)
+            if throttled is not None:
+                return throttled
+            return view(request, *args, **kwargs)
+
+        return _view
+
+    return decorator
@@ -3,7 +3,6 @@ from pathlib import Path
 import os
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from decouple import config
-import dj_database_url
 import ssl
 import logging
 
@@ -60,17 +59,21 @@ INSTALLED_APPS = [
     "payment.apps.PaymentConfig",
     "accounts",
     "addresses",
-
-    # Cloudinary (media storage)
-    "cloudinary",
-    "cloudinary_storage",
+    "mailer",
+    "outbox",
 ]
 
+# Route the catalog, checkout and webhook URLs to their async views
+# (myshop/asyncviews.py). Only worth it under asgi.py; leave off for wsgi.py.
+ASYNC_VIEWS = config("ASYNC_VIEWS", cast=bool, default=False)
+
 # --- Middleware ---
 MIDDLEWARE = [
+    "myshop.instrumentation.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "myshop.middleware.WhiteNoiseMiddleware",
     "django.middleware.gzip.GZipMiddleware",  
+    "myshop.db_routers.ReplicaStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -80,6 +83,28 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = "myshop.urls"
+TEST_RUNNER = "myshop.test_runner.ShopTestRunner"
+
+# Share of requests that get Server-Timing + a perf log line (0.0–1.0)
+PERF_SAMPLE_RATE = config("PERF_SAMPLE_RATE", cast=float, default=1.0 if DEBUG else 0.05)
+# Server-Timing gives away query counts and timings, so only staff users and
+# these addresses (client_ip, so behind RATELIMIT_PROXY_COUNT proxies) get it.
+SERVER_TIMING_ALLOWED_IPS = config("SERVER_TIMING_ALLOWED_IPS", default="127.0.0.1,::1").split(",")
+
+# /metrics (Prometheus). With METRICS_TOKEN set, scrapers must send
+# "Authorization: Bearer <token>"; otherwise only these addresses (client_ip,
+# so behind RATELIMIT_PROXY_COUNT proxies) may scrape.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1,::1").split(",")
+# The shop-state gauges (unpaid orders, outbox backlog) are database aggregates;
+# scrapes within this many seconds reuse one result (0 queries on every scrape).
+METRICS_STATE_CACHE_SECONDS = config("METRICS_STATE_CACHE_SECONDS", cast=int, default=30)
+
+# Query budgets (myshop/query_budgets.py): warn in dev, enforced in tests.
+# A query shape repeated more than N_PLUS_ONE_THRESHOLD times is an N+1.
+N_PLUS_ONE_THRESHOLD = config("N_PLUS_ONE_THRESHOLD", cast=int, default=3)
+if DEBUG:
+    MIDDLEWARE.insert(1, "myshop.querybudget.QueryBudgetMiddleware")
 
 # --- Templates ---
 TEMPLATES = [
@@ -106,12 +131,56 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Concurrent writers (runserver threads, the thread task pool, the load
+        # test) wait for the write lock instead of failing with "database is locked".
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
+
+# DB_POOL=True: a psycopg 3 connection pool per process instead of one
+# persistent connection per thread; a connection is checked before it is handed
+# out. Each gunicorn worker and Celery child gets its own pool, so
+# DB_POOL_MAX_SIZE x processes must stay under Postgres' max_connections.
+DB_POOL = config("DB_POOL", cast=bool, default=False)
+DB_POOL_OPTIONS = {
+    "min_size": config("DB_POOL_MIN_SIZE", cast=int, default=2),
+    "max_size": config("DB_POOL_MAX_SIZE", cast=int, default=10),
+    # seconds a request waits for a free connection before PoolTimeout
+    "timeout": config("DB_POOL_TIMEOUT", cast=float, default=10),
+    "max_idle": 300,
+    "max_lifetime": 3600,
+}
+
+
+def _database(url):
+    import dj_database_url  # only when a URL is configured
+
+    sqlite = url.startswith("sqlite")
+    if DB_POOL and not sqlite:
+        db = dj_database_url.parse(url, conn_max_age=0, conn_health_checks=True, ssl_require=True)
+        db.setdefault("OPTIONS", {})["pool"] = dict(DB_POOL_OPTIONS)
+        return db
+    return dj_database_url.parse(url, conn_max_age=600, ssl_require=not sqlite)
+
+
 if os.getenv("DATABASE_URL"):
-    DATABASES["default"] = dj_database_url.parse(
-        os.environ["DATABASE_URL"], conn_max_age=600, ssl_require=True
-    )
+    DATABASES["default"] = _database(os.environ["DATABASE_URL"])
+
+# Read replicas (myshop/db_routers.py): catalog and account-history reads go to
+# these, everything else to "default". sqlite:///replica.sqlite3 works locally.
+REPLICA_DATABASES = []
+for i, url in enumerate(filter(None, config("DATABASE_REPLICA_URLS", default="").split(",")), start=1):
+    alias = f"replica{i}"
+    DATABASES[alias] = _database(url.strip())
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ["myshop.db_routers.ReplicaRouter"]
+REPLICA_APPS = ("shop",)
+# How long after a write a visitor's reads stay on the primary
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", cast=int, default=5)
+# Admin changelists on PostgreSQL show the planner's row estimate instead of
+# running COUNT(*) once it is at least this many rows (myshop/changelists.py)
+ESTIMATED_COUNT_THRESHOLD = config("ESTIMATED_COUNT_THRESHOLD", cast=int, default=10_000)
 
 # --- Internationalization ---
 LANGUAGE_CODE = "en-us"
@@ -142,6 +211,9 @@ else:
         "default": {"BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage"},
         "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
     }
+    # Cloudinary (media storage). Only installed where it is the backend, so
+    # development, tests and CI don't import the SDK at startup.
+    INSTALLED_APPS += ["cloudinary", "cloudinary_storage"]
 
 # --- Defaults ---
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -155,9 +227,94 @@ STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="").strip()
 STRIPE_API_VERSION = "2024-04-10"
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="").strip()
 STRIPE_CURRENCY = "gbp"
+# Point at a local stub (python -m loadtest) instead of api.stripe.com
+STRIPE_API_BASE = config("STRIPE_API_BASE", default="https://api.stripe.com")
+# How far behind the stored cursor the reconciliation job re-scans (seconds).
+# Checkout Sessions can be paid up to 24h after they are created.
+STRIPE_RECONCILE_LOOKBACK = config("STRIPE_RECONCILE_LOOKBACK", cast=int, default=24 * 60 * 60)
 
-# --- Celery ---
+# --- Redis ---
 REDIS_URL = config("REDIS_TLS_URL", default=config("REDIS_URL", default="")).strip()
+
+# --- Cache ---
+# Per-process LRU in front of Redis (myshop/cache.py); plain local memory
+# when there is no Redis (development, tests).
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "myshop.cache.TieredCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "myshop",
+            "TIMEOUT": 300,
+            "OPTIONS": {
+                "L1_MAX_ENTRIES": config("CACHE_L1_MAX_ENTRIES", cast=int, default=1000),
+                "L1_TIMEOUT": config("CACHE_L1_TIMEOUT", cast=int, default=30),
+                "LOCK_TIMEOUT": 10,
+                # Heroku's rediss:// uses a self-signed certificate (same as Celery below)
+                "L2_OPTIONS": {"ssl_cert_reqs": None} if REDIS_URL.startswith("rediss://") else {},
+            },
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "myshop"}}
+
+# --- Catalog caches and warm-up ---
+# Sidebar, popular teams and first listing pages are cached (shop/catalog.py)
+CATALOG_PAGE_SIZE = config("CATALOG_PAGE_SIZE", cast=int, default=48)
+CATALOG_CACHE_TIMEOUT = config("CATALOG_CACHE_TIMEOUT", cast=int, default=300)
+# product detail pages cache the product row itself; saving the product drops it
+PRODUCT_CACHE_TIMEOUT = config("PRODUCT_CACHE_TIMEOUT", cast=int, default=300)
+# {% fragment %} blocks that are cached, with their TTLs in seconds; any catalog
+# change refreshes them early. Leave a name out to render it every time.
+FRAGMENT_CACHE = {
+    "header": 3600,
+    "category_sidebar": 600,
+    "popular_teams": 600,
+}
+# Limited drops (shop/drops.py): how long an admitted shopper has to buy, how
+# long a queue lives, and how often the holding page polls
+DROP_ADMISSION_SECONDS = config("DROP_ADMISSION_SECONDS", cast=int, default=20 * 60)
+DROP_QUEUE_SECONDS = config("DROP_QUEUE_SECONDS", cast=int, default=6 * 3600)
+DROP_POLL_SECONDS = config("DROP_POLL_SECONDS", cast=int, default=5)
+# Size stock taken at checkout is held this long for payment (orders/stock.py)
+STOCK_RESERVATION_MINUTES = config("STOCK_RESERVATION_MINUTES", cast=int, default=30)
+# Shard rows the admin's "spread stock" action splits a hot variant into
+STOCK_SHARDS = config("STOCK_SHARDS", cast=int, default=8)
+# Run myshop/warmup.py as each web worker boots (`manage.py warmup` runs it by hand)
+WARMUP_ON_STARTUP = config("WARMUP_ON_STARTUP", cast=bool, default=False)
+
+# --- Rate limits ---
+# Token buckets per view (myshop/ratelimit.py): `rate` refills the bucket,
+# `burst` is its size, `key` says who owns it: ip, session or user.
+RATELIMIT_ENABLED = config("RATELIMIT_ENABLED", cast=bool, default=True)
+RATE_LIMITS = {
+    "search": {"rate": "30/m", "burst": 20, "key": "ip"},
+    "cart": {"rate": "60/m", "burst": 30, "key": "session"},
+    "checkout": {"rate": "10/m", "burst": 5, "key": "user", "methods": ("POST",)},
+    # new places in a drop's queue (shop/drops.py); polls with a ticket aren't counted
+    "drop_ticket": {"rate": "10/h", "burst": 5, "key": "ip"},
+}
+# Proxies in front of the app that append to X-Forwarded-For (Heroku's router is one)
+RATELIMIT_PROXY_COUNT = config("RATELIMIT_PROXY_COUNT", cast=int, default=0 if DEBUG else 1)
+
+# --- Sessions ---
+# Sessions are only stored once they hold a cart, an order, a login or a
+# message (cart/sessions); SESSION_STORE picks where: db, cache, cached_db or
+# signed_cookies.
+SESSION_ENGINE = "cart.sessions." + config("SESSION_STORE", default="cached_db" if REDIS_URL else "db")
+SESSION_SERIALIZER = "cart.sessions.CompactJSONSerializer"
+SESSION_PERSIST_KEYS = (CART_SESSION_ID, "order_id", "_auth_user_id", "_messages")
+if REDIS_URL:
+    # straight to Redis: a per-process L1 copy of a session could be stale
+    CACHES["sessions"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "myshop",
+        "OPTIONS": CACHES["default"]["OPTIONS"]["L2_OPTIONS"],
+    }
+    SESSION_CACHE_ALIAS = "sessions"
+
+# --- Celery ---
 CELERY_BROKER_URL = config("CELERY_BROKER_URL", default=REDIS_URL).strip()
 CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND", default=CELERY_BROKER_URL).strip()
 
@@ -170,10 +327,50 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_TASK_ALWAYS_EAGER = config("CELERY_TASK_ALWAYS_EAGER", cast=bool, default=False)
 CELERY_TASK_EAGER_PROPAGATES = config("CELERY_TASK_EAGER_PROPAGATES", cast=bool, default=False)
 
+# How tasks run (see myshop.celery.get_execution_mode):
+#   eager  - inline in the caller; the test runner forces this
+#   thread - in-process thread pool, for a single dyno without a worker
+#   worker - published to the broker and run by `celery worker`
+TASK_EXECUTION_MODE = config(
+    "TASK_EXECUTION_MODE",
+    default="eager" if CELERY_TASK_ALWAYS_EAGER else ("worker" if CELERY_BROKER_URL else "thread"),
+)
+TASK_THREAD_WORKERS = config("TASK_THREAD_WORKERS", cast=int, default=2)
+# Outbox relay: in dev (single process) publish right after commit instead of
+# relying on a separate `manage.py relay_outbox --loop` process. Thread mode
+# always does, and runs CELERY_BEAT_SCHEDULE in-process (myshop.celery.PeriodicRunner).
+OUTBOX_RELAY_ON_COMMIT = config("OUTBOX_RELAY_ON_COMMIT", cast=bool, default=DEBUG)
+OUTBOX_BATCH_SIZE = config("OUTBOX_BATCH_SIZE", cast=int, default=100)
+OUTBOX_RETENTION_DAYS = config("OUTBOX_RETENTION_DAYS", cast=int, default=7)
+# Tries before a message that fails on its own (not a broker outage) is dead-lettered.
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", cast=int, default=5)
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-stripe-payments": {
+        "task": "payment.tasks.reconcile_stripe_payments",
+        "schedule": config("STRIPE_RECONCILE_INTERVAL", cast=int, default=15 * 60),
+    },
+    "send-queued-mail": {
+        "task": "mailer.tasks.send_queued_mail",
+        "schedule": config("MAILER_DRAIN_INTERVAL", cast=int, default=30),
+    },
+    "release-expired-reservations": {
+        "task": "orders.tasks.release_expired_reservations",
+        "schedule": config("STOCK_RELEASE_INTERVAL", cast=int, default=60),
+    },
+}
+
 # --- Email ---
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "dev@example.com"
 
+# Outgoing mail queue (mailer app): batched sends over one connection
+MAILER_BATCH_SIZE = config("MAILER_BATCH_SIZE", cast=int, default=50)
+MAILER_MAX_PER_MINUTE = config("MAILER_MAX_PER_MINUTE", cast=int, default=120)  # provider quota
+MAILER_MAX_ATTEMPTS = config("MAILER_MAX_ATTEMPTS", cast=int, default=5)
+MAILER_RETRY_BACKOFF = config("MAILER_RETRY_BACKOFF", cast=int, default=60)  # seconds, doubles per attempt
+# seconds a drainer holds the rows it claimed; rows still "sending" after that are sent again
+MAILER_LEASE_SECONDS = config("MAILER_LEASE_SECONDS", cast=int, default=300)
+
 # --- Auth redirects ---
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "accounts:dashboard"
@@ -187,15 +384,22 @@ LOGGING = {
     "formatters": {
         "simple": {"format": "[{levelname}] {name}: {message}", "style": "{"},
         "verbose": {"format": "[{levelname}] {asctime} {name} | {message}", "style": "{"},
+        # perf lines are already JSON; keep them one machine-parseable line each
+        "structured": {"format": "{message}", "style": "{"},
     },
     "handlers": {
         "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+        "perf_console": {"class": "logging.StreamHandler", "formatter": "structured"},
     },
     "loggers": {
         "payment": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
         "orders": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
         "cart": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
         "shop": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+        "mailer": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+        "outbox": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+        "myshop.perf": {"handlers": ["perf_console"], "level": "INFO", "propagate": False},
+        "myshop.querybudget": {"handlers": ["console"], "level": "WARNING", "propagate": False},
         "": {"handlers": ["console"], "level": LOG_LEVEL},
     },
 }
@@ -0,0 +1,93 @@
+# myshop/startup.py
+"""
+Measure what a cold process imports on the way to serving its first request.
+
+profile_startup() runs `python -X importtime` in a fresh interpreter that
+calls django.setup() and (by default) loads the URLconf, which is what a web
+dyno does before it can answer. Only imports made after the interpreter
+itself is up are counted.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MARKER = "--myshop-startup--"
+
+_CHILD = f"""
+import sys, time
+sys.stderr.write({MARKER!r} + "\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+import django
+django.setup()
+if {{load_urls}}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+print(time.perf_counter() - start)
+"""
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # 0 = imported directly by the startup code
+
+
+@dataclass
+class StartupProfile:
+    wall_ms: float
+    imports: list[ImportTime]
+
+    @property
+    def import_ms(self) -> float:
+        """Total import time: the cumulative time of every top-level import."""
+        return sum(i.cumulative_us for i in self.imports if i.depth == 0) / 1000
+
+    def modules(self) -> set[str]:
+        return {i.module for i in self.imports}
+
+    def top(self, n: int = 25, key: str = "cumulative") -> list[ImportTime]:
+        attr = "self_us" if key == "self" else "cumulative_us"
+        return sorted(self.imports, key=lambda i: getattr(i, attr), reverse=True)[:n]
+
+    def by_package(self) -> list[tuple[str, float]]:
+        """(top-level package, milliseconds) summed over self times, slowest first."""
+        totals: dict[str, int] = defaultdict(int)
+        for i in self.imports:
+            totals[i.module.partition(".")[0]] += i.self_us
+        return sorted(((pkg, us / 1000) for pkg, us in totals.items()), key=lambda t: t[1], reverse=True)
+
+
+def parse_importtime(stderr: str) -> list[ImportTime]:
+    """Rows of `-X importtime` output after MARKER (everything if it's absent)."""
+    text = stderr.split(MARKER, 1)[-1]
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append(ImportTime(name.strip(), int(self_us), int(cumulative), depth))
+    return rows
+
+
+def profile_startup(load_urls: bool = True, settings_module: str | None = None, env: dict | None = None) -> StartupProfile:
+    """Start a fresh interpreter, set Django up in it, and report its imports."""
+    child_env = {**os.environ, **(env or {})}
+    child_env["DJANGO_SETTINGS_MODULE"] = settings_module or os.environ.get("DJANGO_SETTINGS_MODULE", "myshop.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(load_urls=bool(load_urls))],
+        cwd=BASE_DIR, env=child_env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"startup failed:\n{result.stderr[-2000:]}")
+    wall = float(result.stdout.strip().splitlines()[-1])
+    return StartupProfile(round(wall * 1000, 1), parse_importtime(result.stderr))
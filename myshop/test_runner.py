@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class ShopTestRunner(DiscoverRunner):
+    """
+    Default test runner, with Celery tasks always run inline, rate limits
+    off (every test client is 127.0.0.1) and no request sampling, so query
+    counts are the views' own; tests of those features turn them back on.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.TASK_EXECUTION_MODE = "eager"
+        settings.RATELIMIT_ENABLED = False
+        settings.PERF_SAMPLE_RATE = 0.0
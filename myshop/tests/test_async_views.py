@@ -0,0 +1,164 @@
+import asyncio
+import importlib
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import clear_url_caches, resolve, reverse
+
+from loadtest.stripe_stub import sign_payload
+from myshop.asyncviews import pick
+from orders.models import Order, OrderItem
+from outbox.models import OutboxMessage
+from shop.models import Category, Product, Team
+
+
+def reload_urlconfs():
+    """Rebuild the URLconfs so pick() sees the current ASYNC_VIEWS."""
+    for name in ("shop.urls", "payment.urls", settings.ROOT_URLCONF):
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+class PickTests(SimpleTestCase):
+    def test_sync_views_unless_async_views_is_on(self):
+        def sync_view(request): ...
+
+        async def async_view(request): ...
+
+        self.assertIs(pick(sync_view, async_view), sync_view)
+        with self.settings(ASYNC_VIEWS=True):
+            self.assertIs(pick(sync_view, async_view), async_view)
+
+
+@override_settings(
+    ASYNC_VIEWS=True,
+    STRIPE_SECRET_KEY="sk_test_123",
+    STRIPE_PUBLISHABLE_KEY="pk_test_123",
+    STRIPE_WEBHOOK_SECRET="whsec_test",
+)
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # registered first so it runs last, once the settings override is undone
+        cls.addClassCleanup(reload_urlconfs)
+        super().setUpClass()
+        reload_urlconfs()
+
+    @classmethod
+    def setUpTestData(cls):
+        cat = Category.objects.create(name="Shirts", slug="shirts")
+        team = Team.objects.create(name="Rovers", slug="rovers")
+        cls.product = Product.objects.create(
+            category=cat, team=team, name="Home Shirt", slug="home-shirt",
+            price=Decimal("49.99"), available=True,
+        )
+        cls.order = Order.objects.create(
+            first_name="A", last_name="B", email="a@example.com",
+            address="1 Street", postal_code="SW1A 1AA", city="London",
+        )
+        OrderItem.objects.create(order=cls.order, product=cls.product, price=Decimal("49.99"), quantity=1)
+
+    def setUp(self):
+        cache.clear()
+
+    async def put_order_in_session(self):
+        session = await self.async_client.asession()
+        await session.aset("order_id", self.order.id)
+        await session.asave()
+
+    def test_urls_route_to_the_async_views(self):
+        self.assertEqual(resolve(reverse("shop:product_list")).func.__name__, "product_list_async")
+        self.assertEqual(resolve(reverse("payment:process")).func.__name__, "payment_process_async")
+        self.assertEqual(resolve(reverse("payment:stripe-webhook")).func.__name__, "stripe_webhook_async")
+
+    async def test_catalog_pages(self):
+        response = await self.async_client.get(reverse("shop:product_list"))
+        self.assertContains(response, "Home Shirt")
+
+        response = await self.async_client.get(reverse("shop:product_list_by_team", args=["rovers"]))
+        self.assertContains(response, "Home Shirt")
+
+        url = reverse("shop:product_detail", args=[self.product.id, "home-shirt"])
+        self.assertContains(await self.async_client.get(url), "Home Shirt")
+
+        url = reverse("shop:product_detail", args=[self.product.id, "wrong-slug"])
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+        response = await self.async_client.get(reverse("shop:search"), {"q": "rovers"})
+        self.assertContains(response, "Home Shirt")
+
+    @patch("payment.views.stripe.checkout.Session.create_async", new_callable=AsyncMock)
+    async def test_payment_process_creates_the_session_without_blocking(self, create):
+        create.return_value = SimpleNamespace(url="https://stripe.example/s", payment_intent="pi_1", id="cs_1")
+        await self.put_order_in_session()
+
+        response = await self.async_client.post(reverse("payment:process"))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], "https://stripe.example/s")
+        self.assertEqual(create.await_args.kwargs["line_items"][0]["price_data"]["unit_amount"], 4999)
+        self.assertEqual((await Order.objects.aget(id=self.order.id)).stripe_id, "pi_1")
+
+    async def test_concurrent_checkouts_overlap_on_stripe(self):
+        in_flight = 0
+        both_waiting = asyncio.Event()
+
+        async def create_async(**params):
+            nonlocal in_flight
+            in_flight += 1
+            if in_flight == 2:
+                both_waiting.set()
+            # a sync view would never get here twice at once
+            await asyncio.wait_for(both_waiting.wait(), timeout=5)
+            return SimpleNamespace(url="https://stripe.example/s", payment_intent=None, id="cs_1")
+
+        await self.put_order_in_session()
+        with patch("payment.views.stripe.checkout.Session.create_async", create_async):
+            responses = await asyncio.gather(
+                self.async_client.post(reverse("payment:process")),
+                self.async_client.post(reverse("payment:process")),
+            )
+        self.assertEqual([r.status_code for r in responses], [302, 302])
+
+    @patch("payment.views.stripe.checkout.Session.retrieve_async", new_callable=AsyncMock)
+    async def test_payment_completed_falls_back_to_stripe(self, retrieve):
+        retrieve.return_value = {
+            "payment_status": "paid", "payment_intent": "pi_9", "client_reference_id": str(self.order.id),
+        }
+
+        response = await self.async_client.get(reverse("payment:completed"), {"session_id": "cs_9"})
+
+        self.assertEqual(response.status_code, 200)
+        order = await Order.objects.aget(id=self.order.id)
+        self.assertTrue(order.paid)
+        self.assertEqual(order.stripe_id, "pi_9")
+        self.assertEqual(await OutboxMessage.objects.acount(), 1)
+
+    async def test_webhook_marks_the_order_paid(self):
+        payload = json.dumps({
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": "cs_2", "mode": "payment", "payment_status": "paid",
+                "payment_intent": "pi_2", "client_reference_id": str(self.order.id),
+            }},
+        }).encode()
+
+        response = await self.async_client.post(
+            reverse("payment:stripe-webhook"), payload, content_type="application/json",
+            headers={"Stripe-Signature": sign_payload(payload, "whsec_test")},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue((await Order.objects.aget(id=self.order.id)).paid)
+
+    async def test_webhook_rejects_bad_signatures(self):
+        response = await self.async_client.post(
+            reverse("payment:stripe-webhook"), b"{}", content_type="application/json",
+            headers={"Stripe-Signature": "t=1,v1=bad"},
+        )
+        self.assertEqual(response.status_code, 400)
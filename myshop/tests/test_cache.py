@@ -0,0 +1,193 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from myshop.cache import LRU, TieredCache
+from shop.models import Category, Product
+
+
+def tiered(location="tiered-test", **options):
+    """A TieredCache over LocMemCache; two with the same location act like two processes."""
+    return TieredCache(location, {
+        "OPTIONS": {"L2_BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCK_TIMEOUT": 2, **options},
+    })
+
+
+class LRUTests(SimpleTestCase):
+    def test_bounded_and_least_recently_used_goes_first(self):
+        lru = LRU(2)
+        lru.set("a", 1, None)
+        lru.set("b", 2, None)
+        lru.get("a")
+        lru.set("c", 3, None)
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIs(lru.get("b", None), None)
+        self.assertEqual(len(lru), 2)
+
+    def test_expiry(self):
+        lru = LRU(10)
+        lru.set("a", 1, 0)
+        self.assertIsNone(lru.get("a", None))
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = tiered()
+        self.addCleanup(self.cache.clear)
+
+    def test_l1_serves_repeat_reads(self):
+        self.cache.set("k", "v")
+        with patch.object(self.cache.l2, "get", wraps=self.cache.l2.get) as l2_get:
+            self.assertEqual(self.cache.get("k"), "v")
+            self.assertEqual(self.cache.get("k"), "v")
+        l2_get.assert_not_called()
+
+    def test_other_process_reads_through_l2(self):
+        other = tiered()
+        self.cache.set("k", "v")
+        self.assertEqual(other.get("k"), "v")
+        self.assertTrue(other.has_key("k"))
+        self.cache.delete("k")
+        self.assertIsNone(tiered().get("k"))
+
+    def test_writes_are_broadcast_and_evict_other_l1s(self):
+        redis = MagicMock()
+        with patch.object(TieredCache, "_redis", return_value=redis):
+            self.cache.set("k", "v")
+        channel, message = redis.publish.call_args.args
+        self.assertEqual(channel, "myshop:cache:invalidate")
+
+        other = tiered()
+        other.get("k")  # now in its L1
+        other._on_invalidate(message)
+        self.assertEqual(len(other.l1), 0)
+
+        # a process ignores its own broadcasts
+        self.cache._on_invalidate(message)
+        self.assertEqual(len(self.cache.l1), 1)
+
+    def test_clear_is_broadcast(self):
+        other = tiered()
+        other.set("k", "v")
+        other._on_invalidate(json.dumps({"origin": "elsewhere", "clear": True}))
+        self.assertEqual(len(other.l1), 0)
+
+    def test_incr_bypasses_l1(self):
+        self.cache.set("n", 1)
+        other = tiered()
+        other.incr("n")
+        self.cache.l1.pop(self.cache.make_key("n"))  # as the broadcast would
+        self.assertEqual(self.cache.get("n"), 2)
+
+
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def slow_compute(self, value="fresh"):
+        def compute():
+            with self.lock:
+                self.calls += 1
+            time.sleep(0.1)
+            return value
+        return compute
+
+    def hammer(self, caches, key, compute, **kwargs):
+        results = []
+        threads = [
+            threading.Thread(target=lambda c=c: results.append(c.get_or_compute(key, compute, **kwargs)))
+            for c in caches
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_cold_key_computed_once_per_process(self):
+        c = tiered("stampede-1")
+        results = self.hammer([c] * 10, "drop", self.slow_compute())
+        self.assertEqual(results, ["fresh"] * 10)
+        self.assertEqual(self.calls, 1)
+
+    def test_cold_key_computed_once_across_processes(self):
+        processes = [tiered("stampede-2") for _ in range(5)]
+        results = self.hammer(processes * 2, "drop", self.slow_compute())
+        self.assertEqual(results, ["fresh"] * 10)
+        self.assertEqual(self.calls, 1)
+
+    def test_lock_is_released_only_by_its_holder(self):
+        c, other = tiered("stampede-4"), tiered("stampede-4")
+        mine = c._acquire("drop", None)
+        self.assertIsNone(other._acquire("drop", None))
+        c.l2.delete(c._lock_key("drop"))  # our lock timed out mid-compute...
+        theirs = other._acquire("drop", None)  # ...and another caller took it
+
+        c._release("drop", mine, None)
+        self.assertIsNone(c._acquire("drop", None))  # still theirs
+
+        other._release("drop", theirs, None)
+        self.assertIsNotNone(c._acquire("drop", None))
+
+    def test_release_on_redis_compares_and_deletes_in_one_step(self):
+        c = tiered("stampede-5")
+        token = c._acquire("drop", None)
+        redis = MagicMock()
+        with patch.object(TieredCache, "_redis", return_value=redis):
+            c._release("drop", token, None)
+        script, numkeys, key, arg = redis.eval.call_args.args
+        self.assertIn('redis.call("GET", KEYS[1]) == ARGV[1]', script)
+        self.assertEqual((numkeys, key, arg), (1, c.l2.make_key("lock:drop"), token))
+
+    def test_stale_value_served_while_one_refresh_runs(self):
+        c = tiered("stampede-3")
+        c.get_or_compute("drop", lambda: "old", timeout=0.05, stale_ttl=30)
+        time.sleep(0.1)
+
+        start = time.perf_counter()
+        results = self.hammer([c] * 5, "drop", self.slow_compute("new"), timeout=60, stale_ttl=30)
+        self.assertEqual(results, ["old"] * 5)
+        self.assertLess(time.perf_counter() - start, 0.1)  # nobody waited for compute
+
+        c._refresher.shutdown(wait=True)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(c.get_or_compute("drop", self.slow_compute("newer")), "new")
+
+
+class ProductDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cat = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=cat, name="Drop", slug="drop", price="10.00")
+
+    def product_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.product.get_absolute_url())
+        self.assertEqual(resp.status_code, 200)
+        return sum('FROM "shop_product"' in q["sql"] for q in ctx.captured_queries)
+
+    def test_detail_is_cached_and_invalidated_on_save(self):
+        self.assertEqual(self.product_queries(), 1)
+        self.assertEqual(self.product_queries(), 0)
+
+        self.product.name = "Drop (restocked)"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.product_queries(), 1)
+        self.assertContains(self.client.get(self.product.get_absolute_url()), "Drop (restocked)")
+
+    def test_wrong_slug_or_unavailable_is_404(self):
+        wrong_slug = reverse("shop:product_detail", args=[self.product.id, "nope"])
+        self.assertEqual(self.client.get(wrong_slug).status_code, 404)
+        self.product.available = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get(self.product.get_absolute_url()).status_code, 404)
@@ -0,0 +1,58 @@
+from celery import shared_task
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+
+from myshop.celery import app
+
+
+@shared_task
+def _boom():
+    raise ValueError("nope")
+
+
+@shared_task
+def _fine():
+    return "ok"
+
+
+class QueueTopologyTests(SimpleTestCase):
+    def route(self, name):
+        return app.amqp.router.route({}, name)
+
+    def test_payment_tasks_go_to_priority_payments_queue(self):
+        route = self.route("payment.tasks.payment_completed")
+        self.assertEqual(route["queue"].name, "payments")
+        self.assertEqual(route["priority"], 0)
+
+    def test_reconciliation_goes_to_bulk_queue(self):
+        self.assertEqual(self.route("payment.tasks.reconcile_stripe_payments")["queue"].name, "bulk")
+
+    def test_module_routes(self):
+        self.assertEqual(self.route("orders.tasks.order_created")["queue"].name, "orders")
+        self.assertEqual(self.route("mailer.tasks.send_queued_mail")["queue"].name, "mail")
+        self.assertEqual(self.route("shop.tasks.anything")["queue"].name, "default")
+
+    def test_results_ignored_by_default(self):
+        self.assertTrue(app.conf.task_ignore_result)
+        self.assertTrue(app.tasks["orders.tasks.order_created"].ignore_result)
+
+
+class TaskMetricsTests(SimpleTestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_success_records_duration_and_count(self):
+        labels = {"task": _fine.name, "queue": "default"}
+        before = self.sample("celery_task_succeeded_total", **labels)
+        before_count = self.sample("celery_task_duration_seconds_count", **labels)
+
+        _fine.apply()
+
+        self.assertEqual(self.sample("celery_task_succeeded_total", **labels), before + 1)
+        self.assertEqual(self.sample("celery_task_duration_seconds_count", **labels), before_count + 1)
+
+    def test_failure_counted_by_exception(self):
+        labels = {"task": _boom.name, "exception": "ValueError"}
+        before = self.sample("celery_task_failures_total", **labels)
+        _boom.apply(throw=False)
+        self.assertEqual(self.sample("celery_task_failures_total", **labels), before + 1)
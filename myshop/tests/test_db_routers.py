@@ -0,0 +1,107 @@
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.connection import ConnectionDoesNotExist
+
+from myshop.db_routers import (
+    STICKY_COOKIE,
+    ReplicaRouter,
+    ReplicaStickinessMiddleware,
+    replica_reads,
+    use_primary,
+)
+from orders.models import Order, OrderItem
+from shop.models import Category, Product, Team
+
+
+@override_settings(REPLICA_DATABASES=["replica1", "replica2"], REPLICA_APPS=("shop",))
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_catalog_reads_go_to_a_replica(self):
+        self.assertIn(self.router.db_for_read(Product), {"replica1", "replica2"})
+
+    def test_other_reads_and_all_writes_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Order), "default")
+        self.assertEqual(self.router.db_for_write(Product), "default")
+
+    def test_replica_reads_opens_up_other_models(self):
+        with replica_reads():
+            self.assertIn(self.router.db_for_read(Order), {"replica1", "replica2"})
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+    def test_use_primary_wins(self):
+        with replica_reads(), use_primary():
+            self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_no_migrations_on_replicas(self):
+        self.assertTrue(self.router.allow_migrate("default", "shop"))
+        self.assertFalse(self.router.allow_migrate("replica1", "shop"))
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_everything_on_the_primary_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+
+@override_settings(REPLICA_DATABASES=["replica1"], REPLICA_STICKY_SECONDS=5)
+class StickinessMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.seen = []
+
+        def view(request):
+            self.seen.append(ReplicaRouter().db_for_read(Product))
+            return HttpResponse()
+
+        self.middleware = ReplicaStickinessMiddleware(view)
+        self.factory = RequestFactory()
+
+    def test_reads_use_the_replica(self):
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(self.seen, ["replica1"])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_writes_pin_the_request_and_set_the_cookie(self):
+        response = self.middleware(self.factory.post("/"))
+        self.assertEqual(self.seen, ["default"])
+        self.assertEqual(response.cookies[STICKY_COOKIE]["max-age"], 5)
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES[STICKY_COOKIE] = str(time.time() + 5)
+        self.middleware(request)
+        request = self.factory.get("/")
+        request.COOKIES[STICKY_COOKIE] = str(time.time() - 1)
+        self.middleware(request)
+        self.assertEqual(self.seen, ["default", "replica1"])
+
+
+@override_settings(REPLICA_DATABASES=["replica1"], STRIPE_PUBLISHABLE_KEY="pk_test_123")
+class RoutedViewsTests(TestCase):
+    """There is no "replica1" connection here, so any replica read blows up."""
+
+    def setUp(self):
+        cache.clear()  # a cached catalog page would never reach the replica
+        cat = Category.objects.create(name="Cat", slug="cat")
+        product = Product.objects.create(
+            category=cat, name="P", slug="p", price="12.34", available=True,
+            team=Team.objects.create(name="Team"),
+        )
+        self.order = Order.objects.create(
+            first_name="A", last_name="B", email="a@example.com",
+            address="1 Street", postal_code="SW1A 1AA", city="London",
+        )
+        OrderItem.objects.create(order=self.order, product=product, price="12.34", quantity=1)
+
+    def test_catalog_pages_read_from_the_replica(self):
+        with self.assertRaises(ConnectionDoesNotExist):
+            self.client.get(reverse("shop:product_list"))
+
+    def test_payment_pages_read_from_the_primary(self):
+        session = self.client.session
+        session["order_id"] = self.order.id
+        session.save()
+        response = self.client.get(reverse("payment:process"))
+        self.assertEqual(response.status_code, 200)
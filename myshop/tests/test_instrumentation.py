@@ -0,0 +1,70 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from myshop.instrumentation import current_stats, track_http
+from shop.models import Category, Product
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cat = Category.objects.create(name="Cat", slug="cat")
+        Product.objects.create(category=cat, name="LIV Home", slug="liv-home", price="10.00")
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_sampled_request_gets_server_timing(self):
+        resp = self.client.get(reverse("shop:product_list"))
+        timing = resp["Server-Timing"]
+
+        db = re.search(r'db;dur=([\d.]+);desc="(\d+) queries"', timing)
+        self.assertIsNotNone(db)
+        self.assertGreater(int(db.group(2)), 0)
+        self.assertRegex(timing, r"tpl;dur=[\d.]+")
+        self.assertRegex(timing, r'http;dur=[\d.]+;desc="0 calls"')
+        self.assertRegex(timing, r"total;dur=[\d.]+")
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_structured_log_line(self):
+        with self.assertLogs("myshop.perf", level="INFO") as logs:
+            self.client.get(reverse("shop:product_list"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "shop:product_list")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["db_queries"], 0)
+        self.assertIn("SELECT", record["slowest_sql"])
+        self.assertGreater(record["template_ms"], 0)
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_server_timing_is_internal(self):
+        outside = {"REMOTE_ADDR": "203.0.113.9"}
+        with self.assertLogs("myshop.perf", level="INFO"):
+            resp = self.client.get(reverse("shop:product_list"), **outside)
+        self.assertNotIn("Server-Timing", resp)
+
+        staff = User.objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        self.assertIn("Server-Timing", self.client.get(reverse("shop:product_list"), **outside))
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    async def test_async_request_counts_queries(self):
+        with self.assertLogs("myshop.perf", level="INFO") as logs:
+            resp = await self.async_client.get(reverse("shop:product_list"))
+        self.assertEqual(resp.status_code, 200)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record["db_queries"], 0)
+        self.assertIn("SELECT", record["slowest_sql"])
+
+    @override_settings(PERF_SAMPLE_RATE=0.0)
+    def test_unsampled_request_untouched(self):
+        resp = self.client.get(reverse("shop:product_list"))
+        self.assertNotIn("Server-Timing", resp)
+
+    def test_track_http_is_noop_outside_sampled_request(self):
+        self.assertIsNone(current_stats())
+        with track_http("stripe"):
+            pass
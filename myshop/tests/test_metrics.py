@@ -0,0 +1,167 @@
+import json
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from loadtest.stripe_stub import sign_payload
+from myshop.metrics import record_db_pool_stats
+from orders.models import Order
+from outbox.models import OutboxMessage
+from shop.models import Category, Product
+
+CHECKOUT = {
+    "first_name": "ann", "last_name": "lee", "email": "ann@example.com",
+    "address": "1 Street", "postal_code": "sw1a1aa", "city": "London",
+}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=["127.0.0.1"])
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_internal_addresses_can_scrape(self):
+        Order.objects.create(**CHECKOUT)
+        OutboxMessage.objects.create(task_name="x")
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 200)
+        body = resp.content.decode()
+        self.assertIn("shop_orders_unpaid 1.0", body)
+        self.assertIn("outbox_backlog 1.0", body)
+        self.assertIn("shop_cart_adds_total", body)
+
+    def test_shop_state_is_cached_between_scrapes(self):
+        Order.objects.create(**CHECKOUT)
+        self.assertIn("shop_orders_unpaid 1.0", self.client.get(reverse("metrics")).content.decode())
+        Order.objects.create(**CHECKOUT)
+        with self.assertNumQueries(0):
+            body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn("shop_orders_unpaid 1.0", body)
+
+        with self.settings(METRICS_STATE_CACHE_SECONDS=0):
+            body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn("shop_orders_unpaid 2.0", body)
+
+    def test_other_addresses_are_refused(self):
+        resp = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.9")
+        self.assertEqual(resp.status_code, 403)
+
+    @override_settings(RATELIMIT_PROXY_COUNT=1)
+    def test_behind_a_proxy_the_forwarded_address_is_checked(self):
+        internal = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR="127.0.0.1")
+        self.assertEqual(internal.status_code, 200)
+        # the proxy's own address is on the list, the visitor's isn't
+        outside = self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.9")
+        self.assertEqual(outside.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_replaces_ip_allowlist(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret", REMOTE_ADDR="203.0.113.9")
+        self.assertEqual(resp.status_code, 200)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test")
+class ShopCounterTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=cat, name="P", slug="p", price="10.00")
+
+    def test_cart_add_and_order_created(self):
+        adds, guests = sample("shop_cart_adds_total"), sample("shop_orders_created_total", customer="guest")
+        self.client.post(reverse("cart:cart_add", args=[self.product.id]), {"quantity": 1})
+        self.client.post(reverse("orders:order_create"), CHECKOUT)
+        self.assertEqual(sample("shop_cart_adds_total"), adds + 1)
+        self.assertEqual(sample("shop_orders_created_total", customer="guest"), guests + 1)
+
+    def post_webhook(self, event, secret="whsec_test"):
+        payload = json.dumps(event).encode()
+        return self.client.post(
+            reverse("payment:stripe-webhook"), payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, secret),
+        )
+
+    def test_webhook_outcomes(self):
+        order = Order.objects.create(**CHECKOUT)
+        event = {
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": "cs_1", "mode": "payment", "payment_status": "paid",
+                "client_reference_id": str(order.id), "payment_intent": "pi_1",
+            }},
+        }
+        key = dict(event_type="checkout.session.completed")
+        paid, again = sample("shop_stripe_webhooks_total", **key, outcome="paid"), \
+            sample("shop_stripe_webhooks_total", **key, outcome="already_paid")
+        bad = sample("shop_stripe_webhooks_total", event_type="unknown", outcome="bad_signature")
+
+        self.post_webhook(event)
+        self.post_webhook(event)
+        self.post_webhook(event, secret="whsec_wrong")
+
+        self.assertEqual(sample("shop_stripe_webhooks_total", **key, outcome="paid"), paid + 1)
+        self.assertEqual(sample("shop_stripe_webhooks_total", **key, outcome="already_paid"), again + 1)
+        self.assertEqual(sample("shop_stripe_webhooks_total", event_type="unknown", outcome="bad_signature"), bad + 1)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_123")
+    @patch("payment.views.stripe.checkout.Session.create")
+    def test_stripe_latency_histogram(self, mock_create):
+        mock_create.return_value.url = "https://stripe.example/s"
+        mock_create.return_value.payment_intent = "pi_1"
+        order = Order.objects.create(**CHECKOUT)
+        session = self.client.session
+        session["order_id"] = order.id
+        session.save()
+        labels = dict(service="stripe", operation="checkout.session.create")
+        before = sample("shop_external_call_duration_seconds_count", **labels)
+        self.client.post(reverse("payment:process"))
+        self.assertEqual(sample("shop_external_call_duration_seconds_count", **labels), before + 1)
+
+
+class FakePool:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def pop_stats(self):
+        stats, self.stats = self.stats, {"pool_size": self.stats["pool_size"]}
+        return stats
+
+
+class DBPoolStatsTests(TestCase):
+    def fake_connections(self, pool):
+        class Connections(dict):
+            settings = {"default": {"OPTIONS": {}}, "pooled": {"OPTIONS": {"pool": {"max_size": 4}}}}
+
+            def __iter__(self):
+                return iter(self.settings)
+
+        return Connections(pooled=type("Wrapper", (), {"pool": pool})())
+
+    @override_settings(DB_POOL=True)
+    def test_pool_counters_are_moved_into_metrics(self):
+        pool = FakePool({
+            "pool_size": 4, "pool_available": 1, "requests_waiting": 2,
+            "requests_num": 10, "requests_queued": 3, "requests_wait_ms": 1500, "connections_lost": 1,
+        })
+        before = sample("db_pool_wait_seconds_total", alias="pooled")
+        with patch("django.db.connections", self.fake_connections(pool)):
+            record_db_pool_stats()
+            record_db_pool_stats()  # counters were popped: nothing added twice
+
+        self.assertEqual(sample("db_pool_connections", alias="pooled"), 4)
+        self.assertEqual(sample("db_pool_requests_waiting", alias="pooled"), 0)
+        self.assertAlmostEqual(sample("db_pool_wait_seconds_total", alias="pooled") - before, 1.5)
+        self.assertEqual(sample("db_pool_connections", alias="default"), 0)
+
+    @override_settings(DB_POOL=False)
+    def test_nothing_to_do_without_pooling(self):
+        with patch("django.db.connections") as connections:
+            record_db_pool_stats()
+        connections.__iter__.assert_not_called()
@@ -0,0 +1,286 @@
+import json
+
+import stripe
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from addresses.models import Address
+from loadtest.stripe_stub import StripeStubServer, completed_event, sign_payload
+from myshop.query_budgets import QUERY_BUDGETS
+from myshop.querybudget import (
+    QueryBudgetMiddleware,
+    QueryBudgetTestMixin,
+    budget_for,
+    query_shape,
+    record_queries,
+)
+from orders.models import Order, OrderItem
+from shop import inventory
+from shop.models import Category, Product, ProductVariant, Team
+
+CHECKOUT = {
+    "first_name": "ann", "last_name": "lee", "email": "ann@example.com",
+    "address": "1 Street", "postal_code": "sw1a1aa", "city": "London",
+}
+
+
+# requested by test_checkout_path rather than test_pages
+CHECKOUT_PATH = (
+    "cart:cart_add", "cart:cart_remove", "cart:cart_detail", "orders:order_create",
+    "payment:process", "payment:completed", "payment:canceled", "payment:stripe-webhook",
+)
+
+
+def _weasyprint_loads():
+    try:
+        import weasyprint  # noqa: F401
+    except Exception:  # ImportError, or OSError for missing pango/cairo
+        return False
+    return True
+
+
+def _named_urls(resolver=None, namespace=""):
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            ns = pattern.namespace
+            yield from _named_urls(pattern, f"{namespace}{ns}:" if ns else namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f"{namespace}{pattern.name}"
+
+
+class BudgetTableTests(SimpleTestCase):
+    def test_every_named_url_has_a_budget(self):
+        missing = sorted({name for name in _named_urls() if budget_for(name) is None})
+        self.assertEqual(missing, [], "add these to myshop/query_budgets.py")
+
+    def test_namespace_fallback(self):
+        self.assertEqual(budget_for("admin:orders_order_changelist"), QUERY_BUDGETS["admin:*"])
+        self.assertIsNone(budget_for("nowhere:view"))
+
+    def test_query_shape_ignores_parameters(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            query_shape("SELECT * FROM t WHERE id IN (%s) AND name = 'yy' LIMIT 1"),
+        )
+
+
+class ViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Each view stays within its budget with a realistic cart and order history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        cls.team = Team.objects.create(name="Team")
+        cls.products = [
+            Product.objects.create(category=cat, team=cls.team, name=f"P{i}", slug=f"p{i}", price="10.00")
+            for i in range(6)
+        ]
+        cls.user = User.objects.create_user("ann", "ann@example.com", "pw-123456")
+        cls.orders = []
+        for _ in range(5):
+            order = Order.objects.create(user=cls.user, **CHECKOUT)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=p, price="10.00", quantity=1) for p in cls.products
+            )
+            cls.orders.append(order)
+        cls.drop = Product.objects.create(category=cat, name="Drop", slug="drop", price="10.00", drop_mode=True)
+        cls.address = Address.objects.create(
+            user=cls.user, name="Home", line1="1 Street", city="London", postal_code="SW1A 1AA"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="ann", password="pw-123456")
+        for product in self.products:
+            self.client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 1})
+        session = self.client.session
+        session["order_id"] = self.orders[0].id
+        session.save()
+
+    def assertGetWithinBudget(self, view_name, url):
+        with self.assertQueryBudget(view_name):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200, view_name)
+
+    def pages(self):
+        """URL of every page the customer can GET, by view name."""
+        order, product = self.orders[0], self.products[0]
+        return {
+            "home": reverse("home"),
+            "metrics": reverse("metrics"),
+            "shop:product_list": reverse("shop:product_list"),
+            "shop:product_list_by_category": reverse("shop:product_list_by_category", args=["cat"]),
+            "shop:product_list_by_team": reverse("shop:product_list_by_team", args=[self.team.slug]),
+            "shop:product_detail": product.get_absolute_url(),
+            "shop:search": reverse("shop:search") + "?q=P",
+            "shop:contact": reverse("shop:contact"),
+            "shop:drop_waiting": reverse("shop:drop_waiting", args=[self.drop.id]),
+            "shop:drop_status": reverse("shop:drop_status", args=[self.drop.id]),
+            "accounts:signup": reverse("accounts:signup"),
+            "accounts:register": reverse("accounts:register"),
+            "accounts:dashboard": reverse("accounts:dashboard"),
+            "accounts:order_detail": reverse("accounts:order_detail", args=[order.id]),
+            "accounts:profile": reverse("accounts:profile"),
+            "accounts:delete_account": reverse("accounts:delete_account"),
+            "accounts:account": reverse("accounts:account"),
+            "login": reverse("login"),
+            "password_change": reverse("password_change"),
+            "password_change_done": reverse("password_change_done"),
+            "password_reset": reverse("password_reset"),
+            "password_reset_done": reverse("password_reset_done"),
+            "password_reset_confirm": reverse("password_reset_confirm", args=["MQ", "set-password"]),
+            "password_reset_complete": reverse("password_reset_complete"),
+            "addresses:list": reverse("addresses:list"),
+            "addresses:create": reverse("addresses:create"),
+            "addresses:update": reverse("addresses:update", args=[self.address.pk]),
+            "addresses:delete": reverse("addresses:delete", args=[self.address.pk]),
+        }
+
+    def staff_pages(self):
+        order = self.orders[0]
+        return {
+            "orders:admin_order_detail": reverse("orders:admin_order_detail", args=[order.id]),
+            "orders:admin_order_pdf": reverse("orders:admin_order_pdf", args=[order.id]),
+            "orders:admin_sales": reverse("orders:admin_sales"),
+        }
+
+    def test_every_view_is_checked(self):
+        checked = set(self.pages()) | set(self.staff_pages()) | set(CHECKOUT_PATH) | {"logout"}
+        unchecked = sorted(name for name in _named_urls() if not name.startswith("admin:") and name not in checked)
+        self.assertEqual(unchecked, [], "request these in ViewQueryBudgetTests")
+
+    @override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=["127.0.0.1"])
+    def test_pages(self):
+        for view_name, url in self.pages().items():
+            with self.subTest(view_name):
+                self.assertGetWithinBudget(view_name, url)
+        with self.assertQueryBudget("logout"):
+            resp = self.client.post(reverse("logout"))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_staff_pages(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        for view_name, url in self.staff_pages().items():
+            with self.subTest(view_name):
+                if view_name == "orders:admin_order_pdf" and not _weasyprint_loads():
+                    self.skipTest("WeasyPrint's system libraries are not installed")
+                self.assertGetWithinBudget(view_name, url)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_stub", STRIPE_WEBHOOK_SECRET="whsec_test")
+    def test_checkout_path(self):
+        """Cart to paid order, with the load test's Stripe stub standing in for Stripe."""
+        stub = StripeStubServer(port=0).start()
+        self.addCleanup(stub.stop)
+        self.addCleanup(setattr, stripe, "api_base", stripe.api_base)
+
+        with self.settings(STRIPE_API_BASE=stub.url):
+            # paid by the webhook
+            order, session = self.checkout(stub)
+            payload = json.dumps(completed_event(session)).encode()
+            with self.assertQueryBudget("payment:stripe-webhook"):
+                resp = self.client.post(
+                    reverse("payment:stripe-webhook"), payload, content_type="application/json",
+                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, "whsec_test"),
+                )
+            self.assertEqual(resp.status_code, 200)
+            self.assertGetWithinBudget("payment:completed", reverse("payment:completed"))
+            self.assertGetWithinBudget("payment:canceled", reverse("payment:canceled"))
+
+            # no webhook yet: the return page asks Stripe and marks it paid
+            for product in self.products:
+                self.client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 1})
+            order, session = self.checkout(stub)
+            completed_event(session)
+            self.assertGetWithinBudget(
+                "payment:completed", reverse("payment:completed") + f"?session_id={session['id']}"
+            )
+        order.refresh_from_db()
+        self.assertTrue(order.paid)
+
+    def checkout(self, stub):
+        """Check out the cart up to the redirect to Stripe; returns the order and its session."""
+        product = self.products[0]
+        with self.assertQueryBudget("cart:cart_remove"):
+            self.assertEqual(self.client.post(reverse("cart:cart_remove", args=[product.id])).status_code, 302)
+        with self.assertQueryBudget("cart:cart_add"):
+            resp = self.client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 2})
+        self.assertEqual(resp.status_code, 302)
+        self.assertGetWithinBudget("cart:cart_detail", reverse("cart:cart_detail"))
+
+        self.assertGetWithinBudget("orders:order_create", reverse("orders:order_create"))
+        with self.assertQueryBudget("orders:order_create"):
+            resp = self.client.post(reverse("orders:order_create"), CHECKOUT)
+        self.assertEqual(resp.status_code, 302)
+        order = Order.objects.latest("id")
+        self.assertEqual(order.items.count(), len(self.products))
+
+        self.assertGetWithinBudget("payment:process", reverse("payment:process"))
+        with self.assertQueryBudget("payment:process"):
+            resp = self.client.post(reverse("payment:process"))
+        self.assertTrue(resp["Location"].startswith(stub.url))
+        [session] = [s for s in stub.sessions.values() if s["client_reference_id"] == str(order.id)]
+        return order, session
+
+    def test_anonymous_first_cart_add(self):
+        """A visitor's first add creates their session: the drops list, the product, the session INSERT."""
+        self.client.logout()
+        cache.clear()
+        with self.assertQueryBudget("cart:cart_add"):
+            resp = self.client.post(reverse("cart:cart_add", args=[self.products[0].id]), {"quantity": 1})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(len(self.client.session["cart"]), 1)
+
+    def test_sized_cart_and_checkout(self):
+        """Every line in a size, half of them with sharded stock."""
+        session = self.client.session
+        session.pop("cart")
+        session.save()
+        for i, product in enumerate(self.products):
+            variant = ProductVariant.objects.create(product=product, size="M", stock=20)
+            if i % 2:
+                inventory.spread(variant, 4)
+            with self.assertQueryBudget("cart:cart_add"):
+                resp = self.client.post(
+                    reverse("cart:cart_add", args=[product.id]), {"quantity": 1, "variant": variant.id}
+                )
+            self.assertEqual(resp.status_code, 302)
+
+        with self.assertQueryBudget("orders:order_create"):
+            resp = self.client.post(reverse("orders:order_create"), CHECKOUT)
+        self.assertEqual(resp.status_code, 302)
+        order = Order.objects.latest("id")
+        self.assertEqual(order.items.filter(variant__isnull=False).count(), len(self.products))
+        self.assertIsNotNone(order.reserved_until)
+
+
+class NPlusOneDetectorTests(TestCase):
+    def test_flags_repeated_query_with_template_line(self):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        for i in range(5):
+            Product.objects.create(category=cat, name=f"P{i}", slug=f"p{i}", price="1.00")
+        template = Template(
+            "{% for p in products %}\n{{ p.category.name }}\n{% endfor %}"
+        )
+        with record_queries() as recorder:
+            template.render(Context({"products": Product.objects.all()}))
+
+        [repeated] = recorder.repeated(threshold=3)
+        self.assertEqual(repeated.count, 5)
+        self.assertIn("shop_category", repeated.shape)
+        self.assertTrue(any(":2" in loc for loc in repeated.locations), repeated.locations)
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    async def test_async_request_queries_are_recorded(self):
+        async def view(request):
+            for _ in range(5):
+                await Category.objects.acount()
+            return HttpResponse()
+
+        with self.assertLogs("myshop.querybudget", level="WARNING") as logs:
+            await QueryBudgetMiddleware(view)(RequestFactory().get("/nowhere/"))
+        self.assertIn("possible N+1, 5x", logs.output[0])
@@ -0,0 +1,115 @@
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from myshop.ratelimit import Limit, check, client_ip, ratelimit
+
+LIMITS = {
+    "search": {"rate": "1/m", "burst": 2, "key": "ip"},
+    "cart": {"rate": "60/m", "burst": 1, "key": "session"},
+    "checkout": {"rate": "10/m", "burst": 1, "key": "user", "methods": ("POST",)},
+}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class LimitTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(Limit.parse({"rate": "30/m"}), Limit(0.5, 30))
+        limit = Limit.parse({"rate": "2/s", "burst": 5, "key": "user", "methods": ["POST"]})
+        self.assertEqual(limit, Limit(2.0, 5, "user", ("POST",)))
+        self.assertEqual(limit.ttl, 3)
+        self.assertEqual(limit.retry_after(0.5), 1)
+        self.assertEqual(Limit.parse({"rate": "1/h"}).retry_after(0.0), 3600)
+
+    @override_settings(RATELIMIT_PROXY_COUNT=1)
+    def test_client_ip_behind_a_proxy(self):
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(client_ip(request), "1.2.3.4")  # the spoofable first hop is ignored
+        with self.settings(RATELIMIT_PROXY_COUNT=0):
+            self.assertEqual(client_ip(request), "10.0.0.1")
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATE_LIMITS=LIMITS)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_search_is_throttled_per_ip(self):
+        url = reverse("shop:search")
+        throttled = sample("shop_ratelimit_requests_total", scope="search", result="throttled")
+
+        self.assertEqual(self.client.get(url, {"q": "a"}).status_code, 200)
+        self.assertEqual(self.client.get(url, {"q": "b"}).status_code, 200)
+        response = self.client.get(url, {"q": "c"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertEqual(sample("shop_ratelimit_requests_total", scope="search", result="throttled"), throttled + 1)
+        # another address has its own bucket
+        self.assertEqual(self.client.get(url, {"q": "a"}, REMOTE_ADDR="10.0.0.2").status_code, 200)
+
+    def test_tokens_refill(self):
+        with patch("myshop.ratelimit.time.time", return_value=1000.0):
+            for _ in range(2):
+                self.client.get(reverse("shop:search"))
+            self.assertEqual(self.client.get(reverse("shop:search")).status_code, 429)
+        with patch("myshop.ratelimit.time.time", return_value=1060.0):
+            self.assertEqual(self.client.get(reverse("shop:search")).status_code, 200)
+
+    def test_checkout_limits_posts_per_user(self):
+        url = reverse("orders:order_create")
+        self.assertEqual(self.client.post(url, {}).status_code, 302)  # empty cart: back to the cart
+        self.assertEqual(self.client.post(url, {}).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, 302)  # GETs are not limited
+
+    def test_disabled_or_unknown_scopes_pass_through(self):
+        request = RequestFactory().get("/")
+        self.assertIsNone(check(request, "nope"))
+        with self.settings(RATELIMIT_ENABLED=False):
+            for _ in range(5):
+                self.assertIsNone(check(request, "search"))
+
+    def test_cache_errors_let_requests_through(self):
+        with patch("myshop.ratelimit.take_token", side_effect=ConnectionError), self.assertLogs("myshop.ratelimit"):
+            self.assertIsNone(check(RequestFactory().get("/"), "search"))
+
+    def test_session_buckets(self):
+        view = ratelimit("cart")(lambda request: HttpResponse("ok"))
+        factory = RequestFactory()
+
+        def request(key):
+            r = factory.post("/")
+            r.session = MagicMock(session_key=key)
+            return r
+
+        self.assertEqual(view(request("s1")).status_code, 200)
+        self.assertEqual(view(request("s1")).status_code, 429)
+        self.assertEqual(view(request("s2")).status_code, 200)
+
+    async def test_async_views(self):
+        async def view(request):
+            return HttpResponse("ok")
+
+        limited = ratelimit("search")(view)
+        statuses = [(await limited(RequestFactory().get("/"))).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_redis_buckets_use_one_script_call(self):
+        redis = MagicMock()
+        redis.eval.return_value = [0, "0.25"]
+        with patch("myshop.ratelimit.redis_client", return_value=redis):
+            response = check(RequestFactory().get("/"), "search")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "45")
+        script, numkeys, key, rate, burst, ttl = redis.eval.call_args.args
+        self.assertIn("HMGET", script)
+        self.assertEqual((numkeys, burst, ttl), (1, 2, 120))
+        self.assertTrue(key.endswith("ratelimit:search:ip:127.0.0.1"))
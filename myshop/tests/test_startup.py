@@ -0,0 +1,100 @@
+import sys
+from importlib.machinery import PathFinder
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from myshop.lazyimport import LazyModule, lazy_import
+from myshop.startup import BASE_DIR, MARKER, ImportTime, StartupProfile, parse_importtime, profile_startup
+
+# Imported on first use only: payments, PDFs, media storage, DATABASE_URL parsing
+DEFERRED = {"stripe", "weasyprint", "cloudinary", "cloudinary_storage", "dj_database_url"}
+
+# Every third-party package a cold django.setup() plus URLconf load may import.
+# A package that isn't here is a new eager import: import it where it is used
+# (or with lazy_import), or add it here on purpose.
+STARTUP_PACKAGES = {
+    "django", "asgiref", "sqlparse", "colorama", "decouple", "prometheus_client",
+    # the Celery app (myshop/celery.py)
+    "celery", "kombu", "amqp", "billiard", "vine", "click", "dateutil", "six", "cffi",
+    # serializers and codecs kombu registers when they are installed
+    "yaml", "msgpack", "brotli", "zstandard",
+}
+
+SAMPLE = f"""import time: self [us] | cumulative | imported package
+import time:       100 |        100 | site
+{MARKER}
+import time: self [us] | cumulative | imported package
+import time:        50 |         50 |   django.utils.version
+import time:       200 |        250 | django
+import time:        30 |         30 | shop.models
+"""
+
+
+class ParseImportTimeTests(SimpleTestCase):
+    def test_rows_after_the_marker(self):
+        rows = parse_importtime(SAMPLE)
+        self.assertEqual(
+            rows,
+            [
+                ImportTime("django.utils.version", 50, 50, 1),
+                ImportTime("django", 200, 250, 0),
+                ImportTime("shop.models", 30, 30, 0),
+            ],
+        )
+        profile = StartupProfile(wall_ms=1.0, imports=rows)
+        self.assertEqual(profile.import_ms, 0.28)
+        self.assertEqual(profile.by_package()[0], ("django", 0.25))
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_imports_on_first_attribute_access(self):
+        module = LazyModule("this_module_does_not_exist")
+        self.assertIn("not loaded", repr(module))
+        with self.assertRaises(ModuleNotFoundError):
+            module.anything
+
+    def test_forwards_reads_and_writes(self):
+        module = LazyModule("json.tool")
+        self.assertTrue(callable(module.main))
+        module.answer = 42
+        import json.tool
+
+        self.assertEqual(json.tool.answer, 42)
+        del module.answer
+
+    def test_already_imported_modules_are_returned_as_is(self):
+        import json
+
+        self.assertIs(lazy_import("json"), json)
+
+
+class ColdStartupTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profile = profile_startup()
+
+    def test_heavy_dependencies_are_not_imported_at_startup(self):
+        self.assertEqual(self.profile.modules() & DEFERRED, set())
+
+    def test_only_known_packages_are_imported_at_startup(self):
+        # -X importtime lists failed import probes too; keep what is installed
+        packages = {
+            name for name in {module.split(".")[0] for module in self.profile.modules()}
+            if not name.startswith("_")
+            and name not in sys.stdlib_module_names
+            and not (BASE_DIR / name).exists()
+            and PathFinder.find_spec(name)
+        }
+        self.assertEqual(packages - STARTUP_PACKAGES, set())
+
+    def test_command(self):
+        out = StringIO()
+        with patch("shop.management.commands.profile_startup.profile_startup", return_value=self.profile):
+            call_command("profile_startup", top=3, stdout=out)
+            self.assertIn("modules imported in", out.getvalue())
+            with self.assertRaises(CommandError):
+                call_command("profile_startup", budget_ms=1, stdout=StringIO())
@@ -3,11 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from myshop import views as core_views
 from shop import views as shop_views            
 from django.contrib.auth.views import LogoutView  
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", core_views.metrics, name="metrics"),
 
     # Home
     path("", shop_views.home, name="home"),
@@ -32,7 +34,6 @@ urlpatterns = [
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    
-from myshop import views as core_views
+
 handler404 = core_views.custom_404
 handler500 = core_views.custom_500
@@ -1,4 +1,13 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from .metrics import exposition
+from .ratelimit import client_ip
 
 
 def custom_404(request, exception):
@@ -6,4 +15,20 @@ def custom_404(request, exception):
 
 
 def custom_500(request):
-    return render(request, "500.html", status=500)
\ No newline at end of file
+    return render(request, "500.html", status=500)
+
+
+def _metrics_allowed(request) -> bool:
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(supplied, token)
+    return client_ip(request) in getattr(settings, "METRICS_ALLOWED_IPS", ())
+
+
+@never_cache
+def metrics(request):
+    """Prometheus scrape endpoint; internal only (METRICS_TOKEN or METRICS_ALLOWED_IPS)."""
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
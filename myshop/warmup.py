@@ -0,0 +1,115 @@
+# myshop/warmup.py
+"""
+Pay the cold-start costs of a freshly deployed process before shoppers do.
+
+warm_up() compiles the storefront templates, opens the database and cache
+connections, parses the invoice stylesheet and fills the catalog caches,
+timing each step. `python manage.py warmup` runs it and prints the report;
+with WARMUP_ON_STARTUP=True, myshop/wsgi.py and myshop/asgi.py run it as each
+worker boots, before it accepts requests.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_APPS = ("shop", "cart", "orders", "payment")
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    ms: float
+    detail: str
+    ok: bool = True
+
+
+def compile_templates(app_labels=None) -> str:
+    from django.template.loader import get_template
+
+    count = 0
+    for label in app_labels or getattr(settings, "WARMUP_TEMPLATE_APPS", TEMPLATE_APPS):
+        root = Path(apps.get_app_config(label).path) / "templates"
+        for path in sorted(root.rglob("*.html")):
+            # the cached loader (DEBUG=False) keeps the compiled Template for the process
+            get_template(path.relative_to(root).as_posix())
+            count += 1
+    return f"{count} templates"
+
+
+def open_databases() -> str:
+    from django.db import connections
+
+    for alias in connections:
+        connections[alias].ensure_connection()  # with DB_POOL this opens the pool
+    return ", ".join(connections)
+
+
+def open_caches() -> str:
+    from django.core.cache import caches
+
+    for alias in settings.CACHES:
+        caches[alias].get("warmup:ping")
+    return ", ".join(settings.CACHES)
+
+
+def parse_pdf_stylesheets() -> str:
+    try:
+        import weasyprint  # noqa: F401
+    except Exception:
+        return "skipped (WeasyPrint not installed)"
+    from orders.views import pdf_stylesheets
+
+    return f"{len(pdf_stylesheets())} stylesheet(s)"
+
+
+def fill_catalog() -> str:
+    from shop import catalog
+
+    return f"{catalog.warm()} listing pages"
+
+
+STEPS = (
+    ("templates", compile_templates),
+    ("databases", open_databases),
+    ("caches", open_caches),
+    ("pdf css", parse_pdf_stylesheets),
+    ("catalog", fill_catalog),
+)
+
+
+def warm_up(steps=STEPS) -> list[WarmupStep]:
+    """Run every step, timing each; a failing step is reported and the rest still run."""
+    report = []
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            detail, ok = step(), True
+        except Exception as exc:
+            logger.exception("warmup step %s failed", name)
+            detail, ok = f"failed: {exc}", False
+        report.append(WarmupStep(name, round((time.perf_counter() - start) * 1000, 1), detail, ok))
+    return report
+
+
+def warm_up_on_startup():
+    """Called from the WSGI/ASGI modules; a no-op unless WARMUP_ON_STARTUP is set."""
+    if not getattr(settings, "WARMUP_ON_STARTUP", False):
+        return
+    from django.db import close_old_connections
+
+    report = warm_up()
+    # pooled connections go back to the pool, persistent ones stay open for the first request
+    close_old_connections()
+    logger.info(
+        "warmup finished in %.0f ms: %s",
+        sum(s.ms for s in report),
+        "; ".join(f"{s.name} {s.ms:.0f} ms ({s.detail})" for s in report),
+    )
@@ -3,12 +3,15 @@ import csv
 import datetime
 
 from django.contrib import admin
+from django.db.models.functions import Lower
 from django.http import HttpResponse
 from django.urls import reverse
 from django.utils.html import format_html  
 
 
-from .models import Order, OrderItem
+from myshop.changelists import EstimatedCountPaginator, probed_dates
+
+from .models import DailySales, Order, OrderItem
 
 
 def export_to_csv(modeladmin, request, queryset):
@@ -37,8 +40,22 @@ export_to_csv.short_description = "Export to CSV"
 
 
 class OrderItemInline(admin.TabularInline):
+    """
+    An order's lines as they were bought. Read-only: stock reservations and
+    the sales rollups were taken from them, and editable rows would also
+    cost a query per row to label the product.
+    """
     model = OrderItem
-    raw_id_fields = ["product"]
+    fields = ["product", "size", "price", "quantity"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
 
 
 @admin.register(Order)
@@ -58,11 +75,30 @@ class OrderAdmin(admin.ModelAdmin):
         "order_detail",    
         "order_pdf",       
     ]
-    list_filter = ["paid", "created", "updated"]
-    search_fields = ["first_name", "last_name", "email", "id"]
+    # Built for millions of rows: no COUNT(*) per page, no facet counts,
+    # searches and date drill-down that use indexes (see myshop/changelists.py)
+    list_filter = ["paid"]
+    show_facets = admin.ShowFacets.NEVER
+    date_hierarchy = "created"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_fields = ["id", "email"]  # matched by get_search_results below
+    search_help_text = "An order number, or the start of the customer's email address."
     inlines = [OrderItemInline]
     actions = [export_to_csv]
 
+    def get_queryset(self, request):
+        return probed_dates(super().get_queryset(request))
+
+    def get_search_results(self, request, queryset, search_term):
+        # id exact, or an email prefix on the LOWER(email) index; never icontains over the table
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.lstrip("#").isdecimal():  # not isdigit(): "²" is a digit that int() rejects
+            return queryset.filter(pk=int(term.lstrip("#"))), False
+        return queryset.alias(email_lower=Lower("email")).filter(email_lower__startswith=term.lower()), False
+
     # admin column: link to Stripe
     def order_payment(self, obj):
         url = obj.get_stripe_url()
@@ -82,3 +118,19 @@ class OrderAdmin(admin.ModelAdmin):
         url = reverse("orders:admin_order_pdf", args=[obj.id])
         return format_html('<a href="{}">PDF</a>', url)
     order_pdf.short_description = "Invoice"
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """Read-only: rows are kept by orders/rollups.py (or `manage.py rebuild_sales_rollups`)."""
+    list_display = ["day", "orders", "units", "revenue"]
+    date_hierarchy = "day"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+INDEX = "orders_order_email_prefix_idx"
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        # text_pattern_ops so LIKE 'prefix%' can use it under any collation;
+        # CONCURRENTLY so a big orders table stays writable meanwhile
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} ON orders_order (LOWER(email) text_pattern_ops)"
+        )
+    else:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON orders_order (LOWER(email))")
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("orders", "0006_dailysales"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
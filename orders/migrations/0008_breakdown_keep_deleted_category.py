@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_email_prefix_index'),
+        ('shop', '0007_productvariant_stockshard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailysalesbreakdown',
+            name='category',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='shop.category'),
+        ),
+    ]
@@ -19,12 +19,19 @@ class Order(models.Model):
         on_delete=models.SET_NULL,
         related_name="orders",
     )
+    # stock for sized items is held until then unless the order is paid (orders/stock.py)
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    stock_released = models.BooleanField(default=False)
+
     class Meta:
         ordering = ['-created']
         indexes = [
             models.Index(fields=['-created']),
              models.Index(fields=['paid']),
+            models.Index(fields=['reserved_until']),
         ]
+        # plus orders_order_email_prefix_idx on LOWER(email) for the admin's email
+        # search; migration 0007 adds it (text_pattern_ops needs PostgreSQL-only SQL)
 
     def __str__(self):
         return f'Order {self.id}'
@@ -66,6 +73,15 @@ class OrderItem(models.Model):
         related_name='order_items',
         on_delete=models.CASCADE
     )
+    variant = models.ForeignKey(
+        'shop.ProductVariant',
+        related_name='+',
+        null=True, blank=True,
+        on_delete=models.SET_NULL
+    )
+    size = models.CharField(max_length=20, blank=True)
+    # which StockShard the reservation came from (None: the variant row)
+    stock_shard = models.PositiveSmallIntegerField(null=True, blank=True)
     price = models.DecimalField(
         max_digits=10,
         decimal_places=2
@@ -76,4 +92,58 @@ class OrderItem(models.Model):
         return str(self.id)
 
     def get_cost(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return self.price * self.quantity
+
+class DailySales(models.Model):
+    """
+    Paid orders per day (the day the order was placed). Maintained by
+    orders/rollups.py as orders are paid; the sales dashboard reads this
+    and DailySalesBreakdown instead of scanning orders.
+    """
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f'Sales on {self.day}'
+
+
+class DailySalesBreakdown(models.Model):
+    """
+    DailySales split by team and category. `orders` counts the orders with
+    something from that team and category, so an order for two teams' shirts
+    counts once for each: it can't be summed across rows into orders per
+    team or per category.
+    """
+    day = models.DateField()
+    # No constraints: sales history outlives the teams and categories it is
+    # split by. A deleted one's rows stay under its old id, nameless.
+    team = models.ForeignKey(
+        'shop.Team', null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    category = models.ForeignKey('shop.Category', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            # NULLs are distinct in a unique index, so team-less rows need their own
+            models.UniqueConstraint(
+                fields=['day', 'team', 'category'], condition=models.Q(team__isnull=False),
+                name='orders_breakdown_day_team_category',
+            ),
+            models.UniqueConstraint(
+                fields=['day', 'category'], condition=models.Q(team__isnull=True),
+                name='orders_breakdown_day_category_no_team',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Sales on {self.day}: {self.team or "no team"} / {self.category}'
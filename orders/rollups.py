@@ -0,0 +1,122 @@
+# orders/rollups.py
+"""
+Daily sales rollups: DailySales (per day) and DailySalesBreakdown (per day,
+team and category), keyed by the day the order was placed.
+
+record_sale() adds an order to both tables when it is paid (on the
+order_paid signal, inside the mark-paid transaction). It adds to the counters
+with UPDATE ... SET units = units + n, so concurrent payments never overwrite
+each other; a row that doesn't exist yet is inserted, and an insert that
+loses a race becomes the UPDATE. `manage.py rebuild_sales_rollups` rebuilds
+history from paid orders. report() answers the dashboard from the rollups
+alone.
+"""
+from __future__ import annotations
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from shop.models import Category, Team
+
+from .models import DailySales, DailySalesBreakdown, OrderItem
+
+_BREAKDOWN = ("day", "product__team_id", "product__category_id")
+
+
+def _sales(items, *group_by):
+    return (
+        items.annotate(day=TruncDate("order__created"))
+        .values(*group_by)
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("price") * F("quantity")),
+            orders=Count("order", distinct=True),
+        )
+        .order_by()
+    )
+
+
+def _add(model, lookup: dict, units, revenue, orders) -> None:
+    changes = {"units": F("units") + units, "revenue": F("revenue") + revenue, "orders": F("orders") + orders}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, units=units, revenue=revenue, orders=orders)
+    except IntegrityError:  # another payment created it since our UPDATE
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_sale(order) -> None:
+    """Add a newly paid order to the rollups."""
+    groups = list(_sales(OrderItem.objects.filter(order_id=order.pk), *_BREAKDOWN))
+    if not groups:
+        return
+    for group in groups:
+        _add(
+            DailySalesBreakdown,
+            {"day": group["day"], "team_id": group["product__team_id"], "category_id": group["product__category_id"]},
+            group["units"], group["revenue"], 1,
+        )
+    _add(
+        DailySales, {"day": groups[0]["day"]},
+        sum(g["units"] for g in groups), sum(g["revenue"] for g in groups), 1,
+    )
+
+
+@transaction.atomic
+def rebuild(since=None, batch_size: int = 1000) -> int:
+    """
+    Recompute the rollups from paid orders, from `since` (a date) or for all
+    time. Returns the number of days written. Payments recorded while this
+    runs may be counted twice or not at all for the days being rebuilt; run
+    it for past days, or in a quiet moment.
+    """
+    items = OrderItem.objects.filter(order__paid=True)
+    days, breakdown = DailySales.objects.all(), DailySalesBreakdown.objects.all()
+    if since is not None:
+        items = items.filter(order__created__date__gte=since)
+        days, breakdown = days.filter(day__gte=since), breakdown.filter(day__gte=since)
+    days.delete()
+    breakdown.delete()
+
+    DailySalesBreakdown.objects.bulk_create(
+        [
+            DailySalesBreakdown(
+                day=row["day"], team_id=row["product__team_id"], category_id=row["product__category_id"],
+                units=row["units"], revenue=row["revenue"], orders=row["orders"],
+            )
+            for row in _sales(items, *_BREAKDOWN)
+        ],
+        batch_size=batch_size,
+    )
+    written = DailySales.objects.bulk_create(
+        [DailySales(**row) for row in _sales(items, "day")], batch_size=batch_size,
+    )
+    return len(written)
+
+
+def _named(rows, field: str, model) -> list[dict]:
+    """Add `name` to rows grouped by `field`; None for no team, or a deleted one."""
+    names = dict(model.objects.filter(pk__in={row[field] for row in rows}).values_list("pk", "name"))
+    return [{**row, "name": names.get(row[field])} for row in rows]
+
+
+def report(start, end, top: int = 10) -> dict:
+    """Sales between two dates (inclusive), read from the rollups only."""
+    days = DailySales.objects.filter(day__range=(start, end))
+    breakdown = DailySalesBreakdown.objects.filter(day__range=(start, end))
+    totals = {"orders": Sum("orders"), "units": Sum("units"), "revenue": Sum("revenue")}
+    # No order counts per team or category: summing the per-row counts would
+    # count an order with two categories of one team's shirts twice for it.
+    # Grouped by id, not joined to the name: rows of a deleted team or category still count.
+    sold = {"units": Sum("units"), "revenue": Sum("revenue")}
+    teams = list(breakdown.values("team_id").annotate(**sold).order_by("-revenue")[:top])
+    categories = list(breakdown.values("category_id").annotate(**sold).order_by("-revenue"))
+    return {
+        "totals": days.aggregate(**totals),
+        "days": list(days.order_by("-day")),
+        "teams": _named(teams, "team_id", Team),
+        "categories": _named(categories, "category_id", Category),
+    }
@@ -0,0 +1,18 @@
+# orders/signals.py
+from django.dispatch import Signal, receiver
+
+from . import rollups, stock
+
+# Sent once when an order becomes paid, inside the transaction that marks it
+# (webhook, the payment-completed fallback, reconcile). Args: sender=Order, order.
+order_paid = Signal()
+
+
+@receiver(order_paid)
+def settle_stock(sender, order, **kwargs):
+    stock.settle(order)
+
+
+@receiver(order_paid)
+def record_sale(sender, order, **kwargs):
+    rollups.record_sale(order)
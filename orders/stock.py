@@ -0,0 +1,111 @@
+# orders/stock.py
+"""
+Stock reservations for orders.
+
+order_create takes the stock for sized items (shop.inventory.take) in the
+transaction that creates the order and sets reserved_until, so the hold
+costs nothing while the shopper is on Stripe. Payment turns the hold into a
+sale (settle, on the order_paid signal); orders still unpaid at
+reserved_until get their stock back from release_expired(), which beat runs
+every STOCK_RELEASE_INTERVAL seconds. A payment that lands after its hold
+was released takes the stock again, and if it has gone in the meantime the
+order is logged as oversold for someone to sort out by hand.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from myshop.metrics import STOCK_RESERVATIONS
+from shop import inventory
+
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+def hold_until():
+    return timezone.now() + timedelta(minutes=getattr(settings, "STOCK_RESERVATION_MINUTES", 30))
+
+
+def reserve(items: list[OrderItem]) -> bool:
+    """
+    Take the stock for the sized `items` (unsaved; each gets its stock_shard)
+    in two statements however many there are (inventory.take_lines). Raises
+    OutOfStock if any can't be had; run it inside the order's transaction so
+    the other lines' stock goes back with the rollback.
+    Returns whether anything was reserved.
+    """
+    sized = [item for item in items if item.variant_id]
+    if not sized:
+        return False
+    try:
+        shards = inventory.take_lines({item.variant_id: item.quantity for item in sized})
+    except inventory.OutOfStock:
+        STOCK_RESERVATIONS.labels("out_of_stock").inc()
+        raise
+    for item in sized:
+        item.stock_shard = shards[item.variant_id]
+    STOCK_RESERVATIONS.labels("reserved").inc()
+    return True
+
+
+def release(order_id: int, now=None) -> bool:
+    """Give back an unpaid order's stock if its hold has run out. Safe to race with payment."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        claimed = Order.objects.filter(pk=order_id, paid=False, reserved_until__lt=now).update(
+            reserved_until=None, stock_released=True
+        )
+        if not claimed:
+            return False
+        lines = OrderItem.objects.filter(order_id=order_id, variant__isnull=False)
+        for variant_id, quantity, shard in lines.values_list("variant_id", "quantity", "stock_shard"):
+            inventory.put_back(variant_id, quantity, shard)
+    STOCK_RESERVATIONS.labels("released").inc()
+    return True
+
+
+def release_expired(batch_size: int = 500) -> int:
+    """Release every hold that has run out; returns how many orders gave stock back."""
+    now = timezone.now()
+    released = 0
+    while True:
+        expired = list(
+            Order.objects.filter(paid=False, reserved_until__lt=now).order_by("reserved_until")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        released += sum(release(order_id, now) for order_id in expired)
+        if len(expired) < batch_size:
+            break
+    if released:
+        logger.info("Released the stock held by %s unpaid orders", released)
+    return released
+
+
+def settle(order: Order) -> None:
+    """The order has been paid: its hold becomes a sale (called inside the mark-paid transaction)."""
+    loaded = not {"reserved_until", "stock_released"} & order.get_deferred_fields()
+    if loaded and order.reserved_until is None and not order.stock_released:
+        return  # nothing sized in it: no hold was ever taken, so none can have run out since
+    if Order.objects.filter(pk=order.pk, reserved_until__isnull=False).update(reserved_until=None):
+        return
+    if not Order.objects.filter(pk=order.pk, stock_released=True).update(stock_released=False):
+        return  # nothing sized in it
+
+    # paid after the hold ran out: the stock has to be taken again
+    for item in OrderItem.objects.filter(order=order, variant__isnull=False).select_related("variant"):
+        try:
+            item.stock_shard = inventory.take(item.variant_id, item.quantity, item.variant.shards)
+        except inventory.OutOfStock:
+            STOCK_RESERVATIONS.labels("oversold").inc()
+            logger.error(
+                "Order %s was paid after its stock hold ran out and %s x %s is no longer available",
+                order.pk, item.quantity, item.variant,
+            )
+            continue
+        item.save(update_fields=["stock_shard"])
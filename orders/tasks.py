@@ -1,23 +1,25 @@
 from celery import shared_task
-from django.core.mail import send_mail
 
+from mailer.dispatch import queue_mail
 from .models import Order
 
 
 @shared_task
 def order_created(order_id):
     """
-    Task to send an e-mail notification when an order is
-    successfully created.
+    Task to queue an e-mail notification when an order is
+    successfully created. The mail queue drainer does the sending.
     """
     order = Order.objects.get(id=order_id)
-    subject = f'Order nr. {order.id}'
-    message = (
-        f'Dear {order.first_name},\n\n'
-        f'You have successfully placed an order.'
-        f'Your order ID is {order.id}.'
+    email = queue_mail(
+        "order_created", {"order": order}, [order.email], from_email='admin@myshop.com'
     )
-    mail_sent = send_mail(
-        subject, message, 'admin@myshop.com', [order.email]
-    )
-    return mail_sent
\ No newline at end of file
+    return email.id
+
+
+@shared_task
+def release_expired_reservations():
+    """Periodic: give back the stock held by orders left unpaid past their reservation."""
+    from .stock import release_expired
+
+    return release_expired()
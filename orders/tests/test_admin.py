@@ -0,0 +1,101 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from myshop.changelists import EstimatedCountPaginator, probed_dates
+from orders.models import Order, OrderItem
+from shop.models import Category, Product
+
+
+def order(email="ann@example.com", created=None):
+    o = Order.objects.create(
+        first_name="ann", last_name="lee", email=email, address="1 Street", postal_code="sw1a1aa", city="London",
+    )
+    if created:
+        Order.objects.filter(pk=o.pk).update(created=created)
+    return o
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.url = reverse("admin:orders_order_changelist")
+
+    def results(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(o.pk for o in response.context["cl"].result_list)
+
+    def test_search_is_by_id_or_email_prefix(self):
+        ann, bob = order("Ann.Lee@example.com"), order("bob@example.com")
+        self.assertEqual(self.results(q=str(bob.pk)), [bob.pk])
+        self.assertEqual(self.results(q=f"#{ann.pk}"), [ann.pk])
+        self.assertEqual(self.results(q="ann.l"), [ann.pk])
+        self.assertEqual(self.results(q="example.com"), [])  # prefixes only: no scan for substrings
+        self.assertEqual(self.results(q="²"), [])  # a digit, but not a number
+
+    def test_changelist_counts_once(self):
+        order(), order()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {"paid__exact": 0})
+        counts = [q["sql"] for q in queries if "COUNT(" in q["sql"]]
+        self.assertEqual(len(counts), 1)  # no unfiltered COUNT, no facet counts
+
+    def test_date_hierarchy_drills_down(self):
+        order(created=datetime(2025, 12, 31, 23, tzinfo=dt_timezone.utc))
+        order(created=datetime(2026, 2, 3, 9, tzinfo=dt_timezone.utc))
+        response = self.client.get(self.url, {"created__year": 2026})
+        self.assertContains(response, "created__month=2")
+        self.assertNotContains(response, "created__month=12")
+
+    def test_order_page_queries_do_not_grow_with_items(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        products = [
+            Product.objects.create(category=category, name=f"P{i}", slug=f"p{i}", price=10) for i in range(5)
+        ]
+        small, big = order(), order()
+        OrderItem.objects.create(order=small, product=products[0], price=10, quantity=1)
+        for product in products:
+            OrderItem.objects.create(order=big, product=product, price=10, quantity=1)
+
+        def queries(o):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse("admin:orders_order_change", args=[o.pk]))
+            self.assertContains(response, "P0")
+            return len(captured)
+
+        queries(small)  # warm the per-process caches (content types, user)
+        self.assertEqual(queries(big), queries(small))
+
+
+class ChangelistHelperTests(TestCase):
+    def test_estimates_above_the_threshold_replace_the_count(self):
+        order()
+        with patch("myshop.changelists.estimated_count", return_value=5_000_000):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.all(), 100).count, 5_000_000)
+        with patch("myshop.changelists.estimated_count", return_value=40):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.all(), 100).count, 1)
+        self.assertEqual(EstimatedCountPaginator(Order.objects.all(), 100).count, 1)  # no estimate off PostgreSQL
+
+    def test_filtered_changelists_are_counted_exactly(self):
+        order()
+        with patch("myshop.changelists.estimated_count", return_value=5_000_000) as estimate:
+            self.assertEqual(EstimatedCountPaginator(Order.objects.filter(paid=False), 100).count, 1)
+        estimate.assert_not_called()
+
+    def test_probed_dates_match_distinct_dates(self):
+        for moment in [(2024, 5, 1), (2026, 1, 31), (2026, 1, 31), (2026, 3, 2), (2026, 12, 31)]:
+            order(created=datetime(*moment, 12, tzinfo=dt_timezone.utc))
+        orders = Order.objects.all()
+        for kind in ("year", "month", "day"):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    list(probed_dates(orders).datetimes("created", kind)),
+                    list(orders.datetimes("created", kind)),
+                )
+        self.assertEqual(list(probed_dates(orders.none()).datetimes("created", "year")), [])
@@ -0,0 +1,156 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders import rollups
+from orders.models import DailySales, DailySalesBreakdown, Order, OrderItem
+from orders.signals import order_paid
+from payment.views import _mark_paid_from_session
+from payment.webhook import _finalize_order
+from shop.models import Category, Product, Team
+
+CHECKOUT = {
+    "first_name": "ann", "last_name": "lee", "email": "ann@example.com",
+    "address": "1 Street", "postal_code": "sw1a1aa", "city": "London",
+}
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.home = Category.objects.create(name="Home", slug="home")
+        self.away = Category.objects.create(name="Away", slug="away")
+        self.arsenal = Team.objects.create(name="Arsenal")
+        self.celtic = Team.objects.create(name="Celtic")
+        self.products = {
+            "arsenal_home": Product.objects.create(category=self.home, team=self.arsenal, name="A", slug="a", price=50),
+            "arsenal_away": Product.objects.create(category=self.away, team=self.arsenal, name="B", slug="b", price=45),
+            "celtic_home": Product.objects.create(category=self.home, team=self.celtic, name="C", slug="c", price=40),
+            "retro": Product.objects.create(category=self.home, name="D", slug="d", price=30),
+        }
+
+    def order(self, day: date, *lines, paid=True):
+        order = Order.objects.create(**CHECKOUT, paid=paid)
+        created = datetime(day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc)
+        Order.objects.filter(pk=order.pk).update(created=created)
+        for name, quantity in lines:
+            product = self.products[name]
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+        return order
+
+    def pay(self, order):
+        order_paid.send(sender=Order, order=order)
+
+    def breakdown(self):
+        return sorted(
+            DailySalesBreakdown.objects.values_list(
+                "day", "team__name", "category__name", "orders", "units", "revenue",
+            ),
+            key=str,
+        )
+
+    def test_paid_orders_are_added_to_the_rollups(self):
+        day = date(2026, 5, 1)
+        self.pay(self.order(day, ("arsenal_home", 2), ("arsenal_away", 1), ("retro", 1)))
+        self.pay(self.order(day, ("arsenal_home", 1)))
+
+        self.assertEqual(
+            list(DailySales.objects.values_list("day", "orders", "units", "revenue")),
+            [(day, 2, 5, Decimal("225.00"))],
+        )
+        self.assertEqual(self.breakdown(), [
+            (day, "Arsenal", "Away", 1, 1, Decimal("45.00")),
+            (day, "Arsenal", "Home", 2, 3, Decimal("150.00")),
+            (day, None, "Home", 1, 1, Decimal("30.00")),
+        ])
+
+    def test_a_sale_is_one_grouped_read_and_counter_updates(self):
+        self.pay(self.order(date(2026, 5, 1), ("arsenal_home", 1), ("celtic_home", 1)))
+        order = self.order(date(2026, 5, 1), ("arsenal_home", 2), ("celtic_home", 1))
+        with self.assertNumQueries(4):  # items grouped by team/category, two breakdown rows, the day
+            rollups.record_sale(order)
+        self.assertEqual(DailySales.objects.get().units, 5)
+
+    def test_paying_the_same_order_twice_counts_it_once(self):
+        order = self.order(date(2026, 5, 1), ("arsenal_home", 2), paid=False)
+        # the webhook and the thank-you page each loaded the order before either marked it paid
+        from_webhook, from_page = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+
+        self.assertEqual(_finalize_order(from_webhook, "pi_1"), "paid")
+        _mark_paid_from_session(from_page, {"payment_status": "paid", "payment_intent": "pi_1"})
+        self.assertEqual(_finalize_order(Order.objects.get(pk=order.pk), "pi_1"), "already_paid")
+
+        self.assertEqual(list(DailySales.objects.values_list("orders", "units")), [(1, 2)])
+        self.assertEqual(list(DailySalesBreakdown.objects.values_list("orders", "units")), [(1, 2)])
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        self.pay(self.order(date(2026, 5, 1), ("arsenal_home", 2), ("retro", 1)))
+        self.pay(self.order(date(2026, 5, 2), ("celtic_home", 3)))
+        self.order(date(2026, 5, 2), ("celtic_home", 9), paid=False)
+        incremental = (list(DailySales.objects.values_list("day", "orders", "units", "revenue")), self.breakdown())
+
+        out = StringIO()
+        call_command("rebuild_sales_rollups", stdout=out)
+
+        self.assertIn("2 days of sales", out.getvalue())
+        self.assertEqual(
+            (list(DailySales.objects.values_list("day", "orders", "units", "revenue")), self.breakdown()), incremental,
+        )
+
+    def test_rebuild_since_keeps_earlier_days(self):
+        self.pay(self.order(date(2026, 5, 1), ("arsenal_home", 1)))
+        DailySales.objects.filter(day=date(2026, 5, 1)).update(orders=99)
+        rollups.rebuild(since=date(2026, 5, 2))
+        self.assertEqual(DailySales.objects.get().orders, 99)
+
+    def test_rollups_outlive_deleted_teams_and_categories(self):
+        day = date(2026, 5, 1)
+        self.pay(self.order(day, ("celtic_home", 1), ("arsenal_away", 1), ("retro", 1)))
+        celtic_id, away_id = self.celtic.pk, self.away.pk
+        self.celtic.delete()
+        self.away.delete()
+
+        report = rollups.report(day, day)
+
+        self.assertEqual(
+            [(row["team_id"], row["name"], row["revenue"]) for row in report["teams"]],
+            [(self.arsenal.pk, "Arsenal", Decimal("45.00")), (celtic_id, None, Decimal("40.00")),
+             (None, None, Decimal("30.00"))],
+        )
+        self.assertEqual(
+            [(row["category_id"], row["name"]) for row in report["categories"]],
+            [(self.home.pk, "Home"), (away_id, None)],
+        )
+        self.assertEqual(report["totals"]["revenue"], Decimal("115.00"))
+
+    def test_report_does_not_sum_order_counts_across_rows(self):
+        day = date(2026, 5, 1)
+        self.pay(self.order(day, ("arsenal_home", 1), ("arsenal_away", 1)))
+
+        report = rollups.report(day, day)
+        self.assertEqual(report["totals"]["orders"], 1)
+        [arsenal] = report["teams"]
+        self.assertEqual((arsenal["name"], arsenal["units"], arsenal["revenue"]), ("Arsenal", 2, Decimal("95.00")))
+        self.assertNotIn("orders", arsenal)
+        self.assertTrue(all("orders" not in row for row in report["categories"]))
+
+    def test_dashboard_reads_only_the_rollups(self):
+        today = date.today()
+        self.pay(self.order(today, ("arsenal_home", 2), ("celtic_home", 1)))
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("orders:admin_sales"), {"days": 7})
+
+        self.assertEqual(response.status_code, 200)
+        raw = [q["sql"] for q in queries if '"orders_order"' in q["sql"] or '"orders_orderitem"' in q["sql"]]
+        self.assertEqual(raw, [])
+        self.assertEqual(response.context["report"]["totals"], {"orders": 1, "units": 3, "revenue": Decimal("140.00")})
+        self.assertEqual([row["name"] for row in response.context["report"]["teams"]], ["Arsenal", "Celtic"])
+        self.assertContains(response, "By category")
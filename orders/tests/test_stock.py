@@ -0,0 +1,159 @@
+from datetime import timedelta
+
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from orders import stock
+from orders.models import Order, OrderItem
+from orders.tasks import release_expired_reservations
+from payment.views import _checkout_session_params
+from payment.webhook import _finalize_order
+from shop import inventory
+from shop.models import Category, Product, ProductVariant
+
+CHECKOUT = {
+    "first_name": "ann", "last_name": "lee", "email": "ann@example.com",
+    "address": "1 Street", "postal_code": "sw1a1aa", "city": "London",
+}
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.product = Product.objects.create(category=category, name="Home", slug="home", price="50.00")
+        self.small = ProductVariant.objects.create(product=self.product, size="S", stock=5)
+        self.large = ProductVariant.objects.create(product=self.product, size="L", stock=1, position=2)
+
+    def add(self, variant, quantity=1):
+        self.client.post(
+            reverse("cart:cart_add", args=[self.product.id]), {"quantity": quantity, "variant": variant.id},
+        )
+
+    def stock(self, variant):
+        variant.refresh_from_db()
+        return variant.stock
+
+    def checkout(self):
+        self.client.post(reverse("orders:order_create"), CHECKOUT)
+        return Order.objects.latest("id")
+
+    def expire(self, order):
+        Order.objects.filter(pk=order.pk).update(reserved_until=timezone.now() - timedelta(seconds=1))
+
+    def test_sizes_are_separate_cart_lines(self):
+        self.add(self.small, 2)
+        self.add(self.large)
+        cart = self.client.session["cart"]
+        self.assertEqual(cart[f"{self.product.id}:{self.small.id}"]["quantity"], 2)
+        self.assertEqual(cart[f"{self.product.id}:{self.large.id}"]["size"], "L")
+
+        self.client.post(reverse("cart:cart_remove", args=[self.product.id]), {"variant": self.large.id})
+        self.assertEqual(list(self.client.session["cart"]), [f"{self.product.id}:{self.small.id}"])
+
+    def test_a_size_must_be_picked_and_in_stock(self):
+        self.client.post(reverse("cart:cart_add", args=[self.product.id]), {"quantity": 1})
+        ProductVariant.objects.filter(pk=self.large.pk).update(stock=0)
+        self.add(self.large)
+        self.assertNotIn("cart", self.client.session)
+
+    def test_checkout_reserves_the_stock(self):
+        self.add(self.small, 2)
+        self.add(self.large)
+        order = self.checkout()
+
+        self.assertEqual((self.stock(self.small), self.stock(self.large)), (3, 0))
+        self.assertIsNotNone(order.reserved_until)
+        self.assertEqual(
+            sorted(order.items.values_list("size", "quantity")), [("L", 1), ("S", 2)],
+        )
+
+    def test_checkout_fails_whole_when_a_size_has_gone(self):
+        self.add(self.small, 2)
+        self.add(self.large)
+        ProductVariant.objects.filter(pk=self.large.pk).update(stock=0)  # someone else got it
+
+        response = self.client.post(reverse("orders:order_create"), CHECKOUT)
+
+        self.assertRedirects(response, reverse("cart:cart_detail"), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.small), 5)  # the S taken first was rolled back
+        self.assertIn("cart", self.client.session)
+
+    def test_unpaid_orders_give_their_stock_back(self):
+        self.add(self.small, 2)
+        order = self.checkout()
+        self.assertEqual(release_expired_reservations(), 0)  # hold still running
+
+        self.expire(order)
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(self.small), 5)
+        order.refresh_from_db()
+        self.assertEqual((order.reserved_until, order.stock_released), (None, True))
+        self.assertEqual(release_expired_reservations(), 0)
+
+    def test_payment_turns_the_hold_into_a_sale(self):
+        self.add(self.small, 2)
+        order = self.checkout()
+        _finalize_order(order, "pi_1")
+        self.expire(order)  # a no-op: payment cleared the hold
+
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(self.stock(self.small), 3)
+
+    def test_late_payment_takes_the_stock_again(self):
+        self.add(self.small, 2)
+        self.add(self.large)
+        order = self.checkout()
+        self.expire(order)
+        stock.release_expired()
+        ProductVariant.objects.filter(pk=self.large.pk).update(stock=0)  # the L sold meanwhile
+
+        with self.assertLogs("orders.stock", "ERROR"):
+            _finalize_order(order, "pi_1")
+
+        self.assertEqual(self.stock(self.small), 3)
+        order.refresh_from_db()
+        self.assertFalse(order.stock_released)
+
+    def test_reservations_can_come_from_shards(self):
+        inventory.spread(self.small, 4)  # 2, 1, 1, 1
+        self.add(self.small, 2)
+        order = self.checkout()
+        self.assertEqual(order.items.get().stock_shard, 0)  # the only shard with two left
+        self.assertEqual(self.small.stock_shards.get(index=0).stock, 0)
+
+        self.expire(order)
+        stock.release_expired()
+        self.assertEqual(self.small.stock_shards.get(index=0).stock, 2)
+
+    def test_stripe_checkout_closes_with_the_hold(self):
+        self.add(self.small)
+        order = self.checkout()
+        order.reserved_until = timezone.now() + timedelta(hours=1)
+        params = _checkout_session_params(RequestFactory().get("/"), order)
+        self.assertEqual(params["expires_at"], int(order.reserved_until.timestamp()))
+        self.assertEqual(params["line_items"][0]["price_data"]["product_data"]["name"], "Home (S)")
+
+    def test_reserve_takes_every_line_in_two_statements(self):
+        inventory.spread(self.small, 2)  # 3, 2
+        order = Order(**CHECKOUT)
+        items = [
+            OrderItem(order=order, product=self.product, variant=self.large, price=1, quantity=1),
+            OrderItem(order=order, product=self.product, variant=self.small, price=1, quantity=3),
+            OrderItem(order=order, product=self.product, price=1, quantity=1),
+        ]
+        with self.assertNumQueries(2):  # shard rows, then variant rows
+            self.assertTrue(stock.reserve(items))
+        self.assertEqual([item.stock_shard for item in items], [None, 0, None])
+        self.assertEqual(self.stock(self.large), 0)
+
+    def test_reserve_names_the_line_that_is_short(self):
+        order = Order(**CHECKOUT)
+        items = [
+            OrderItem(order=order, product=self.product, variant=self.small, price=1, quantity=1),
+            OrderItem(order=order, product=self.product, variant=self.large, price=1, quantity=2),
+        ]
+        with self.assertRaises(inventory.OutOfStock) as raised:
+            stock.reserve(items)
+        self.assertEqual((raised.exception.variant_id, raised.exception.quantity), (self.large.id, 2))
@@ -18,4 +18,5 @@ urlpatterns = [
         views.admin_order_pdf,
         name='admin_order_pdf',
     ),
+    path('admin/sales/', views.admin_sales, name='admin_sales'),
 ]
\ No newline at end of file
@@ -1,18 +1,29 @@
 # orders/views.py
-from django.conf import settings
+from datetime import timedelta
+from functools import cache
+
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.staticfiles import finders
+from django.db import transaction
 from django.http import HttpResponse, HttpResponseServerError
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
+from django.utils import timezone
 
 from cart.cart import Cart
+from myshop.metrics import ORDERS_CREATED
+from myshop.ratelimit import ratelimit
+from outbox.relay import enqueue
+from shop import drops
+from shop.inventory import OutOfStock
+from . import rollups, stock
 from .forms import OrderCreateForm
 from .models import Order, OrderItem
 from .tasks import order_created
 
 
+@ratelimit("checkout")
 def order_create(request):
     """
     Create an order from the current cart.
@@ -26,35 +37,60 @@ def order_create(request):
     if not cart:  # Cart.__len__ == 0 => falsy
         return redirect("cart:cart_detail")
 
+    # limited drops: the admission cookie must still be valid (signature check, no query)
+    expired = drops.needs_admission(request, cart.product_ids())
+    if expired:
+        messages.warning(request, "Your place for a limited drop has expired. Please queue again to check out.")
+        return redirect("shop:drop_waiting", expired[0])
+
     if request.method == "POST":
         form = OrderCreateForm(request.POST)
         if form.is_valid():
-            # Create order
-            order = form.save()
-
-            # Attach user if logged in (guest checkout otherwise)
-            if request.user.is_authenticated:
-                order.user = request.user
-                order.save(update_fields=["user"])
-
-            # Persist line items
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item["product"],
-                    price=item["price"],
-                    quantity=item["quantity"],
+            try:
+                with transaction.atomic():
+                    # Create order
+                    order = form.save(commit=False)
+
+                    # Attach user if logged in (guest checkout otherwise)
+                    if request.user.is_authenticated:
+                        order.user = request.user
+
+                    items = [
+                        OrderItem(
+                            order=order,
+                            product=item["product"],
+                            variant_id=item.get("variant"),
+                            size=item.get("size", ""),
+                            price=item["price"],
+                            quantity=item["quantity"],
+                        )
+                        for item in cart
+                    ]
+                    # Sized stock is taken here by conditional UPDATEs; nothing stays
+                    # locked once this commits, however long the shopper spends on Stripe
+                    if stock.reserve(items):
+                        order.reserved_until = stock.hold_until()
+                    order.save()
+
+                    # Persist line items in one INSERT
+                    OrderItem.objects.bulk_create(items)
+
+                    # Confirmation email goes out via the outbox once this commits
+                    enqueue(order_created, order.id)
+            except OutOfStock as exc:
+                short = next(item for item in items if item.variant_id == exc.variant_id)
+                messages.error(
+                    request,
+                    f"Sorry, there aren't {short.quantity} of {short.product.name} ({short.size}) left. "
+                    "Please change your cart and try again.",
                 )
+                return redirect("cart:cart_detail")
+
+            ORDERS_CREATED.labels("user" if order.user_id else "guest").inc()
 
             # Clear cart now that order is created
             cart.clear()
 
-            # Send confirmation email/task (sync in DEBUG, async in prod)
-            if settings.DEBUG:
-                order_created(order.id)
-            else:
-                order_created.delay(order.id)
-
             # Remember this order for the payment step
             request.session["order_id"] = order.id
 
@@ -70,10 +106,43 @@ def order_create(request):
 
 @staff_member_required
 def admin_order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.prefetch_related("items__product"), id=order_id)
     return render(request, "admin/orders/order/detail.html", {"order": order})
 
 
+SALES_PERIODS = (7, 30, 90, 365)
+
+
+@staff_member_required
+def admin_sales(request):
+    """Sales dashboard; every figure comes from the daily rollups (orders/rollups.py)."""
+    try:
+        days = int(request.GET.get("days", 30))
+    except ValueError:
+        days = 30
+    if days not in SALES_PERIODS:
+        days = 30
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    return render(request, "admin/orders/sales.html", {
+        "title": "Sales",
+        "report": rollups.report(start, end),
+        "start": start,
+        "end": end,
+        "days": days,
+        "periods": SALES_PERIODS,
+    })
+
+
+@cache
+def pdf_stylesheets():
+    """weasyprint.CSS for css/pdf.css, parsed once per process (`manage.py warmup` does it early)."""
+    import weasyprint
+
+    css_path = finders.find("css/pdf.css")
+    return [weasyprint.CSS(css_path)] if css_path else []
+
+
 @staff_member_required
 def admin_order_pdf(request, order_id):
     # Import here so local environments without WeasyPrint don't break startup
@@ -85,11 +154,10 @@ def admin_order_pdf(request, order_id):
             f"WeasyPrint dependencies are missing. Details: {e}"
         )
 
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.prefetch_related("items__product"), id=order_id)
     html = render_to_string("orders/order/pdf.html", {"order": order})
 
-    css_path = finders.find("css/pdf.css")
-    stylesheets = [weasyprint.CSS(css_path)] if css_path else []
+    stylesheets = pdf_stylesheets()
 
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'attachment; filename="order_{order.id}.pdf"'
@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ["id", "task_name", "created", "sent_at", "failed_at", "attempts"]
+    list_filter = ["task_name", ("failed_at", admin.EmptyFieldListFilter)]
+    readonly_fields = ["created", "sent_at", "failed_at", "last_error"]
+    actions = ["retry"]
+
+    @admin.action(description="Retry dead-lettered messages")
+    def retry(self, request, queryset):
+        count = queryset.filter(sent_at__isnull=True, failed_at__isnull=False).update(failed_at=None, attempts=0)
+        self.message_user(request, f"{count} message(s) queued for relay again.")
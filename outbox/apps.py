@@ -0,0 +1,18 @@
+import logging
+
+from django.apps import AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'outbox'
+
+    def ready(self):
+        from myshop.celery import get_execution_mode
+
+        from . import checks  # noqa: F401  (registers the execution-mode check)
+
+        # once per process, not on every run of the system checks
+        logger.info("Task execution mode: %s", get_execution_mode())
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from myshop.celery import EXECUTION_MODES, get_execution_mode
+
+
+@register(Tags.compatibility)
+def check_task_execution_mode(app_configs=None, **kwargs):
+    """Catch task execution mode mis-configurations (the mode is logged by OutboxConfig.ready)."""
+    mode = get_execution_mode()
+    if mode not in EXECUTION_MODES:
+        return [
+            Error(
+                f"TASK_EXECUTION_MODE={mode!r} is not one of {', '.join(EXECUTION_MODES)}.",
+                id="outbox.E001",
+            )
+        ]
+    if mode == "worker" and not settings.CELERY_BROKER_URL:
+        return [
+            Error(
+                "TASK_EXECUTION_MODE is 'worker' but no Celery broker is configured.",
+                hint="Set REDIS_URL/CELERY_BROKER_URL, or use TASK_EXECUTION_MODE=thread.",
+                id="outbox.E002",
+            )
+        ]
+    return []
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.relay import purge_sent, relay_pending
+
+
+class Command(BaseCommand):
+    help = "Publish pending outbox rows to Celery (run with --loop as a long-lived process)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep relaying until stopped.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--purge-every",
+            type=int,
+            default=3600,
+            help="Seconds between deleting old relayed rows (loop mode).",
+        )
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            total = 0
+            while sent := relay_pending(options["batch_size"]):
+                total += sent
+            self.stdout.write(self.style.SUCCESS(f"Published {total} message(s)."))
+            return
+
+        last_purge = 0.0
+        while True:
+            sent = relay_pending(options["batch_size"])
+            if time.monotonic() - last_purge > options["purge_every"]:
+                purge_sent()
+                last_purge = time.monotonic()
+            if not sent:
+                time.sleep(options["interval"])
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task call recorded in the same transaction as the change that
+    caused it. The relay publishes it to the broker after commit. A message
+    that keeps failing for reasons of its own (an unregistered task, args the
+    broker can't serialize) is dead-lettered: `failed_at` is set and the
+    relay stops trying it.
+    """
+    task_name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["sent_at", "id"])]
+
+    def __str__(self):
+        return f"{self.task_name}{tuple(self.args)}"
@@ -0,0 +1,91 @@
+# outbox/relay.py
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from myshop.celery import get_execution_mode
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Can't reach the broker: every later row would fail the same way.
+BROKER_ERRORS = (OperationalError, OSError)
+
+
+def enqueue(task, *args, **kwargs) -> OutboxMessage:
+    """
+    Record a task call in the outbox. Call this inside the same
+    transaction.atomic() block as the write it belongs to: if that
+    transaction rolls back, the task is never sent.
+    """
+    name = task if isinstance(task, str) else task.name
+    message = OutboxMessage.objects.create(task_name=name, args=list(args), kwargs=kwargs)
+    if getattr(settings, "OUTBOX_RELAY_ON_COMMIT", False) or get_execution_mode() == "thread":
+        # single-process setups (dev, thread mode) publish straight after commit
+        transaction.on_commit(relay_pending)
+    return message
+
+
+def relay_pending(batch_size: int | None = None) -> int:
+    """
+    Publish one batch of pending outbox rows to Celery and mark them sent.
+    Stops at the first broker error so the rest are retried on the next pass.
+    Any other error is the message's own: the row is skipped, and after
+    OUTBOX_MAX_ATTEMPTS tries it is dead-lettered (failed_at set).
+    Returns the number of messages published.
+    """
+    batch_size = batch_size or getattr(settings, "OUTBOX_BATCH_SIZE", 100)
+    max_attempts = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+    sent = 0
+    with transaction.atomic():
+        rows = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(sent_at__isnull=True, failed_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        for row in rows:
+            row.attempts += 1
+            try:
+                current_app.tasks[row.task_name].apply_async(args=row.args, kwargs=row.kwargs)
+            except BROKER_ERRORS as exc:
+                row.last_error = f"{type(exc).__name__}: {exc}"
+                logger.warning("Outbox: publishing %s (id=%s) failed: %s", row.task_name, row.id, exc)
+                break
+            except Exception as exc:
+                row.last_error = f"{type(exc).__name__}: {exc}"
+                if row.attempts >= max_attempts:
+                    row.failed_at = timezone.now()
+                    logger.error(
+                        "Outbox: giving up on %s (id=%s) after %s attempts: %s",
+                        row.task_name, row.id, row.attempts, exc,
+                    )
+                else:
+                    logger.warning("Outbox: publishing %s (id=%s) failed: %s", row.task_name, row.id, exc)
+                continue
+            row.sent_at = timezone.now()
+            sent += 1
+
+        OutboxMessage.objects.bulk_update(rows, ["attempts", "sent_at", "failed_at", "last_error"])
+
+    if sent:
+        logger.info("Outbox: published %s message(s)", sent)
+    return sent
+
+
+def purge_sent(older_than_days: int | None = None) -> int:
+    """Delete relayed rows older than the retention window."""
+    days = older_than_days if older_than_days is not None else getattr(settings, "OUTBOX_RETENTION_DAYS", 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxMessage.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,128 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.apps import apps
+from django.conf import settings
+from django.core import mail
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from mailer.dispatch import queue_mail
+from mailer.models import OutgoingEmail
+from myshop.celery import PeriodicRunner
+from orders.models import Order
+from orders.tasks import order_created
+from outbox.checks import check_task_execution_mode
+from outbox.models import OutboxMessage
+from outbox.relay import enqueue
+from shop.models import Category, Product
+
+TASK_RUNTIME = 0.5
+
+CHECKOUT = {
+    "first_name": "ann", "last_name": "lee", "email": "ann@example.com",
+    "address": "1 Street", "postal_code": "sw1a1aa", "city": "London",
+}
+
+
+@override_settings(OUTBOX_RELAY_ON_COMMIT=True)
+class RequestLatencyTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        product = Product.objects.create(category=cat, name="P", slug="p", price="10.00")
+        self.client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 1})
+        self.finished = threading.Event()
+
+    def slow_task(self, order_id):
+        time.sleep(TASK_RUNTIME)
+        self.finished.set()
+
+    def checkout(self):
+        """POST the checkout form, including the on-commit outbox relay, and time it."""
+        start = time.perf_counter()
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse("orders:order_create"), CHECKOUT)
+        self.assertEqual(resp.status_code, 302)
+        return time.perf_counter() - start
+
+    @override_settings(TASK_EXECUTION_MODE="eager")
+    def test_eager_mode_includes_task_runtime(self):
+        with patch.object(order_created, "run", side_effect=self.slow_task):
+            elapsed = self.checkout()
+        self.assertGreaterEqual(elapsed, TASK_RUNTIME)
+
+    @override_settings(TASK_EXECUTION_MODE="thread")
+    def test_thread_mode_does_not_include_task_runtime(self):
+        with patch.object(order_created, "run", side_effect=self.slow_task):
+            elapsed = self.checkout()
+            self.assertLess(elapsed, TASK_RUNTIME)
+            # ...but the task still runs in the background
+            self.assertTrue(self.finished.wait(timeout=5))
+
+
+@override_settings(TASK_EXECUTION_MODE="thread", OUTBOX_RELAY_ON_COMMIT=False)
+class ThreadModeTests(TransactionTestCase):
+    """Thread mode has no broker, hence no beat and no separate relay process."""
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("timed out")
+            time.sleep(0.02)
+
+    def test_queued_mail_goes_out(self):
+        order = Order.objects.create(**CHECKOUT)
+        queue_mail("payment_completed", {"order": order}, [order.email])
+
+        self.assertIn("send-queued-mail", PeriodicRunner().entries)
+        runner = PeriodicRunner({"send-queued-mail": settings.CELERY_BEAT_SCHEDULE["send-queued-mail"]})
+        runner.start()
+        self.addCleanup(runner.stopped.set)
+
+        self.wait_for(lambda: len(mail.outbox) == 1)
+        self.assertEqual(mail.outbox[0].to, ["ann@example.com"])
+        self.wait_for(lambda: OutgoingEmail.objects.get().status == OutgoingEmail.STATUS_SENT)
+
+    def test_outbox_relays_on_commit(self):
+        with patch.object(order_created, "run") as run:
+            enqueue(order_created, 1)
+            self.wait_for(lambda: run.called)
+        self.wait_for(lambda: OutboxMessage.objects.get().sent_at is not None)
+
+    def test_tick_reports_the_next_due_task(self):
+        with patch.object(order_created, "apply_async") as apply_async:
+            runner = PeriodicRunner({"soon": {"task": order_created.name, "schedule": 5, "args": (1,)}})
+            self.assertLessEqual(runner.tick(), 5)
+            runner.tick()
+        apply_async.assert_called_once_with((1,), {})
+
+
+class ExecutionModeCheckTests(SimpleTestCase):
+    @override_settings(TASK_EXECUTION_MODE="sometimes")
+    def test_unknown_mode_is_an_error(self):
+        self.assertEqual([e.id for e in check_task_execution_mode()], ["outbox.E001"])
+
+    @override_settings(TASK_EXECUTION_MODE="worker", CELERY_BROKER_URL="")
+    def test_worker_mode_needs_a_broker(self):
+        self.assertEqual([e.id for e in check_task_execution_mode()], ["outbox.E002"])
+
+    @override_settings(TASK_EXECUTION_MODE="thread")
+    def test_check_is_silent_when_valid(self):
+        with self.assertNoLogs("outbox", level="INFO"):
+            self.assertEqual(check_task_execution_mode(), [])
+
+    @override_settings(TASK_EXECUTION_MODE="thread")
+    def test_mode_is_logged_at_startup(self):
+        with self.assertLogs("outbox.apps", level="INFO") as logs:
+            apps.get_app_config("outbox").ready()
+        self.assertIn("Task execution mode: thread", logs.output[0])
+
+
+class EagerModeTests(SimpleTestCase):
+    @override_settings(TASK_EXECUTION_MODE="eager")
+    def test_task_exceptions_propagate(self):
+        with patch.object(order_created, "run", side_effect=RuntimeError("boom")):
+            with self.assertRaisesMessage(RuntimeError, "boom"):
+                order_created.delay(1)
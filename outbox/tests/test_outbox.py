@@ -0,0 +1,130 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from orders.models import Order
+from orders.tasks import order_created
+from outbox.models import OutboxMessage
+from outbox.relay import enqueue, relay_pending
+from shop.models import Category, Product
+
+
+@override_settings(OUTBOX_RELAY_ON_COMMIT=False)
+class OutboxRelayTests(TestCase):
+    def test_rolled_back_write_leaves_no_message(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue(order_created, 1)
+                raise RuntimeError("rollback")
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @patch.object(order_created, "apply_async")
+    def test_relay_publishes_in_order_and_marks_sent(self, mock_apply):
+        first = enqueue(order_created, 1)
+        second = enqueue("orders.tasks.order_created", 2)
+
+        self.assertEqual(relay_pending(), 2)
+
+        self.assertEqual(
+            [c.kwargs["args"] for c in mock_apply.call_args_list], [[1], [2]]
+        )
+        for msg in (first, second):
+            msg.refresh_from_db()
+            self.assertIsNotNone(msg.sent_at)
+        self.assertEqual(relay_pending(), 0)
+
+    @patch.object(order_created, "apply_async", side_effect=ConnectionError("broker down"))
+    def test_broker_failure_keeps_rows_pending(self, _mock_apply):
+        enqueue(order_created, 1)
+        enqueue(order_created, 2)
+
+        self.assertEqual(relay_pending(), 0)
+
+        first, second = OutboxMessage.objects.all()
+        self.assertIsNone(first.sent_at)
+        self.assertEqual(first.attempts, 1)
+        self.assertIn("broker down", first.last_error)
+        self.assertEqual(second.attempts, 0)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    @patch.object(order_created, "apply_async")
+    def test_unregistered_task_is_skipped_then_dead_lettered(self, mock_apply):
+        stray = enqueue("orders.tasks.no_such_task", 1)
+        enqueue(order_created, 2)
+
+        self.assertEqual(relay_pending(), 1)
+        mock_apply.assert_called_once_with(args=[2], kwargs={})
+        stray.refresh_from_db()
+        self.assertEqual((stray.attempts, stray.failed_at), (1, None))
+        self.assertIn("NotRegistered", stray.last_error)
+
+        self.assertEqual(relay_pending(), 0)
+        stray.refresh_from_db()
+        self.assertIsNone(stray.sent_at)
+        self.assertIsNotNone(stray.failed_at)
+
+        # dead letters are left alone
+        self.assertEqual(relay_pending(), 0)
+        stray.refresh_from_db()
+        self.assertEqual(stray.attempts, 2)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=1)
+    @patch.object(order_created, "apply_async")
+    def test_message_that_always_fails_does_not_block_the_rest(self, mock_apply):
+        mock_apply.side_effect = [TypeError("not JSON serializable"), None]
+        poison = enqueue(order_created, 1)
+        enqueue(order_created, 2)
+
+        self.assertEqual(relay_pending(), 1)
+
+        poison.refresh_from_db()
+        self.assertIsNotNone(poison.failed_at)
+        self.assertFalse(OutboxMessage.objects.filter(sent_at__isnull=True, failed_at__isnull=True).exists())
+
+    @patch.object(order_created, "apply_async")
+    def test_relay_command_drains_everything(self, mock_apply):
+        for i in range(5):
+            enqueue(order_created, i)
+        call_command("relay_outbox", batch_size=2, stdout=StringIO())
+        self.assertEqual(mock_apply.call_count, 5)
+        self.assertFalse(OutboxMessage.objects.filter(sent_at__isnull=True).exists())
+
+    @override_settings(OUTBOX_RELAY_ON_COMMIT=True)
+    @patch.object(order_created, "apply_async")
+    def test_relay_on_commit(self, mock_apply):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                enqueue(order_created, 7)
+                mock_apply.assert_not_called()
+        mock_apply.assert_called_once_with(args=[7], kwargs={})
+
+
+@override_settings(OUTBOX_RELAY_ON_COMMIT=False)
+class OrderCreateOutboxTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=cat, name="P", slug="p", price="10.00")
+        self.client.post(reverse("cart:cart_add", args=[self.product.id]), {"quantity": 1})
+
+    @patch.object(order_created, "apply_async")
+    @patch.object(order_created, "run")
+    def test_order_create_writes_outbox_row_without_dispatching(self, mock_run, mock_apply):
+        resp = self.client.post(
+            reverse("orders:order_create"),
+            {
+                "first_name": "ann", "last_name": "lee", "email": "ann@example.com",
+                "address": "1 Street", "postal_code": "sw1a1aa", "city": "London",
+            },
+        )
+        self.assertEqual(resp.status_code, 302)
+
+        order = Order.objects.get()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, "orders.tasks.order_created")
+        self.assertEqual(message.args, [order.id])
+        mock_apply.assert_not_called()
+        mock_run.assert_not_called()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from payment.reconcile import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = "Reconcile unpaid orders against Stripe Checkout Sessions and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=int,
+            default=None,
+            help="Unix timestamp to scan from (default: stored cursor minus lookback).",
+        )
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drift without updating orders or the cursor.",
+        )
+
+    def handle(self, *args, **options):
+        report = reconcile_payments(
+            since=options["since"],
+            page_size=options["page_size"],
+            dry_run=options["dry_run"],
+        )
+        for name, value in report.as_dict().items():
+            self.stdout.write(f"{name}: {value}")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run: no orders were changed."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Reconciliation complete."))
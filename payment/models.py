@@ -1,3 +1,16 @@
 from django.db import models
 
-# Create your models here.
+
+class ReconciliationCursor(models.Model):
+    """
+    Remembers how far the Stripe reconciliation job has scanned, so each
+    run only pages through Checkout Sessions created since the last one.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    # unix timestamp (Stripe's `created`) of the newest session seen so far
+    last_created = models.PositiveBigIntegerField(default=0)
+    last_report = models.JSONField(default=dict, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_created}"
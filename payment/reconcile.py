@@ -0,0 +1,168 @@
+# payment/reconcile.py
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from myshop.instrumentation import track_http
+from myshop.lazyimport import lazy_import
+from orders.models import Order
+from orders.signals import order_paid
+from outbox.relay import enqueue
+from .models import ReconciliationCursor
+from .tasks import payment_completed
+
+stripe = lazy_import("stripe")
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "checkout_sessions"
+
+
+@dataclass
+class ReconcileReport:
+    """Drift counts for one reconciliation run."""
+    pages: int = 0
+    sessions_scanned: int = 0
+    matched: int = 0
+    unmatched: int = 0          # Stripe session with no local order
+    marked_paid: int = 0        # Stripe says paid, we had paid=False (fixed)
+    already_paid: int = 0
+    still_unpaid: int = 0       # session not paid (open/expired)
+    paid_mismatch: int = 0      # we say paid, Stripe's session for that ref doesn't
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _order_ref(session) -> int | None:
+    raw = session.get("client_reference_id") or (session.get("metadata") or {}).get("order_id")
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stripe_refs(session) -> list[str]:
+    return [ref for ref in (session.get("payment_intent"), session.get("id")) if ref]
+
+
+def _reconcile_page(sessions, report: ReconcileReport, dry_run: bool) -> None:
+    """
+    Match one page of Checkout Sessions against local orders with a single
+    bulk lookup, then apply the paid transitions in bulk.
+    """
+    order_ids = {ref for ref in map(_order_ref, sessions) if ref is not None}
+    stripe_ids = {ref for s in sessions for ref in _stripe_refs(s)}
+
+    orders = (
+        Order.objects.filter(Q(id__in=order_ids) | Q(stripe_id__in=stripe_ids))
+        .only("id", "paid", "stripe_id")
+        .order_by()
+    )
+    by_id = {o.id: o for o in orders}
+    by_stripe_id = {o.stripe_id: o for o in by_id.values() if o.stripe_id}
+
+    to_mark: dict[int, str] = {}  # order id -> stripe ref
+    for session in sessions:
+        refs = _stripe_refs(session)
+        order = by_id.get(_order_ref(session)) or next(
+            (by_stripe_id[r] for r in refs if r in by_stripe_id), None
+        )
+        if order is None:
+            report.unmatched += 1
+            continue
+        report.matched += 1
+
+        if session.get("payment_status") == "paid":
+            if order.paid:
+                report.already_paid += 1
+            elif order.id not in to_mark:
+                to_mark[order.id] = refs[0]
+        else:
+            report.still_unpaid += 1
+            if order.paid and order.stripe_id in refs:
+                report.paid_mismatch += 1
+
+    if not to_mark:
+        return
+    if dry_run:
+        report.marked_paid += len(to_mark)
+        return
+
+    with transaction.atomic():
+        # re-read under lock so a concurrent webhook can't double-send the email
+        pending = list(
+            Order.objects.select_for_update()
+            .filter(id__in=to_mark, paid=False)
+            .only("id", "paid", "stripe_id")
+        )
+        now = timezone.now()
+        for order in pending:
+            order.paid = True
+            order.stripe_id = to_mark[order.id]
+            order.updated = now
+        Order.objects.bulk_update(pending, ["paid", "stripe_id", "updated"])
+        report.marked_paid += len(pending)
+        report.already_paid += len(to_mark) - len(pending)
+
+        for order in pending:
+            order_paid.send(sender=Order, order=order)
+            logger.info("Reconcile: queueing payment_completed task for order %s", order.id)
+            enqueue(payment_completed, order.id)
+
+
+def reconcile_payments(
+    since: int | None = None, page_size: int = 100, dry_run: bool = False
+) -> ReconcileReport:
+    """
+    Page through Stripe Checkout Sessions created since the stored cursor
+    (minus a lookback window, because sessions can be paid hours after they
+    were created) and mark any paid-but-unpaid-locally orders as paid.
+    """
+    report = ReconcileReport()
+    api_key = (settings.STRIPE_SECRET_KEY or "").strip()
+    if not api_key:
+        logger.info("Reconcile: STRIPE_SECRET_KEY not set, skipping")
+        return report
+    stripe.api_key = api_key
+    stripe.api_base = settings.STRIPE_API_BASE
+
+    cursor, _ = ReconciliationCursor.objects.get_or_create(name=CURSOR_NAME)
+    if since is None:
+        lookback = getattr(settings, "STRIPE_RECONCILE_LOOKBACK", 24 * 60 * 60)
+        since = max(cursor.last_created - lookback, 0)
+
+    newest = cursor.last_created
+    starting_after = None
+    while True:
+        params = {"limit": page_size, "created": {"gte": since}}
+        if starting_after:
+            params["starting_after"] = starting_after
+        with track_http("stripe", "checkout.session.list"):
+            page = stripe.checkout.Session.list(**params)
+        sessions = list(page["data"])
+        if not sessions:
+            break
+
+        report.pages += 1
+        report.sessions_scanned += len(sessions)
+        newest = max([newest] + [s.get("created") or 0 for s in sessions])
+        _reconcile_page(sessions, report, dry_run)
+
+        if not page.get("has_more"):
+            break
+        starting_after = sessions[-1]["id"]
+
+    if not dry_run:
+        cursor.last_created = newest
+        cursor.last_report = report.as_dict()
+        cursor.save(update_fields=["last_created", "last_report", "updated"])
+
+    logger.info("Reconcile finished: %s", report.as_dict())
+    return report
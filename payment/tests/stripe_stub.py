@@ -0,0 +1,60 @@
+"""
+Offline stand-in for the parts of the Stripe API the shop talks to.
+
+Sessions are plain dicts (Stripe objects behave like dicts too), listed
+newest-first with `starting_after` cursor pagination like the real API.
+"""
+import itertools
+import time
+from unittest.mock import patch
+
+import stripe
+
+_ids = itertools.count(1)
+
+
+def make_session(order_id=None, payment_status="paid", created=None, payment_intent="auto", **extra):
+    n = next(_ids)
+    session = {
+        "id": f"cs_test_{n}",
+        "object": "checkout.session",
+        "mode": "payment",
+        "created": created if created is not None else int(time.time()),
+        "payment_status": payment_status,
+        "payment_intent": f"pi_test_{n}" if payment_intent == "auto" else payment_intent,
+        "client_reference_id": str(order_id) if order_id is not None else None,
+        "metadata": {"order_id": str(order_id)} if order_id is not None else {},
+    }
+    session.update(extra)
+    return session
+
+
+class StripeStub:
+    def __init__(self, sessions=()):
+        self.sessions = list(sessions)
+        self.list_calls = []
+
+    def add(self, **kwargs):
+        session = make_session(**kwargs)
+        self.sessions.append(session)
+        return session
+
+    def list(self, limit=10, created=None, starting_after=None, **_):
+        self.list_calls.append({"limit": limit, "created": created, "starting_after": starting_after})
+        rows = sorted(self.sessions, key=lambda s: (s["created"], s["id"]), reverse=True)
+        if created and "gte" in created:
+            rows = [s for s in rows if s["created"] >= created["gte"]]
+        if starting_after:
+            ids = [s["id"] for s in rows]
+            rows = rows[ids.index(starting_after) + 1:]
+        return {"object": "list", "data": rows[:limit], "has_more": len(rows) > limit}
+
+    def retrieve(self, session_id, **_):
+        for s in self.sessions:
+            if s["id"] == session_id:
+                return s
+        raise stripe.error.InvalidRequestError(f"No such checkout.session: {session_id}", "id")
+
+    def patch(self):
+        """Patch stripe.checkout.Session so any module importing stripe hits the stub."""
+        return patch.multiple(stripe.checkout.Session, list=self.list, retrieve=self.retrieve)
@@ -0,0 +1,118 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order
+from outbox.models import OutboxMessage
+from payment.models import ReconciliationCursor
+from payment.reconcile import CURSOR_NAME, reconcile_payments
+
+from .stripe_stub import StripeStub
+
+
+def make_order(**kwargs):
+    defaults = dict(
+        first_name="A", last_name="B", email="a@example.com",
+        address="1 Street", postal_code="SW1A 1AA", city="London",
+    )
+    defaults.update(kwargs)
+    return Order.objects.create(**defaults)
+
+
+@override_settings(
+    STRIPE_SECRET_KEY="sk_test_123",
+    STRIPE_RECONCILE_LOOKBACK=3600,
+)
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.stub = StripeStub()
+        patcher = self.stub.patch()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_marks_unpaid_orders_paid_and_reports_drift(self):
+        missed = make_order()
+        done = make_order(paid=True, stripe_id="pi_done")
+        open_order = make_order()
+        s_missed = self.stub.add(order_id=missed.id)
+        self.stub.add(order_id=done.id, payment_intent="pi_done")
+        self.stub.add(order_id=open_order.id, payment_status="unpaid", payment_intent=None)
+        self.stub.add(order_id=999999)
+
+        report = reconcile_payments(page_size=2)
+
+        missed.refresh_from_db()
+        open_order.refresh_from_db()
+        self.assertTrue(missed.paid)
+        self.assertEqual(missed.stripe_id, s_missed["payment_intent"])
+        self.assertFalse(open_order.paid)
+        self.assertEqual(report.pages, 2)
+        self.assertEqual(report.sessions_scanned, 4)
+        self.assertEqual(report.marked_paid, 1)
+        self.assertEqual(report.already_paid, 1)
+        self.assertEqual(report.still_unpaid, 1)
+        self.assertEqual(report.unmatched, 1)
+        queued = OutboxMessage.objects.get()
+        self.assertEqual(queued.task_name, "payment.tasks.payment_completed")
+        self.assertEqual(queued.args, [missed.id])
+
+    def test_matches_on_stripe_id_when_reference_missing(self):
+        order = make_order(stripe_id="cs_known")
+        session = self.stub.add(payment_intent="pi_new")
+        session["id"] = "cs_known"
+
+        report = reconcile_payments()
+
+        order.refresh_from_db()
+        self.assertTrue(order.paid)
+        self.assertEqual(order.stripe_id, "pi_new")
+        self.assertEqual(report.matched, 1)
+
+    def test_one_order_lookup_per_page(self):
+        for _ in range(3):
+            self.stub.add(order_id=make_order(paid=True).id)
+        with CaptureQueriesContext(connection) as ctx:
+            report = reconcile_payments(page_size=1)
+        order_lookups = [q for q in ctx.captured_queries if 'FROM "orders_order"' in q["sql"]]
+        self.assertEqual(report.pages, 3)
+        self.assertEqual(len(order_lookups), 3)
+
+    def test_cursor_advances_with_lookback(self):
+        now = int(time.time())
+        self.stub.add(order_id=make_order().id, created=now - 10)
+        reconcile_payments()
+
+        cursor = ReconciliationCursor.objects.get(name=CURSOR_NAME)
+        self.assertEqual(cursor.last_created, now - 10)
+        self.assertEqual(cursor.last_report["marked_paid"], 1)
+
+        reconcile_payments()
+        self.assertEqual(self.stub.list_calls[-1]["created"], {"gte": now - 10 - 3600})
+
+    def test_dry_run_changes_nothing(self):
+        order = make_order()
+        self.stub.add(order_id=order.id)
+
+        report = reconcile_payments(dry_run=True)
+
+        order.refresh_from_db()
+        self.assertFalse(order.paid)
+        self.assertEqual(report.marked_paid, 1)
+        self.assertFalse(ReconciliationCursor.objects.exclude(last_created=0).exists())
+
+    def test_management_command_prints_report(self):
+        self.stub.add(order_id=make_order().id)
+        out = StringIO()
+        call_command("reconcile_payments", stdout=out)
+        self.assertIn("marked_paid: 1", out.getvalue())
+
+    @override_settings(STRIPE_SECRET_KEY="")
+    def test_skips_without_api_key(self):
+        self.stub.add(order_id=make_order().id)
+        report = reconcile_payments()
+        self.assertEqual(report.sessions_scanned, 0)
+        self.assertEqual(self.stub.list_calls, [])
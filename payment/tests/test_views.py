@@ -5,6 +5,7 @@ from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from orders.models import Order, OrderItem
+from outbox.models import OutboxMessage
 from shop.models import Category, Product, Team
 
 
@@ -131,10 +132,15 @@ class PaymentCompletedTests(TestCase):
         s["order_id"] = self.order.id
         s.save()
 
-    @patch("payment.views.send_paid_email")
+    def _queued_paid_emails(self):
+        return list(
+            OutboxMessage.objects.filter(task_name="payment.tasks.payment_completed")
+            .values_list("args", flat=True)
+        )
+
     @patch("payment.views.stripe.checkout.Session.retrieve")
     def test_completed_marks_paid_and_updates_stripe_id_when_webhook_not_yet_processed(
-        self, mock_retrieve, mock_send_email
+        self, mock_retrieve
     ):
         self._put_order_in_session()
         mock_retrieve.return_value = {
@@ -150,12 +156,11 @@ class PaymentCompletedTests(TestCase):
         self.order.refresh_from_db()
         self.assertTrue(self.order.paid)
         self.assertEqual(self.order.stripe_id, "pi_999")
-        mock_send_email.assert_called_once_with(self.order.id)
+        self.assertEqual(self._queued_paid_emails(), [[self.order.id]])
 
-    @patch("payment.views.send_paid_email")
     @patch("payment.views.stripe.checkout.Session.retrieve")
     def test_completed_recovers_order_when_no_session_order_id(
-        self, mock_retrieve, mock_send_email
+        self, mock_retrieve
     ):
         mock_retrieve.return_value = {
             "payment_status": "paid",
@@ -169,12 +174,11 @@ class PaymentCompletedTests(TestCase):
         self.order.refresh_from_db()
         self.assertTrue(self.order.paid)
         self.assertEqual(self.order.stripe_id, "pi_111")
-        mock_send_email.assert_called_once_with(self.order.id)
+        self.assertEqual(self._queued_paid_emails(), [[self.order.id]])
 
-    @patch("payment.views.send_paid_email")
     @patch("payment.views.stripe.checkout.Session.retrieve")
     def test_completed_does_not_send_email_again_if_already_paid(
-        self, mock_retrieve, mock_send_email
+        self, mock_retrieve
     ):
         self.order.paid = True
         self.order.stripe_id = "pi_existing"
@@ -192,7 +196,7 @@ class PaymentCompletedTests(TestCase):
         self.order.refresh_from_db()
         self.assertTrue(self.order.paid)
         self.assertEqual(self.order.stripe_id, "pi_existing")
-        mock_send_email.assert_not_called()
+        self.assertEqual(self._queued_paid_emails(), [])
 
     @patch("payment.views.stripe.checkout.Session.retrieve", side_effect=Exception("stripe down"))
     def test_completed_gracefully_renders_if_stripe_retrieve_fails(self, _mock_retrieve):
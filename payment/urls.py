@@ -1,12 +1,13 @@
 from django.urls import path
+from myshop.asyncviews import pick
 from . import views
-from .webhook import stripe_webhook 
+from .webhook import stripe_webhook, stripe_webhook_async
 
 app_name = 'payment'
 
 urlpatterns = [
-    path('process/', views.payment_process, name='process'),
-    path('completed/', views.payment_completed, name='completed'),
+    path('process/', pick(views.payment_process, views.payment_process_async), name='process'),
+    path('completed/', pick(views.payment_completed, views.payment_completed_async), name='completed'),
     path('canceled/', views.payment_canceled, name='canceled'),
-    path("webhook/", stripe_webhook, name="stripe-webhook"), 
+    path("webhook/", pick(stripe_webhook, stripe_webhook_async), name="stripe-webhook"),
 ]
\ No newline at end of file
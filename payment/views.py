@@ -1,95 +1,172 @@
+from datetime import timedelta
 from decimal import Decimal
 
-import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db import transaction
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils import timezone
 
+from myshop.asyncviews import arender
+from myshop.db_routers import use_primary
+from myshop.instrumentation import track_http
+from myshop.lazyimport import lazy_import
 from orders.models import Order
+from orders.signals import order_paid
+from outbox.relay import enqueue
 from .tasks import payment_completed as send_paid_email  # avoid name clash with view
 
+stripe = lazy_import("stripe")  # ~0.3s to import; only payment requests need it
 
+
+def _configure_stripe():
+    stripe.api_key = (settings.STRIPE_SECRET_KEY or "").strip()
+    stripe.api_base = settings.STRIPE_API_BASE
+    # Optional: lock API version
+    # stripe.api_version = settings.STRIPE_API_VERSION
+
+
+def _checkout_session_params(request, order) -> dict:
+    """Checkout Session for `order` (items must be prefetched with their products)."""
+    success_url = (
+        request.build_absolute_uri(reverse("payment:completed"))
+        + "?session_id={CHECKOUT_SESSION_ID}"
+    )
+    cancel_url = request.build_absolute_uri(reverse("payment:canceled"))
+    CURRENCY = getattr(settings, "STRIPE_CURRENCY", "gbp")
+
+    # Build line items
+    line_items = []
+    for item in order.items.all():
+        unit_amount = int(Decimal(item.price) * 100)  # pounds → pence
+        line_items.append(
+            {
+                "price_data": {
+                    "unit_amount": unit_amount,
+                    "currency": CURRENCY,
+                    "product_data": {"name": f"{item.product.name} ({item.size})" if item.size else item.product.name},
+                },
+                "quantity": item.quantity,
+            }
+        )
+
+    # Session data (include identifiers for webhook lookup)
+    params = {
+        "mode": "payment",
+        "line_items": line_items,
+        "success_url": success_url,
+        "cancel_url": cancel_url,
+        "client_reference_id": str(order.id),
+        "metadata": {"order_id": str(order.id)},
+    }
+    if order.reserved_until:
+        # close Checkout when the stock hold runs out (Stripe's minimum is 30 minutes)
+        earliest = timezone.now() + timedelta(minutes=31)
+        params["expires_at"] = int(max(order.reserved_until, earliest).timestamp())
+    return params
+
+
+def _stripe_reference(order, session) -> str | None:
+    """A stable Stripe reference to save early (PI id if available, else session id), if it changed."""
+    stripe_identifier = getattr(session, "payment_intent", None) or session.id
+    if stripe_identifier and stripe_identifier != order.stripe_id:
+        return stripe_identifier
+    return None
+
+
+def _process_context(order, **extra) -> dict:
+    return {"order": order, "STRIPE_PUBLISHABLE_KEY": settings.STRIPE_PUBLISHABLE_KEY, **extra}
+
+
+@use_primary()
 def payment_process(request):
     # Expect this to be set by orders.views.order_create
     order_id = request.session.get("order_id")
     if not order_id:
         return redirect("orders:order_create")
 
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.prefetch_related("items__product"), id=order_id)
 
     # Configure Stripe
-    stripe.api_key = (settings.STRIPE_SECRET_KEY or "").strip()
-    # Optional: lock API version
-    # stripe.api_version = settings.STRIPE_API_VERSION
+    _configure_stripe()
 
     if request.method == "POST":
-        success_url = (
-            request.build_absolute_uri(reverse("payment:completed"))
-            + "?session_id={CHECKOUT_SESSION_ID}"
-        )
-        cancel_url = request.build_absolute_uri(reverse("payment:canceled"))
-        CURRENCY = getattr(settings, "STRIPE_CURRENCY", "gbp")
-
-        # Build line items
-        line_items = []
-        for item in order.items.all():
-            unit_amount = int(Decimal(item.price) * 100)  # pounds → pence
-            line_items.append(
-                {
-                    "price_data": {
-                        "unit_amount": unit_amount,
-                        "currency": CURRENCY,
-                        "product_data": {"name": item.product.name},
-                    },
-                    "quantity": item.quantity,
-                }
-            )
-
-        # Session data (include identifiers for webhook lookup)
-        session_data = {
-            "mode": "payment",
-            "line_items": line_items,
-            "success_url": success_url,
-            "cancel_url": cancel_url,
-            "client_reference_id": str(order.id),
-            "metadata": {"order_id": str(order.id)},
-        }
-
+        session_data = _checkout_session_params(request, order)
         try:
-            session = stripe.checkout.Session.create(**session_data)
+            with track_http("stripe", "checkout.session.create"):
+                session = stripe.checkout.Session.create(**session_data)
 
-            # Save a stable Stripe reference early (PI id if available, else session id)
-            stripe_identifier = getattr(session, "payment_intent", None) or session.id
-            if stripe_identifier and stripe_identifier != order.stripe_id:
+            stripe_identifier = _stripe_reference(order, session)
+            if stripe_identifier:
                 order.stripe_id = stripe_identifier
                 order.save(update_fields=["stripe_id"])
 
         except Exception as e:
             # Show the error on the page
-            return render(
-                request,
-                "payment/process.html",
-                {
-                    "order": order,
-                    "stripe_error": str(e),
-                    "STRIPE_PUBLISHABLE_KEY": settings.STRIPE_PUBLISHABLE_KEY,
-                },
-            )
+            return render(request, "payment/process.html", _process_context(order, stripe_error=str(e)))
 
         # Only redirect after successful Session creation (POST branch)
         return redirect(session.url, code=303)
 
     # GET → render summary and a POST form button
-    return render(
-        request,
-        "payment/process.html",
-        {
-            "order": order,
-            "STRIPE_PUBLISHABLE_KEY": settings.STRIPE_PUBLISHABLE_KEY,
-        },
-    )
+    return render(request, "payment/process.html", _process_context(order))
+
+
+@use_primary()
+async def payment_process_async(request):
+    """payment_process for ASGI: the Stripe call is awaited instead of blocking a thread."""
+    order_id = await request.session.aget("order_id")
+    if not order_id:
+        return redirect("orders:order_create")
+
+    order = await aget_object_or_404(Order.objects.prefetch_related("items__product"), id=order_id)
+    _configure_stripe()
+
+    if request.method == "POST":
+        session_data = _checkout_session_params(request, order)  # items are prefetched: no queries
+        try:
+            with track_http("stripe", "checkout.session.create"):
+                session = await stripe.checkout.Session.create_async(**session_data)
 
+            stripe_identifier = _stripe_reference(order, session)
+            if stripe_identifier:
+                order.stripe_id = stripe_identifier
+                await order.asave(update_fields=["stripe_id"])
 
+        except Exception as e:
+            return await arender(request, "payment/process.html", _process_context(order, stripe_error=str(e)))
+
+        return redirect(session.url, code=303)
+
+    return await arender(request, "payment/process.html", _process_context(order))
+
+
+def _order_id_from(session_obj):
+    return session_obj.get("client_reference_id") or (session_obj.get("metadata") or {}).get("order_id")
+
+
+def _mark_paid_from_session(order, session_obj):
+    """Mark the order paid if the Checkout Session says it is (webhook not here yet)."""
+    if session_obj.get("payment_status") == "paid":
+        pi = session_obj.get("payment_intent")
+
+        with transaction.atomic():
+            # Conditional UPDATE so that this page and the webhook can't both
+            # see paid=False and both count the sale.
+            newly_paid = Order.objects.filter(pk=order.pk, paid=False).update(paid=True) == 1
+            order.paid = True
+            if pi and order.stripe_id != pi:
+                order.stripe_id = pi
+                order.save(update_fields=["stripe_id"])
+            if newly_paid:
+                order_paid.send(sender=Order, order=order)
+
+                # Send the "paid" email once (relayed after commit)
+                enqueue(send_paid_email, order.id)
+
+
+@use_primary()
 def payment_completed(request):
     """
     Thank-you page.
@@ -97,7 +174,7 @@ def payment_completed(request):
     Fallback: if we have a session_id, retrieve the Checkout Session from Stripe;
               if it's paid, mark the order as paid here too.
     """
-    stripe.api_key = (settings.STRIPE_SECRET_KEY or "").strip()
+    _configure_stripe()
 
     order = None
     order_id = request.session.get("order_id")
@@ -108,10 +185,9 @@ def payment_completed(request):
 
     if not order_id and session_id:
         try:
-            session_obj = stripe.checkout.Session.retrieve(session_id)
-            order_id = session_obj.get("client_reference_id") or (
-                session_obj.get("metadata") or {}
-            ).get("order_id")
+            with track_http("stripe", "checkout.session.retrieve"):
+                session_obj = stripe.checkout.Session.retrieve(session_id)
+            order_id = _order_id_from(session_obj)
         except Exception:
             order_id = None
 
@@ -124,25 +200,10 @@ def payment_completed(request):
     # Fallback: if webhook hasn’t updated yet, verify with Stripe and mark paid
     if order and not order.paid and session_id:
         try:
-            session_obj = session_obj or stripe.checkout.Session.retrieve(session_id)
-            if session_obj.get("payment_status") == "paid":
-                pi = session_obj.get("payment_intent")
-
-                changed = False
-                if not order.paid:
-                    order.paid = True
-                    changed = True
-                if pi and order.stripe_id != pi:
-                    order.stripe_id = pi
-                    changed = True
-                if changed:
-                    order.save(update_fields=["paid", "stripe_id"])
-
-                    # Send the "paid" email once
-                    if getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False) or getattr(settings, "DEBUG", False):
-                        send_paid_email(order.id)
-                    else:
-                        send_paid_email.delay(order.id)
+            if session_obj is None:
+                with track_http("stripe", "checkout.session.retrieve"):
+                    session_obj = stripe.checkout.Session.retrieve(session_id)
+            _mark_paid_from_session(order, session_obj)
         except Exception:
             # If Stripe retrieval fails, just render the page; webhook may still update later
             pass
@@ -150,5 +211,40 @@ def payment_completed(request):
     return render(request, "payment/completed.html", {"order": order})
 
 
+@use_primary()
+async def payment_completed_async(request):
+    """payment_completed for ASGI: Stripe lookups are awaited, the order read is async."""
+    _configure_stripe()
+
+    order = None
+    order_id = await request.session.aget("order_id")
+    session_id = request.GET.get("session_id")
+    session_obj = None
+
+    if not order_id and session_id:
+        try:
+            with track_http("stripe", "checkout.session.retrieve"):
+                session_obj = await stripe.checkout.Session.retrieve_async(session_id)
+            order_id = _order_id_from(session_obj)
+        except Exception:
+            order_id = None
+
+    if order_id:
+        order = await Order.objects.filter(id=order_id).afirst()
+
+    if order and not order.paid and session_id:
+        try:
+            if session_obj is None:
+                with track_http("stripe", "checkout.session.retrieve"):
+                    session_obj = await stripe.checkout.Session.retrieve_async(session_id)
+            # transaction.atomic() has no async form; this is one short UPDATE + outbox row
+            await sync_to_async(_mark_paid_from_session)(order, session_obj)
+        except Exception:
+            pass
+
+    return await arender(request, "payment/completed.html", {"order": order})
+
+
+@use_primary()
 def payment_canceled(request):
     return render(request, "payment/canceled.html")
@@ -1,62 +1,66 @@
 from __future__ import annotations
 
 import logging
-import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 
+from myshop.db_routers import use_primary
+from myshop.lazyimport import lazy_import
+from myshop.metrics import WEBHOOKS
 from orders.models import Order
+from orders.signals import order_paid
+from outbox.relay import enqueue
 from .tasks import payment_completed
 
+stripe = lazy_import("stripe")
+
 logger = logging.getLogger(__name__)
 
 
-def _finalize_order(order: Order, stripe_ref: str | None) -> None:
+def _finalize_order(order: Order, stripe_ref: str | None) -> str:
     """
     Mark order paid, persist Stripe reference, and trigger the email task once.
+    The task is recorded in the outbox in the same transaction as the update.
+    Returns the webhook outcome: "paid" or "already_paid".
     """
-    updates: list[str] = []
-    already_paid = order.paid
-
-    if not order.paid:
+    with transaction.atomic():
+        # Flip paid with a conditional UPDATE: of two deliveries of the same
+        # event racing here, exactly one gets a row back and sends order_paid.
+        newly_paid = Order.objects.filter(pk=order.pk, paid=False).update(paid=True) == 1
+        already_paid = not newly_paid
         order.paid = True
-        updates.append("paid")
-
-    # keep a stable Stripe reference (prefer payment_intent id)
-    if stripe_ref and order.stripe_id != stripe_ref:
-        order.stripe_id = stripe_ref
-        updates.append("stripe_id")
-
-    if updates:
-        order.save(update_fields=updates)
-        logger.info("Order %s updated: %s", order.id, ", ".join(updates))
-    else:
-        logger.info("Order %s already up-to-date (paid=%s, stripe_id=%s)", order.id, order.paid, order.stripe_id)
-
-    # Only send email once
-    if not already_paid:
-        logger.info("Triggering payment_completed task for order %s", order.id)
-        if getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False) or getattr(settings, "DEBUG", False):
-            payment_completed(order.id)
+
+        # keep a stable Stripe reference (prefer payment_intent id)
+        if stripe_ref and order.stripe_id != stripe_ref:
+            order.stripe_id = stripe_ref
+            order.save(update_fields=["stripe_id"])
+
+        if newly_paid:
+            logger.info("Order %s marked paid (stripe_id=%s)", order.id, order.stripe_id)
+            order_paid.send(sender=Order, order=order)
+            logger.info("Queueing payment_completed task for order %s", order.id)
+            enqueue(payment_completed, order.id)
         else:
-            payment_completed.delay(order.id)
+            logger.info("Order %s already paid (stripe_id=%s)", order.id, order.stripe_id)
+    return "already_paid" if already_paid else "paid"
 
 
-@csrf_exempt
-def stripe_webhook(request):
-    """
-    Verify Stripe signature and mark orders paid on success.
+def _done(event_type: str, outcome: str, status: int = 200) -> HttpResponse:
+    WEBHOOKS.labels(event_type, outcome).inc()
+    return HttpResponse(status=status)
 
-    Handles:
-      - checkout.session.completed (recommended path)
-      - payment_intent.succeeded (optional, extra safety when metadata carries order_id)
-    """
+
+def _verify(request):
+    """The verified Stripe event, or the error response to send back."""
     payload = request.body
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
     if not sig_header:
         logger.warning("Stripe webhook: missing signature header")
-        return HttpResponseBadRequest("Missing Stripe signature")
+        WEBHOOKS.labels("unknown", "missing_signature").inc()
+        return None, HttpResponseBadRequest("Missing Stripe signature")
 
     try:
         event = stripe.Webhook.construct_event(
@@ -66,11 +70,43 @@ def stripe_webhook(request):
         )
     except ValueError:
         logger.warning("Stripe webhook: invalid payload")
-        return HttpResponse(status=400)
+        return None, _done("unknown", "invalid_payload", status=400)
     except stripe.error.SignatureVerificationError:
         logger.warning("Stripe webhook: signature verification failed")
-        return HttpResponse(status=400)
+        return None, _done("unknown", "bad_signature", status=400)
+    return event, None
 
+
+@csrf_exempt
+@use_primary()
+def stripe_webhook(request):
+    """
+    Verify Stripe signature and mark orders paid on success.
+
+    Handles:
+      - checkout.session.completed (recommended path)
+      - payment_intent.succeeded (optional, extra safety when metadata carries order_id)
+    """
+    event, error = _verify(request)
+    if error is not None:
+        return error
+    return _handle_event(event)
+
+
+@csrf_exempt
+@use_primary()
+async def stripe_webhook_async(request):
+    """
+    stripe_webhook for ASGI. Verification is CPU-only; the order update runs
+    in the sync thread because transaction.atomic() has no async form.
+    """
+    event, error = _verify(request)
+    if error is not None:
+        return error
+    return await sync_to_async(_handle_event)(event)
+
+
+def _handle_event(event) -> HttpResponse:
     etype = event.get("type", "")
     data = event.get("data", {}).get("object", {})  # resource payload
     logger.info("Stripe webhook received: %s", etype)
@@ -80,25 +116,25 @@ def stripe_webhook(request):
         # Guard: only handle one-time payments
         if data.get("mode") != "payment":
             logger.info("Ignoring checkout.session.completed with mode=%s", data.get("mode"))
-            return HttpResponse(status=200)
+            return _done(etype, "ignored")
 
         if data.get("payment_status") == "paid":
             order_id = data.get("client_reference_id") or (data.get("metadata") or {}).get("order_id")
             if not order_id:
                 logger.warning("Stripe webhook: session missing order id")
-                return HttpResponse(status=200)
+                return _done(etype, "missing_order_id")
 
             try:
                 order = Order.objects.get(id=order_id)
             except Order.DoesNotExist:
                 logger.warning("Stripe webhook: Order %s not found", order_id)
-                return HttpResponse(status=200)
+                return _done(etype, "order_not_found")
 
             stripe_ref = data.get("payment_intent") or data.get("id")  # prefer PI, fallback to session id
             logger.info("Marking order %s as paid (ref=%s)", order_id, stripe_ref)
-            _finalize_order(order, stripe_ref)
-        else:
-            logger.info("checkout.session.completed with payment_status=%s (no action)", data.get("payment_status"))
+            return _done(etype, _finalize_order(order, stripe_ref))
+        logger.info("checkout.session.completed with payment_status=%s (no action)", data.get("payment_status"))
+        return _done(etype, "not_paid")
 
     # --- Path 2: PaymentIntent succeeded (extra safety if metadata used) ---
     elif etype == "payment_intent.succeeded":
@@ -109,14 +145,12 @@ def stripe_webhook(request):
                 order = Order.objects.get(id=order_id)
             except Order.DoesNotExist:
                 logger.warning("Stripe webhook (PI): Order %s not found", order_id)
-                return HttpResponse(status=200)
+                return _done(etype, "order_not_found")
             logger.info("Marking order %s as paid via PI (ref=%s)", order_id, data.get("id"))
-            _finalize_order(order, data.get("id"))
-        else:
-            logger.info("payment_intent.succeeded without order_id metadata (no action)")
-
-    else:
-        # Other events are acknowledged but ignored
-        logger.debug("Unhandled Stripe event: %s", etype)
+            return _done(etype, _finalize_order(order, data.get("id")))
+        logger.info("payment_intent.succeeded without order_id metadata (no action)")
+        return _done(etype, "missing_order_id")
 
-    return HttpResponse(status=200)
+    # Other events are acknowledged but ignored
+    logger.debug("Unhandled Stripe event: %s", etype)
+    return _done(etype, "ignored")
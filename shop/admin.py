@@ -1,6 +1,9 @@
 # shop/admin.py
+from django import forms
+from django.conf import settings
 from django.contrib import admin
-from .models import Category, Product, Team
+from . import inventory
+from .models import Category, Product, ProductVariant, Team
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
@@ -12,9 +15,76 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug']
     prepopulated_fields = {'slug': ('name',)}
 
+class ProductVariantForm(forms.ModelForm):
+    class Meta:
+        model = ProductVariant
+        fields = ['size', 'position', 'stock']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # post back the stock the editor was shown, to apply the edit as a delta
+        self.fields['stock'].show_hidden_initial = True
+
+    def stock_delta(self) -> int:
+        shown = self.data.get(self.add_initial_prefix('stock'), self.initial.get('stock', 0))
+        return self.cleaned_data['stock'] - int(shown)
+
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    form = ProductVariantForm
+    fields = ['size', 'position', 'stock', 'shards']
+    readonly_fields = ['shards']
+    extra = 0
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'price', 'available', 'created', 'updated']
-    list_filter = ['available', 'created', 'updated', 'category']
-    list_editable = ['price', 'available']
+    list_display = ['name', 'slug', 'price', 'available', 'drop_mode', 'created', 'updated']
+    list_filter = ['available', 'drop_mode', 'created', 'updated', 'category']
+    list_editable = ['price', 'available', 'drop_mode']
     prepopulated_fields = {'slug': ('name',)}
+    inlines = [ProductVariantInline]
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not ProductVariant:
+            return super().save_formset(request, form, formset, change)
+        # stock edits go in as deltas, so sales made while the form was open aren't overwritten
+        variants = formset.save(commit=False)
+        for variant in formset.deleted_objects:
+            variant.delete()
+        for variant in variants:
+            if variant.pk is None:
+                variant.save()
+            else:
+                variant.save(update_fields=['size', 'position'])
+        for variant_form in formset.initial_forms:
+            if 'stock' in variant_form.changed_data and variant_form not in formset.deleted_forms:
+                inventory.restock(variant_form.instance.pk, variant_form.stock_delta())
+
+@admin.register(ProductVariant)
+class ProductVariantAdmin(admin.ModelAdmin):
+    list_display = ['product', 'size', 'stock', 'shards', 'available']
+    list_select_related = ['product']
+    search_fields = ['product__name']
+    raw_id_fields = ['product']
+    readonly_fields = ['stock', 'shards']  # edited on the product page, as deltas
+    actions = ['spread_stock', 'gather_stock']
+
+    def get_queryset(self, request):
+        return inventory.with_available(super().get_queryset(request))
+
+    @admin.display(ordering='available')
+    def available(self, obj):
+        return obj.available
+
+    @admin.action(description="Spread stock over shard rows (hot sizes)")
+    def spread_stock(self, request, queryset):
+        shards = getattr(settings, "STOCK_SHARDS", 8)
+        for variant in queryset:
+            inventory.spread(variant, shards)
+        self.message_user(request, f"Spread {len(queryset)} sizes over {shards} shards each.")
+
+    @admin.action(description="Gather stock back onto one row")
+    def gather_stock(self, request, queryset):
+        for variant in queryset:
+            inventory.spread(variant, 0)
+        self.message_user(request, f"Gathered the stock of {len(queryset)} sizes.")
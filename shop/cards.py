@@ -0,0 +1,84 @@
+# shop/cards.py
+"""
+Product cards: the listing read model.
+
+A ProductCard row holds what a listing tile shows (name, price, product URL,
+thumbnail URL, category and team names) for every available product, so
+product_list and search read one narrow table with no joins. Rows come back
+as Card objects loaded with values_list(): no model instances, reverse() or
+storage URL calls per tile.
+
+The migration only creates the table (URLs and storage belong to the running
+site, not to a migration); fill it with `manage.py rebuild_product_cards`
+after migrating. Product saves keep it current from then on.
+"""
+from django.db import transaction
+
+from .models import Product, ProductCard
+
+FIELDS = ("product_id", "name", "price", "url", "image_url", "category_name", "team_name")
+
+
+class Card:
+    __slots__ = ("id", "name", "price", "url", "image_url", "category_name", "team_name")
+
+    def __init__(self, id, name, price, url, image_url, category_name, team_name):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.url = url
+        self.image_url = image_url
+        self.category_name = category_name
+        self.team_name = team_name
+
+    def get_absolute_url(self):
+        return self.url
+
+    def __repr__(self):
+        return f"<Card {self.id}: {self.name}>"
+
+
+def cards(queryset) -> list[Card]:
+    """Cards for a ProductCard queryset (filtered, ordered and sliced by the caller)."""
+    return [Card(*row) for row in queryset.values_list(*FIELDS)]
+
+
+def build_card(product: Product) -> ProductCard:
+    return ProductCard(
+        product_id=product.pk,
+        category_id=product.category_id,
+        team_id=product.team_id,
+        name=product.name,
+        price=product.price,
+        url=product.get_absolute_url(),
+        image_url=product.image.url if product.image else "",
+        category_name=product.category.name,
+        team_name=product.team.name if product.team_id else "",
+    )
+
+
+def refresh_card(product: Product):
+    if not product.available:
+        ProductCard.objects.filter(product_id=product.pk).delete()
+        return
+    card = build_card(product)
+    ProductCard.objects.update_or_create(
+        product_id=product.pk,
+        defaults={f.attname: getattr(card, f.attname) for f in ProductCard._meta.concrete_fields if not f.primary_key},
+    )
+
+
+def rebuild(batch_size: int = 2000) -> int:
+    """Replace every card from the products table; returns how many were written."""
+    products = Product.objects.filter(available=True).select_related("category", "team").order_by("pk")
+    written = 0
+    with transaction.atomic():
+        ProductCard.objects.all().delete()
+        batch = []
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(build_card(product))
+            if len(batch) == batch_size:
+                written += len(ProductCard.objects.bulk_create(batch))
+                batch = []
+        written += len(ProductCard.objects.bulk_create(batch))
+    return written
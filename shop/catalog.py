@@ -0,0 +1,113 @@
+# shop/catalog.py
+"""
+Cached reads behind the catalog pages: the category sidebar, the popular-teams
+strip and the first page of every listing.
+
+Keys carry a catalog generation (shop:catalog:<gen>:...). Any change to a
+Category, Team or Product bumps the generation (shop/signals.py), which
+orphans every cached listing at once; orphans simply expire. Deeper pages and
+team listings are cheap LIMIT/OFFSET reads of the product cards (shop/cards.py)
+and are not cached.
+
+Product pages cache the product itself under shop:product:<id>, dropped by
+shop/signals.py whenever that product is saved or deleted.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from myshop.cache import get_or_compute
+
+from .cards import Card, cards
+from .models import Category, Product, ProductCard, Team
+
+GENERATION_KEY = "shop:catalog:gen"
+
+
+def page_size() -> int:
+    return getattr(settings, "CATALOG_PAGE_SIZE", 48)
+
+
+def generation() -> int:
+    gen = cache.get(GENERATION_KEY)
+    if gen is None:
+        # seeded from the clock so an evicted counter never reuses an old generation
+        cache.add(GENERATION_KEY, int(time.time()), None)
+        gen = cache.get(GENERATION_KEY)
+    return gen
+
+
+def invalidate():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time()), None)
+
+
+def _cached(name, compute):
+    return get_or_compute(
+        f"shop:catalog:{generation()}:{name}",
+        compute,
+        timeout=getattr(settings, "CATALOG_CACHE_TIMEOUT", 300),
+    )
+
+
+def product_detail_key(product_id) -> str:
+    return f"shop:product:{product_id}"
+
+
+def product(product_id) -> Product | None:
+    """An available product with its category and team, or None."""
+    # A newly dropped shirt is a cold, hot key: computed once, not by every worker
+    return get_or_compute(
+        product_detail_key(product_id),
+        lambda: Product.objects.filter(id=product_id, available=True).select_related("category", "team").first(),
+        timeout=getattr(settings, "PRODUCT_CACHE_TIMEOUT", 300),
+    )
+
+
+def categories() -> list[Category]:
+    return _cached("categories", lambda: list(Category.objects.all()))
+
+
+def popular_teams() -> list[Team]:
+    # simple approach: distinct teams that have available products
+    return _cached(
+        "popular_teams",
+        lambda: list(Team.objects.filter(products__available=True).order_by("name").distinct()[:8]),
+    )
+
+
+def products_page(category=None, team=None, page=1) -> tuple[list[Card], bool]:
+    """One page of product cards and whether there is a next one (no COUNT)."""
+    rows = ProductCard.objects.all()
+    if category is not None:
+        rows = rows.filter(category=category)
+    if team is not None:
+        rows = rows.filter(team=team)
+    size = page_size()
+    start = (page - 1) * size
+    page_cards = cards(rows[start:start + size + 1])
+    return page_cards[:size], len(page_cards) > size
+
+
+def first_page(category=None) -> tuple[list[Card], bool]:
+    name = f"first_page:{category.pk}" if category is not None else "first_page:all"
+    return _cached(name, lambda: products_page(category))
+
+
+def listing(category=None, team=None, page=1) -> tuple[list[Card], bool]:
+    if page == 1 and team is None:
+        return first_page(category)
+    return products_page(category, team, page)
+
+
+def warm() -> int:
+    """Fill the sidebar, the teams strip and every category's first page; returns pages filled."""
+    cats = categories()
+    popular_teams()
+    first_page()
+    for category in cats:
+        first_page(category)
+    return len(cats) + 1
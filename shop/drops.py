@@ -0,0 +1,206 @@
+# shop/drops.py
+"""
+Virtual waiting room for limited-edition drops.
+
+A product with drop_mode on sits behind a first-come, first-served queue.
+A shopper gets a small holding page that polls drop_status; the first poll
+takes a ticket (an INCR on the drop's counter, kept in a signed cookie). The
+admission line advances at the product's drop_rate per minute, never past the
+last ticket issued, so a quiet spell doesn't bank admissions for the next
+rush. Once the line passes a ticket the shopper gets a signed admission
+cookie, good for DROP_ADMISSION_SECONDS and only alongside the ticket it was
+issued for; cart_add and order_create check the two signatures and nothing
+else, so they reject queue-jumpers without a query. Nothing is issued for a
+product that isn't a drop (yet), and fresh tickets are rate limited per IP
+(RATE_LIMITS["drop_ticket"]) so a client dropping its cookies can't stack
+up places in the line.
+
+Queue state lives in the default cache: on Redis the line moves in one Lua
+call shared by every worker; other backends use a process lock.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from myshop.cache import get_or_compute, redis_client
+from myshop.ratelimit import check
+
+from . import catalog
+from .models import Product
+
+TICKET_SALT = "shop.drops.ticket"
+PASS_SALT = "shop.drops.pass"
+
+# KEYS = issued counter, line state. ARGV = admissions per second, ttl. Returns {line, issued}.
+_ADVANCE = """
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, ttl = tonumber(ARGV[1]), tonumber(ARGV[2])
+local issued = tonumber(redis.call("GET", KEYS[1]) or "0")
+local state = redis.call("HMGET", KEYS[2], "line", "ts")
+local line = tonumber(state[1]) or 0
+local ts = tonumber(state[2]) or now
+line = math.min(issued, line + math.max(0, now - ts) * rate)
+redis.call("HSET", KEYS[2], "line", tostring(line), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[2], ttl)
+return {tostring(line), issued}
+"""
+
+_local_lock = threading.Lock()
+_now = time.time  # the local queue's clock (Redis uses its own TIME)
+
+
+def queue_seconds() -> int:
+    return getattr(settings, "DROP_QUEUE_SECONDS", 6 * 3600)
+
+
+def admission_seconds() -> int:
+    return getattr(settings, "DROP_ADMISSION_SECONDS", 20 * 60)
+
+
+def drop_rates() -> dict[int, int]:
+    """{product id: shoppers admitted per minute} for every product in drop mode."""
+    return get_or_compute(
+        f"shop:catalog:{catalog.generation()}:drops",
+        lambda: dict(Product.objects.filter(drop_mode=True).values_list("id", "drop_rate")),
+        timeout=getattr(settings, "CATALOG_CACHE_TIMEOUT", 300),
+    )
+
+
+def _issued_key(product_id) -> str:
+    return f"shop:drop:{product_id}:issued"
+
+
+def _line_key(product_id) -> str:
+    return f"shop:drop:{product_id}:line"
+
+
+def take_ticket(product_id) -> int:
+    key = _issued_key(product_id)
+    cache.add(key, 0, queue_seconds())
+    return cache.incr(key)
+
+
+def advance(product_id, per_minute: int) -> tuple[int, int]:
+    """Move the admission line on; returns (highest ticket admitted, tickets issued)."""
+    rate = max(per_minute, 1) / 60
+    redis = redis_client(cache)
+    if redis is not None:
+        line, issued = redis.eval(
+            _ADVANCE, 2, cache.make_key(_issued_key(product_id)), cache.make_key(_line_key(product_id)),
+            rate, queue_seconds(),
+        )
+        return math.floor(float(line)), int(issued)
+
+    with _local_lock:
+        now = _now()
+        issued = cache.get(_issued_key(product_id), 0)
+        line, ts = cache.get(_line_key(product_id)) or (0.0, now)
+        line = min(issued, line + max(0.0, now - ts) * rate)
+        cache.set(_line_key(product_id), (line, now), queue_seconds())
+    return math.floor(line), issued
+
+
+# --- cookies ---
+
+def ticket_cookie(product_id) -> str:
+    return f"drop_ticket_{product_id}"
+
+
+def pass_cookie(product_id) -> str:
+    return f"drop_pass_{product_id}"
+
+
+def _set_cookie(response, name, value, max_age):
+    response.set_cookie(
+        name, value, max_age=max_age, httponly=True, samesite="Lax",
+        secure=getattr(settings, "SESSION_COOKIE_SECURE", False),
+    )
+
+
+def read_ticket(request, product_id) -> int | None:
+    try:
+        value = signing.TimestampSigner(salt=TICKET_SALT).unsign(
+            request.COOKIES.get(ticket_cookie(product_id), ""), max_age=queue_seconds(),
+        )
+    except signing.BadSignature:
+        return None
+    pid, _, ticket = value.partition(":")
+    return int(ticket) if pid == str(product_id) else None
+
+
+def give_ticket(response, product_id, ticket: int):
+    value = signing.TimestampSigner(salt=TICKET_SALT).sign(f"{product_id}:{ticket}")
+    _set_cookie(response, ticket_cookie(product_id), value, queue_seconds())
+
+
+def is_admitted(request, product_id) -> bool:
+    """A current pass, issued for the ticket this shopper holds."""
+    try:
+        value = signing.TimestampSigner(salt=PASS_SALT).unsign(
+            request.COOKIES.get(pass_cookie(product_id), ""), max_age=admission_seconds(),
+        )
+    except signing.BadSignature:
+        return False
+    ticket = read_ticket(request, product_id)
+    return ticket is not None and value == f"{product_id}:{ticket}"
+
+
+def admit(response, product_id, ticket: int):
+    value = signing.TimestampSigner(salt=PASS_SALT).sign(f"{product_id}:{ticket}")
+    _set_cookie(response, pass_cookie(product_id), value, admission_seconds())
+
+
+def needs_admission(request, product_ids) -> list[int]:
+    """Which of `product_ids` are drops this shopper hasn't been admitted to."""
+    drops = drop_rates()
+    return [int(pid) for pid in product_ids if int(pid) in drops and not is_admitted(request, pid)]
+
+
+# --- responses ---
+
+def status(request, product_id) -> tuple[dict, int | None, bool]:
+    """
+    Where the shopper stands: (state, their ticket, whether it is new).
+    Only a ticket the line has reached comes back with admitted=True.
+    """
+    rate = drop_rates().get(product_id)
+    if rate is None:
+        # not a drop, not one yet, or our cached list is behind: no ticket, no pass
+        return {"admitted": False, "active": False}, None, False
+    rate = max(rate, 1)  # a drop set to 0/min still admits one a minute, as in advance()
+    ticket = read_ticket(request, product_id)
+    line, issued = advance(product_id, rate)
+    new = ticket is None or ticket > issued  # first poll, or a ticket from a queue that has since expired
+    if new:
+        throttled = check(request, "drop_ticket")
+        if throttled is not None:
+            return {"admitted": False, "active": True, "retry_seconds": int(throttled["Retry-After"])}, None, False
+        ticket = take_ticket(product_id)
+    if ticket <= line:
+        return {"admitted": True}, ticket, new
+    ahead = ticket - line - 1
+    state = {"admitted": False, "active": True, "ahead": ahead, "wait_seconds": math.ceil((ahead + 1) * 60 / rate)}
+    return state, ticket, new
+
+
+def waiting_room(product: Product) -> HttpResponse:
+    """The holding page: rendered without the request, so no session, user or cart lookups."""
+    html = render_to_string("shop/drop/waiting.html", {
+        "product_name": product.name,
+        "status_url": reverse("shop:drop_status", args=[product.id]),
+        "next_url": product.get_absolute_url(),
+        "poll_seconds": getattr(settings, "DROP_POLL_SECONDS", 5),
+    })
+    response = HttpResponse(html)
+    response["Cache-Control"] = "no-store"
+    return response
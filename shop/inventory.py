@@ -0,0 +1,163 @@
+# shop/inventory.py
+"""
+Size-level stock, changed only by conditional UPDATEs.
+
+    UPDATE shop_productvariant SET stock = stock - 2 WHERE id = 7 AND stock >= 2
+
+either takes the stock or touches no row, so two buyers can't both get the
+last shirt and nothing is locked beyond the statement's own transaction (no
+SELECT ... FOR UPDATE, nothing held while the shopper is on Stripe).
+
+A hot variant can have its stock spread over `shards` StockShard rows: a
+take starts at a random shard and moves on to the next when one runs dry, so
+concurrent buyers mostly update different rows. Stock left on the variant
+row itself is the last resort. A take never splits one line across rows, so
+a sharded variant can turn a buyer away with a few shirts scattered around;
+gather and re-spread it when stock runs low.
+
+A checkout takes all its lines at once with take_lines(): two statements
+whatever the size of the cart, one over the shard rows and one over the
+variant rows.
+"""
+from __future__ import annotations
+
+import random
+
+from django.db import connections, router, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ProductVariant, StockShard
+
+
+class OutOfStock(Exception):
+    def __init__(self, variant_id: int, quantity: int):
+        super().__init__(f"variant {variant_id}: {quantity} not available")
+        self.variant_id = variant_id
+        self.quantity = quantity
+
+
+def with_available(queryset):
+    """Annotate `available`: the variant row's stock plus its shards'."""
+    return queryset.annotate(available=F("stock") + Coalesce(Sum("stock_shards__stock"), Value(0)))
+
+
+def variants_for(product_id, with_product: bool = False) -> list[ProductVariant]:
+    """
+    A product's sizes in display order, each with `available` (one query).
+    `with_product` joins the product in, so a view that needs both makes one
+    query for a product with sizes.
+    """
+    variants = ProductVariant.objects.filter(product_id=product_id)
+    if with_product:
+        variants = variants.select_related("product")
+    return list(with_available(variants))
+
+
+def take(variant_id: int, quantity: int, shards: int = 0) -> int | None:
+    """
+    Take `quantity` of a variant. Returns the shard index it came from, or
+    None for the variant row; raises OutOfStock if no single row has enough.
+    """
+    if shards:
+        start = random.randrange(shards)
+        for offset in range(shards):
+            index = (start + offset) % shards
+            taken = StockShard.objects.filter(variant_id=variant_id, index=index, stock__gte=quantity).update(
+                stock=F("stock") - quantity
+            )
+            if taken:
+                return index
+    if ProductVariant.objects.filter(pk=variant_id, stock__gte=quantity).update(stock=F("stock") - quantity):
+        return None
+    raise OutOfStock(variant_id, quantity)
+
+
+def _need(column: str, lines: dict[int, int]) -> tuple[str, list[int]]:
+    """SQL for each line's quantity: CASE <column> WHEN <variant id> THEN <quantity> ... END."""
+    whens = " ".join("WHEN %s THEN %s" for _ in lines)
+    return f"CASE {column} {whens} END", [n for line in lines.items() for n in line]
+
+
+def take_lines(lines: dict[int, int]) -> dict[int, int | None]:
+    """
+    Take stock for several variants at once ({variant_id: quantity}).
+    Returns {variant_id: shard index, or None for the variant row}; raises
+    OutOfStock for the first line nothing could fill.
+
+    The first UPDATE takes each line from one of its variant's shards with
+    enough left (picked at random); the second takes the lines no shard
+    could fill from the variant rows. Both keep take()'s condition, so a
+    line loses if another checkout got there first, and RETURNING says
+    which lines were filled.
+    """
+    taken: dict[int, int | None] = {}
+    connection = connections[router.db_for_write(ProductVariant)]
+    shard, variant = StockShard._meta.db_table, ProductVariant._meta.db_table
+    qn = connection.ops.quote_name
+    ids = ", ".join(["%s"] * len(lines))
+
+    need, need_params = _need("variant_id", lines)
+    pick, pick_params = _need("v.id", lines)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {qn(shard)} SET stock = stock - {need} "
+            f"WHERE stock >= {need} AND id IN ("
+            f"SELECT (SELECT s.id FROM {qn(shard)} s WHERE s.variant_id = v.id AND s.stock >= {pick} "
+            "ORDER BY RANDOM() LIMIT 1) "
+            f"FROM {qn(variant)} v WHERE v.id IN ({ids})) "
+            f"RETURNING variant_id, {qn('index')}",
+            need_params + need_params + pick_params + list(lines),
+        )
+        taken.update(cursor.fetchall())
+
+        rest = {variant_id: quantity for variant_id, quantity in lines.items() if variant_id not in taken}
+        if rest:
+            need, need_params = _need("id", rest)
+            cursor.execute(
+                f"UPDATE {qn(variant)} SET stock = stock - {need} "
+                f"WHERE stock >= {need} AND id IN ({', '.join(['%s'] * len(rest))}) RETURNING id",
+                need_params + need_params + list(rest),
+            )
+            taken.update((variant_id, None) for (variant_id,) in cursor.fetchall())
+
+    for variant_id in sorted(lines):
+        if variant_id not in taken:
+            raise OutOfStock(variant_id, lines[variant_id])
+    return taken
+
+
+def put_back(variant_id: int, quantity: int, shard: int | None = None) -> None:
+    """Return stock to the row `take` got it from."""
+    if shard is not None:
+        if StockShard.objects.filter(variant_id=variant_id, index=shard).update(stock=F("stock") + quantity):
+            return
+        # the shards were gathered since; the variant row holds everything now
+    ProductVariant.objects.filter(pk=variant_id).update(stock=F("stock") + quantity)
+
+
+@transaction.atomic
+def spread(variant: ProductVariant, shards: int) -> None:
+    """
+    Move all of a variant's stock into `shards` shard rows (0 gathers it
+    back onto the variant row). Locks the variant's rows while it counts.
+    """
+    variant = ProductVariant.objects.select_for_update().get(pk=variant.pk)
+    rows = list(StockShard.objects.select_for_update().filter(variant=variant))
+    total = variant.stock + sum(row.stock for row in rows)
+    StockShard.objects.filter(variant=variant).delete()
+    if shards:
+        each, extra = divmod(total, shards)
+        StockShard.objects.bulk_create([
+            StockShard(variant=variant, index=i, stock=each + (1 if i < extra else 0)) for i in range(shards)
+        ])
+        variant.stock = 0
+    else:
+        variant.stock = total
+    variant.shards = shards
+    variant.save(update_fields=["stock", "shards"])
+
+
+def restock(variant_id: int, delta: int) -> None:
+    """Add (or with a negative delta, write off) stock on the variant row, never below zero."""
+    ProductVariant.objects.filter(pk=variant_id).update(stock=Greatest(F("stock") + delta, 0))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myshop.startup import profile_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Start a fresh interpreter, run django.setup() and load the URLconf, and "
+        "report where the import time went (python -X importtime, summarised)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=25, help="(default: 25)")
+        parser.add_argument(
+            "--sort",
+            choices=("cumulative", "self"),
+            default="cumulative",
+            help="cumulative includes a module's own imports (default: cumulative)",
+        )
+        parser.add_argument(
+            "--packages",
+            action="store_true",
+            help="Summarise by top-level package instead of listing modules.",
+        )
+        parser.add_argument(
+            "--no-urls",
+            action="store_true",
+            help="Stop after django.setup() (what a Celery worker pays) instead of also loading the URLconf.",
+        )
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=0,
+            help="Exit with an error if total import time is over this.",
+        )
+
+    def handle(self, *args, **options):
+        profile = profile_startup(load_urls=not options["no_urls"])
+
+        if options["packages"]:
+            self.stdout.write(f"{'package':<40}{'ms':>10}")
+            for package, ms in profile.by_package()[: options["top"]]:
+                self.stdout.write(f"{package:<40}{ms:>10.1f}")
+        else:
+            self.stdout.write(f"{'module':<60}{'self ms':>10}{'cumul. ms':>11}")
+            for row in profile.top(options["top"], key=options["sort"]):
+                self.stdout.write(
+                    f"{'  ' * row.depth + row.module:<60}{row.self_us / 1000:>10.1f}{row.cumulative_us / 1000:>11.1f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(profile.imports):,} modules imported in {profile.import_ms:.0f} ms; "
+            f"startup took {profile.wall_ms:.0f} ms"
+        ))
+        if options["budget_ms"] and profile.import_ms > options["budget_ms"]:
+            raise CommandError(f"Import time {profile.import_ms:.0f} ms is over the {options['budget_ms']:.0f} ms budget")
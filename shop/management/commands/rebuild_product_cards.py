@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import catalog
+from shop.cards import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product-card listing table from the products table, e.g. after "
+        "a bulk import or a change to product URLs or media storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="(default: 2000)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = rebuild(batch_size=options["batch_size"])
+        catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"{written:,} product cards in {time.perf_counter() - start:.1f}s"
+        ))
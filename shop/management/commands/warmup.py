@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myshop.warmup import STEPS, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile templates, open database and cache connections, parse the PDF "
+        "stylesheet and fill the catalog caches, reporting how long each took."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=[name for name, _ in STEPS],
+            help="Run just this step (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        steps = [s for s in STEPS if not options["only"] or s[0] in options["only"]]
+        report = warm_up(steps)
+
+        self.stdout.write(f"{'step':<12}{'ms':>10}  detail")
+        for step in report:
+            line = f"{step.name:<12}{step.ms:>10.1f}  {step.detail}"
+            self.stdout.write(line if step.ok else self.style.ERROR(line))
+
+        self.stdout.write(self.style.SUCCESS(f"warmed up in {sum(s.ms for s in report):.0f} ms"))
+        failed = [s.name for s in report if not s.ok]
+        if failed:
+            raise CommandError(f"warmup failed: {', '.join(failed)}")
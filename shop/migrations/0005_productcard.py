@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_team_product_team'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='shop.product')),
+                ('name', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('url', models.CharField(max_length=300)),
+                ('image_url', models.CharField(blank=True, max_length=500)),
+                ('category_name', models.CharField(max_length=200)),
+                ('team_name', models.CharField(blank=True, max_length=100)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.category')),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.team')),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['name'], name='shop_produc_name_6e0098_idx'), models.Index(fields=['category', 'name'], name='shop_produc_categor_9f0d4b_idx'), models.Index(fields=['team', 'name'], name='shop_produc_team_id_35d601_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_productcard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='drop_mode',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='drop_rate',
+            field=models.PositiveIntegerField(default=60, help_text='Shoppers admitted per minute in drop mode.'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:06
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_productvariant_stockshard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='drop_rate',
+            field=models.PositiveIntegerField(default=60, help_text='Shoppers admitted per minute in drop mode.', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -1,4 +1,5 @@
 # shop/models.py
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
@@ -51,6 +52,11 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     available = models.BooleanField(default=True)
+    # limited-edition release: shoppers queue in a waiting room (shop/drops.py)
+    drop_mode = models.BooleanField(default=False)
+    drop_rate = models.PositiveIntegerField(
+        default=60, validators=[MinValueValidator(1)], help_text="Shoppers admitted per minute in drop mode."
+    )
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -67,3 +73,66 @@ class Product(models.Model):
 
     def get_absolute_url(self):
         return reverse("shop:product_detail", args=[self.id, self.slug])
+
+
+class ProductVariant(models.Model):
+    """
+    A size of a product and the stock on hand. Stock is only ever changed by
+    conditional UPDATEs in shop/inventory.py; a hot variant can spread it
+    over `shards` StockShard rows so buyers don't all queue on this one.
+    """
+    product = models.ForeignKey(Product, related_name="variants", on_delete=models.CASCADE)
+    size = models.CharField(max_length=20)
+    position = models.PositiveSmallIntegerField(default=0, help_text="Sort order (S before M before L).")
+    stock = models.PositiveIntegerField(default=0)
+    shards = models.PositiveSmallIntegerField(
+        default=0, help_text="Stock shard rows in use; set by the spread/gather admin actions."
+    )
+
+    class Meta:
+        ordering = ["product_id", "position", "id"]
+        constraints = [models.UniqueConstraint(fields=["product", "size"], name="shop_variant_product_size")]
+
+    def __str__(self) -> str:
+        return f"{self.product} ({self.size})"
+
+
+class StockShard(models.Model):
+    """One slice of a hot variant's stock (see ProductVariant.shards)."""
+    variant = models.ForeignKey(ProductVariant, related_name="stock_shards", on_delete=models.CASCADE)
+    index = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["variant", "index"], name="shop_stockshard_variant_index")]
+
+    def __str__(self) -> str:
+        return f"{self.variant} #{self.index}"
+
+
+class ProductCard(models.Model):
+    """
+    Denormalised listing tile for an available product: everything a card
+    shows, with the URLs already resolved. Kept current by shop/signals.py;
+    `manage.py rebuild_product_cards` rebuilds it (e.g. after bulk imports).
+    """
+    product = models.OneToOneField(Product, primary_key=True, on_delete=models.CASCADE, related_name="card")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    team = models.ForeignKey(Team, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    url = models.CharField(max_length=300)
+    image_url = models.CharField(max_length=500, blank=True)
+    category_name = models.CharField(max_length=200)
+    team_name = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name"]),
+            models.Index(fields=["category", "name"]),
+            models.Index(fields=["team", "name"]),
+        ]
+
+    def __str__(self) -> str:
+        return self.name
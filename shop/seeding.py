@@ -0,0 +1,346 @@
+# shop/seeding.py
+"""
+Synthetic catalog/order data for performance work (manage.py seed_perf_data).
+
+Everything is driven by one random.Random(seed), so the same options give
+the same data. Popularity is Zipf-skewed: a few teams and products get most
+of the orders and a few customers place most of them, as in real shops.
+Rows are written with bulk_create in batches, one transaction per batch.
+
+Seeded rows are recognisable so they can be removed again: slugs start
+with "perf-", emails end in "@perf.example", session keys start with "perf".
+"""
+from __future__ import annotations
+
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from addresses.models import Address
+from orders import rollups
+from orders.models import DailySalesBreakdown, Order, OrderItem
+from .cards import build_card
+from .models import Category, Product, ProductCard, ProductVariant, StockShard, Team
+
+PREFIX = "perf"
+EMAIL_DOMAIN = "perf.example"
+TEAM_SUFFIX = f" ({PREFIX})"  # Team.name is unique; keep clear of real teams
+
+CITIES = [
+    "London", "Manchester", "Liverpool", "Birmingham", "Leeds", "Glasgow",
+    "Newcastle", "Bristol", "Sheffield", "Cardiff", "Nottingham", "Leicester",
+]
+CITY_WEIGHTS = [30, 12, 10, 9, 7, 6, 5, 5, 4, 4, 4, 4]
+FIRST_NAMES = ["Alex", "Sam", "Jamie", "Chris", "Jordan", "Taylor", "Morgan", "Casey", "Robin", "Charlie"]
+LAST_NAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies", "Evans", "Khan"]
+TOWNS = ["United", "City", "Rovers", "Athletic", "Wanderers", "Albion", "Town", "County", "Rangers", "Celtic"]
+PLACES = [
+    "North", "South", "East", "West", "Port", "Bridge", "Castle", "Mill", "Stone", "Brook",
+    "Green", "Forest", "Lake", "Ash", "Oak", "Elm", "Hill", "Vale", "Marsh", "Field",
+]
+KITS = ["Home", "Away", "Third", "Goalkeeper", "Training", "Anniversary"]
+OUTWARD = ["SW1A", "M1", "L1", "B33", "LS10", "G1", "NE1", "BS1", "S1", "CF10", "NG1", "LE1"]
+LETTERS = "ABDEFGHJLNPQRSTUWXYZ"
+
+
+@dataclass
+class SeedOptions:
+    teams: int = 2_000
+    categories: int = 40
+    products: int = 200_000
+    users: int = 20_000
+    orders: int = 1_000_000
+    max_items: int = 6
+    sessions: int = 50_000
+    guest_ratio: float = 0.3
+    paid_ratio: float = 0.85
+    skew: float = 1.1
+    days: int = 730
+    batch_size: int = 5_000
+    seed: int = 42
+
+
+@dataclass
+class SeedReport:
+    rows: dict = field(default_factory=dict)
+    seconds: dict = field(default_factory=dict)
+
+
+def zipf_weights(n: int, s: float) -> list[float]:
+    """Cumulative weights for random.choices: rank k gets weight 1/k**s."""
+    return list(itertools.accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+@contextmanager
+def _explicit_timestamps(*models):
+    """Let bulk_create keep our historical created/updated instead of now()."""
+    fields = [
+        f for model in models for f in model._meta.concrete_fields
+        if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def _postcode(rng) -> str:
+    return f"{rng.choice(OUTWARD)} {rng.randint(1, 9)}{rng.choice(LETTERS)}{rng.choice(LETTERS)}"
+
+
+class Seeder:
+    def __init__(self, options: SeedOptions, log=None):
+        self.opts = options
+        self.rng = random.Random(options.seed)
+        self.log = log or (lambda msg: None)
+        self.report = SeedReport()
+        # anchor dates to midnight so a re-run on the same day is identical
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _bulk(self, label, model, rows, **kwargs):
+        """bulk_create `rows` (any iterable) in batches; returns the saved objects."""
+        start = time.perf_counter()
+        saved = []
+        for batch in _batched(rows, self.opts.batch_size):
+            with transaction.atomic():
+                saved.extend(model.objects.bulk_create(batch, batch_size=self.opts.batch_size, **kwargs))
+            if len(saved) % (self.opts.batch_size * 20) < len(batch):
+                self.log(f"  {label}: {len(saved):,}")
+        elapsed = time.perf_counter() - start
+        self.report.rows[label] = self.report.rows.get(label, 0) + len(saved)
+        self.report.seconds[label] = round(self.report.seconds.get(label, 0) + elapsed, 2)
+        self.log(f"{label}: {len(saved):,} rows in {elapsed:.1f}s")
+        return saved
+
+    def run(self) -> SeedReport:
+        with _explicit_timestamps(Product, Order):
+            teams = self.seed_teams()
+            categories = self.seed_categories()
+            products = self.seed_products(categories, teams)
+            self.seed_product_cards(products)
+            users = self.seed_users()
+            self.seed_orders(users, products)
+        self.seed_sessions(products)
+        return self.report
+
+    # --- catalog ---
+
+    def seed_teams(self):
+        names = (f"{place} {town}" for place, town in itertools.product(PLACES, TOWNS))
+        teams = []
+        for i in range(self.opts.teams):
+            base = next(names, None) or f"{self.rng.choice(PLACES)} {self.rng.choice(TOWNS)}"
+            name = base if i < len(PLACES) * len(TOWNS) else f"{base} {i}"
+            teams.append(Team(name=name + TEAM_SUFFIX, slug=f"{PREFIX}-team-{i}"))
+        return self._bulk("teams", Team, teams)
+
+    def seed_categories(self):
+        return self._bulk("categories", Category, (
+            Category(name=f"League {i + 1}", slug=f"{PREFIX}-league-{i + 1}")
+            for i in range(self.opts.categories)
+        ))
+
+    def seed_products(self, categories, teams):
+        rng, opts = self.rng, self.opts
+        team_weights = zipf_weights(len(teams), opts.skew) if teams else None
+
+        def rows():
+            for i in range(opts.products):
+                team = rng.choices(teams, cum_weights=team_weights)[0] if teams else None
+                year = rng.randint(1970, 2024)
+                kit = rng.choice(KITS)
+                created = self.now - timedelta(days=rng.randint(0, opts.days))
+                yield Product(
+                    category=categories[i % len(categories)],
+                    team=team,
+                    name=f"{team.name.removesuffix(TEAM_SUFFIX) if team else 'Club'} {year} {kit} Shirt",
+                    slug=f"{PREFIX}-{i}-{year}-{kit.lower()}",
+                    description=f"{kit} shirt from the {year} season.",
+                    price=Decimal(rng.randrange(2499, 14999, 100)) / 100,
+                    available=rng.random() > 0.1,
+                    created=created,
+                    updated=created,
+                )
+
+        return self._bulk("products", Product, rows())
+
+    def seed_product_cards(self, products):
+        # bulk_create skips the post_save signal that keeps cards current
+        self._bulk("product cards", ProductCard, (build_card(p) for p in products if p.available))
+
+    # --- customers ---
+
+    def seed_users(self):
+        rng, opts = self.rng, self.opts
+        password = make_password(f"{PREFIX}-password")  # hashing once, not per user
+        User = get_user_model()
+        users = self._bulk("users", User, (
+            User(
+                username=f"{PREFIX}_user_{i}",
+                email=f"user{i}@{EMAIL_DOMAIN}",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=self.now - timedelta(days=rng.randint(0, opts.days)),
+            )
+            for i in range(opts.users)
+        ))
+
+        def addresses():
+            for user in users:
+                for n, label in enumerate(rng.sample(["Home", "Work", "Parents", "Holiday"], rng.randint(1, 3))):
+                    yield Address(
+                        user=user, name=label, line1=f"{rng.randint(1, 300)} {rng.choice(PLACES)} Road",
+                        city=rng.choices(CITIES, CITY_WEIGHTS)[0], postal_code=_postcode(rng),
+                        is_default=n == 0,
+                    )
+
+        self._bulk("addresses", Address, addresses())
+        return users
+
+    # --- orders ---
+
+    def seed_orders(self, users, products):
+        rng, opts = self.rng, self.opts
+        if not products:
+            return
+        product_weights = zipf_weights(len(products), opts.skew)
+        # a few customers place most of the orders
+        user_weights = zipf_weights(len(users), 0.8) if users else None
+        # more orders recently: sqrt skews the age towards 0
+        max_age = opts.days * 24 * 60 * 60
+
+        def order_rows(count):
+            for _ in range(count):
+                user = None
+                if users and rng.random() >= opts.guest_ratio:
+                    user = rng.choices(users, cum_weights=user_weights)[0]
+                created = self.now - timedelta(seconds=int(max_age * rng.random() ** 2))
+                paid = rng.random() < opts.paid_ratio
+                yield Order(
+                    first_name=user.first_name if user else rng.choice(FIRST_NAMES),
+                    last_name=user.last_name if user else rng.choice(LAST_NAMES),
+                    email=user.email if user else f"guest{rng.randrange(10**9)}@{EMAIL_DOMAIN}",
+                    address=f"{rng.randint(1, 300)} {rng.choice(PLACES)} Road",
+                    postal_code=_postcode(rng),
+                    city=rng.choices(CITIES, CITY_WEIGHTS)[0],
+                    created=created,
+                    updated=created,
+                    paid=paid,
+                    stripe_id=f"pi_{PREFIX}{rng.randrange(16**20):020x}" if paid else None,
+                    user=user,
+                )
+
+        def item_rows(orders):
+            for order in orders:
+                count = min(opts.max_items, 1 + int(rng.expovariate(1.2)))
+                chosen = {p.id: p for p in rng.choices(products, cum_weights=product_weights, k=count)}
+                for product in chosen.values():
+                    yield OrderItem(
+                        order=order, product=product, price=product.price,
+                        quantity=rng.choices((1, 2, 3, 4), (70, 20, 7, 3))[0],
+                    )
+
+        # orders and their items go in together, batch by batch, so memory stays flat
+        remaining = opts.orders
+        while remaining > 0:
+            n = min(remaining, opts.batch_size * 10)
+            orders = self._bulk("orders", Order, order_rows(n))
+            self._bulk("order items", OrderItem, item_rows(orders))
+            remaining -= n
+
+    # --- sessions ---
+
+    def seed_sessions(self, products):
+        rng, opts = self.rng, self.opts
+        store = SessionStore()
+        sample = products[: min(len(products), 1000)]
+
+        def rows():
+            for i in range(opts.sessions):
+                data = {}
+                if sample and rng.random() < 0.4:
+                    data["cart"] = {
+                        str(p.id): {"quantity": rng.randint(1, 3), "price": str(p.price)}
+                        for p in rng.sample(sample, min(len(sample), rng.randint(1, 4)))
+                    }
+                # a fifth of them already expired, like a table nobody has cleaned up
+                expires = self.now + timedelta(days=rng.randint(-30, 14) if rng.random() < 0.2 else rng.randint(1, 14))
+                yield Session(
+                    session_key=f"{PREFIX}{i:028d}",
+                    session_data=store.encode(data),
+                    expire_date=expires,
+                )
+
+        self._bulk("sessions", Session, rows())
+
+
+def _delete_in_batches(qs, batch_size: int) -> int:
+    """
+    QuerySet.delete() over successive pk ranges, so that no single delete
+    collects millions of rows. Callers delete children first, so the cascade
+    checks each batch makes find nothing.
+    """
+    deleted = 0
+    while batch := list(qs.order_by("pk").values_list("pk", flat=True)[:batch_size]):
+        qs.filter(pk__gte=batch[0], pk__lte=batch[-1]).delete()
+        deleted += len(batch)
+    return deleted
+
+
+def clear_seeded_data(log=None, batch_size: int = 5_000):
+    """
+    Delete everything a previous seed run created (see module docstring),
+    children before parents, and rebuild the sales rollups for the days the
+    seeded orders were on.
+    """
+    log = log or (lambda msg: None)
+    User = get_user_model()
+    seeded_orders = Order.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+    first_day = seeded_orders.aggregate(first=Min("created"))["first"]
+    products = Product.objects.filter(slug__startswith=f"{PREFIX}-")
+    categories = Category.objects.filter(slug__startswith=f"{PREFIX}-")
+    teams = Team.objects.filter(slug__startswith=f"{PREFIX}-")
+    for label, qs in [
+        ("order items", OrderItem.objects.filter(order__email__endswith=f"@{EMAIL_DOMAIN}")),
+        ("orders", seeded_orders),
+        ("product cards", ProductCard.objects.filter(product__in=products)),
+        ("stock shards", StockShard.objects.filter(variant__product__in=products)),
+        ("sizes", ProductVariant.objects.filter(product__in=products)),
+        ("products", products),
+        # rollup rows keep deleted teams and categories on purpose; seeded ones go
+        ("sales breakdown rows", DailySalesBreakdown.objects.filter(Q(category__in=categories) | Q(team__in=teams))),
+        ("categories", categories),
+        ("teams", teams),
+        ("addresses", Address.objects.filter(user__email__endswith=f"@{EMAIL_DOMAIN}")),
+        ("users", User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")),
+        ("sessions", Session.objects.filter(session_key__startswith=PREFIX)),
+    ]:
+        deleted = _delete_in_batches(qs, batch_size)
+        log(f"deleted {deleted:,} {label}")
+
+    if first_day is not None:
+        days = rollups.rebuild(since=timezone.localdate(first_day))
+        log(f"rebuilt {days:,} days of sales rollups")
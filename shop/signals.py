@@ -0,0 +1,48 @@
+# shop/signals.py
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import catalog
+from .cards import refresh_card
+from .models import Category, Product, ProductCard, Team
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product(sender, instance, using=None, **kwargs):
+    # once committed: a read between the write and the commit would cache the old
+    # row again. TieredCache broadcasts the delete so every process drops its L1 copy
+    key = catalog.product_detail_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key), using=using)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_card(instance)
+
+
+@receiver(post_save, sender=Category)
+def relabel_category_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ProductCard.objects.filter(category_id=instance.pk).update(category_name=instance.name)
+
+
+@receiver(post_save, sender=Team)
+def relabel_team_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ProductCard.objects.filter(team_id=instance.pk).update(team_name=instance.name)
+
+
+@receiver(pre_delete, sender=Team)
+def unlabel_team_cards(sender, instance, **kwargs):
+    # the cards' team FK is nulled by the delete itself
+    ProductCard.objects.filter(team_id=instance.pk).update(team_name="")
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_catalog(sender, using=None, **kwargs):
+    transaction.on_commit(catalog.invalidate, using=using)
@@ -0,0 +1,82 @@
+# shop/templatetags/fragments.py
+"""
+{% fragment "name" [vary_on ...] %} ... {% endfragment %}
+
+Caches the rendered block for FRAGMENT_CACHE[name] seconds; names not listed
+there render every time. The key holds the catalog generation (any catalog
+change refreshes every fragment), a digest of the block's own template source
+(a deploy that edits it starts afresh) and the vary_on values. Cached HTML is
+shared by every visitor, so keep per-user output (auth links, CSRF tokens,
+the cart) outside the block.
+"""
+import hashlib
+import time
+
+from django import template
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.safestring import mark_safe
+
+from myshop.instrumentation import current_stats
+from myshop.metrics import FRAGMENT_CACHE
+from shop import catalog
+
+register = template.Library()
+
+
+def _digest(*parts) -> str:
+    return hashlib.md5(":".join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+def fragment_key(name, source_digest, vary_on=()) -> str:
+    return f"fragment:{name}:{catalog.generation()}:{source_digest}:{_digest(*vary_on)}"
+
+
+class FragmentNode(template.Node):
+    def __init__(self, name, vary_on, nodelist):
+        self.name = name
+        self.vary_on = vary_on
+        self.nodelist = nodelist
+        self.source_digest = _digest(*(
+            node.token.contents for node in nodelist.get_nodes_by_type(template.Node) if hasattr(node, "token")
+        ))
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        timeout = getattr(settings, "FRAGMENT_CACHE", {}).get(name)
+        if timeout is None:
+            return self.nodelist.render(context)
+
+        cache = caches[getattr(settings, "FRAGMENT_CACHE_ALIAS", "default")]
+        key = fragment_key(name, self.source_digest, [var.resolve(context) for var in self.vary_on])
+        stats = current_stats()
+        cached = cache.get(key)
+        if cached is not None:
+            html, render_time = cached
+            FRAGMENT_CACHE.labels(name, "hit").inc()
+            if stats is not None:
+                stats.fragment_hits += 1
+                stats.fragment_saved += render_time
+            return mark_safe(html)
+
+        start = time.perf_counter()
+        html = self.nodelist.render(context)
+        cache.set(key, (str(html), time.perf_counter() - start), timeout)
+        FRAGMENT_CACHE.labels(name, "miss").inc()
+        if stats is not None:
+            stats.fragment_misses += 1
+        return html
+
+
+@register.tag
+def fragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' needs a fragment name")
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+        nodelist,
+    )
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from shop import catalog
+from shop.cards import Card, cards
+from shop.models import Category, Product, ProductCard, Team
+
+
+class ProductCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.category = Category.objects.create(name="Shirts", slug="shirts")
+        self.team = Team.objects.create(name="Rovers")
+        self.product = Product.objects.create(
+            category=self.category, team=self.team, name="Home Shirt", slug="home-shirt", price="49.99",
+        )
+
+    def card(self):
+        return ProductCard.objects.get(product=self.product)
+
+    def test_saving_a_product_refreshes_its_card(self):
+        card = self.card()
+        self.assertEqual(card.url, self.product.get_absolute_url())
+        self.assertEqual((card.category_name, card.team_name, card.image_url), ("Shirts", "Rovers", ""))
+
+        self.product.name = "Home Shirt 1995"
+        self.product.save()
+        self.assertEqual(self.card().name, "Home Shirt 1995")
+
+        self.product.available = False
+        self.product.save()
+        self.assertFalse(ProductCard.objects.exists())
+
+    def test_renames_and_deletes_reach_the_labels(self):
+        self.category.name = "Retro shirts"
+        self.category.save()
+        self.team.name = "Rovers FC"
+        self.team.save()
+        self.assertEqual((self.card().category_name, self.card().team_name), ("Retro shirts", "Rovers FC"))
+
+        self.team.delete()
+        self.assertEqual((self.card().team_id, self.card().team_name), (None, ""))
+
+    def test_listing_pages_read_cards_without_joins(self):
+        page = cards(ProductCard.objects.all())
+        self.assertIsInstance(page[0], Card)
+        self.assertFalse(hasattr(page[0], "__dict__"))
+
+        with self.assertNumQueries(1):
+            products, _ = catalog.products_page(self.category)
+        self.assertEqual([p.name for p in products], ["Home Shirt"])
+
+        response = self.client.get(reverse("shop:search"), {"q": "rovers"})
+        self.assertContains(response, 'href="%s"' % self.product.get_absolute_url())
+        self.assertContains(response, "no_image.png")
+
+    def test_rebuild_command(self):
+        ProductCard.objects.all().delete()
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed in bulk")
+
+        out = StringIO()
+        call_command("rebuild_product_cards", stdout=out)
+
+        self.assertIn("1 product cards", out.getvalue())
+        self.assertEqual(self.card().name, "Renamed in bulk")
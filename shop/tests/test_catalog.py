@@ -0,0 +1,117 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from myshop.warmup import warm_up
+from shop import catalog
+from shop.models import Category, Product, Team
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        self.scarves = Category.objects.create(name="Scarves", slug="scarves")
+        self.team = Team.objects.create(name="Rovers")
+        for i in range(3):
+            Product.objects.create(
+                category=self.shirts, team=self.team, name=f"Shirt {i}", slug=f"shirt-{i}", price="10.00",
+            )
+
+
+class CatalogCacheTests(CatalogTestCase):
+    def test_cached_reads_need_no_queries(self):
+        catalog.warm()
+        with self.assertNumQueries(0):
+            self.assertEqual([c.slug for c in catalog.categories()], ["scarves", "shirts"])
+            self.assertEqual([t.name for t in catalog.popular_teams()], ["Rovers"])
+            products, has_next = catalog.first_page(self.shirts)
+            self.assertEqual(len(products), 3)
+            self.assertFalse(has_next)
+            self.assertEqual(catalog.first_page(self.scarves), ([], False))
+
+    def test_any_catalog_change_moves_to_a_new_generation(self):
+        gen = catalog.generation()
+        catalog.warm()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(category=self.scarves, name="Scarf", slug="scarf", price="5.00")
+
+        self.assertGreater(catalog.generation(), gen)
+        self.assertEqual([p.name for p in catalog.first_page(self.scarves)[0]], ["Scarf"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Hats", slug="hats")
+        self.assertIn("hats", [c.slug for c in catalog.categories()])
+
+    def test_invalidation_waits_for_the_commit(self):
+        gen = catalog.generation()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.create(category=self.scarves, name="Scarf", slug="scarf", price="5.00")
+        self.assertEqual(catalog.generation(), gen)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog.generation(), gen)
+
+    def test_evicted_generation_restarts_from_the_clock(self):
+        cache.delete(catalog.GENERATION_KEY)
+        catalog.invalidate()
+        self.assertGreater(catalog.generation(), 1_000_000_000)
+
+    @override_settings(CATALOG_PAGE_SIZE=2)
+    def test_listing_pages(self):
+        self.assertEqual([p.name for p in catalog.listing(self.shirts)[0]], ["Shirt 0", "Shirt 1"])
+        products, has_next = catalog.listing(self.shirts, page=2)
+        self.assertEqual([p.name for p in products], ["Shirt 2"])
+        self.assertFalse(has_next)
+
+        response = self.client.get(reverse("shop:product_list"))
+        self.assertContains(response, "?page=2")
+        response = self.client.get(reverse("shop:product_list"), {"page": "2"})
+        self.assertContains(response, "Shirt 2")
+        self.assertNotContains(response, "Shirt 0")
+        self.assertContains(response, "?page=1")
+
+
+class WarmupTests(CatalogTestCase):
+    def test_warm_up_reports_every_step(self):
+        report = warm_up()
+        self.assertEqual([s.name for s in report], ["templates", "databases", "caches", "pdf css", "catalog"])
+        self.assertTrue(all(s.ok for s in report))
+        self.assertIn("listing pages", report[-1].detail)
+        with self.assertNumQueries(0):
+            catalog.first_page(self.shirts)
+
+    def test_a_failing_step_does_not_stop_the_rest(self):
+        def broken():
+            raise RuntimeError("no route to host")
+
+        with self.assertLogs("myshop.warmup", "ERROR"):
+            report = warm_up([("broken", broken), ("catalog", lambda: "ok")])
+        self.assertEqual([(s.name, s.ok) for s in report], [("broken", False), ("catalog", True)])
+        self.assertIn("no route to host", report[0].detail)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("warmup", only=["templates", "catalog"], stdout=out)
+        self.assertIn("templates", out.getvalue())
+        self.assertIn("warmed up in", out.getvalue())
+
+        with patch("shop.catalog.warm", side_effect=RuntimeError("down")), self.assertLogs("myshop.warmup", "ERROR"):
+            with self.assertRaises(CommandError):
+                call_command("warmup", only=["catalog"], stdout=StringIO())
+
+    def test_startup_hook_is_off_by_default(self):
+        from myshop.warmup import warm_up_on_startup
+
+        with patch("myshop.warmup.warm_up") as warm:
+            warm_up_on_startup()
+            warm.assert_not_called()
+            with self.settings(WARMUP_ON_STARTUP=True), self.assertLogs("myshop.warmup", "INFO"):
+                warm_up_on_startup()
+            warm.assert_called_once()
@@ -0,0 +1,145 @@
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from shop import drops
+from shop.models import Category, Product
+
+
+class DropTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        category = Category.objects.create(name="Retro", slug="retro")
+        self.drop = Product.objects.create(
+            category=category, name="1990 Away", slug="1990-away", price="80.00", drop_mode=True, drop_rate=60,
+        )
+        self.regular = Product.objects.create(category=category, name="Home", slug="home", price="40.00")
+        self.status_url = reverse("shop:drop_status", args=[self.drop.id])
+
+    def poll(self, client=None):
+        return (client or self.client).get(self.status_url).json()
+
+
+class WaitingRoomTests(DropTestCase):
+    def test_product_page_is_the_holding_page_until_admitted(self):
+        response = self.client.get(self.drop.get_absolute_url())
+        self.assertContains(response, "in the queue")
+        self.assertContains(response, self.status_url)
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertNotContains(self.client.get(self.regular.get_absolute_url()), "in the queue")
+
+    def test_fifo_admission_at_the_drop_rate(self):
+        first, second = self.client_class(), self.client_class()
+        with patch("shop.drops._now", return_value=1000.0):
+            self.assertEqual(self.poll(first), {"admitted": False, "active": True, "ahead": 0, "wait_seconds": 1})
+            with self.assertNumQueries(0):
+                self.assertEqual(self.poll(second), {"admitted": False, "active": True, "ahead": 1, "wait_seconds": 2})
+        with patch("shop.drops._now", return_value=1001.0):  # 60/min: one more shopper a second
+            self.assertFalse(self.poll(second)["admitted"])
+            self.assertTrue(self.poll(first)["admitted"])
+        with patch("shop.drops._now", return_value=1002.0):
+            self.assertTrue(self.poll(second)["admitted"])
+
+        # admitted shoppers see the product and can buy it
+        self.assertContains(first.get(self.drop.get_absolute_url()), "Add to cart")
+
+    def test_quiet_spells_do_not_bank_admissions(self):
+        with patch("shop.drops._now", return_value=1000.0):
+            self.poll()
+        with patch("shop.drops._now", return_value=5000.0):
+            self.assertTrue(self.poll()["admitted"])
+            late = [self.poll(self.client_class()) for _ in range(3)]
+        self.assertEqual([s["admitted"] for s in late], [False, False, False])
+
+    def test_a_zero_drop_rate_admits_one_a_minute(self):
+        Product.objects.filter(pk=self.drop.pk).update(drop_rate=0)
+        cache.clear()
+        with patch("shop.drops._now", return_value=1000.0):
+            self.poll()
+            response = self.client_class().get(self.status_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["wait_seconds"], 120)
+
+        self.drop.drop_rate = 0
+        with self.assertRaises(ValidationError):
+            self.drop.full_clean()
+
+    def test_forged_or_foreign_tickets_are_ignored(self):
+        self.client.cookies[drops.ticket_cookie(self.drop.id)] = "1"
+        self.client.cookies[drops.pass_cookie(self.drop.id)] = "forged"
+        self.assertFalse(self.poll()["admitted"])
+        self.assertFalse(drops.is_admitted(MagicMock(COOKIES={drops.pass_cookie(1): "x"}), 1))
+
+    def test_no_pass_for_products_that_are_not_live_drops(self):
+        Product.objects.filter(pk=self.drop.pk).update(drop_mode=False)
+        drops.catalog.invalidate()
+        for url in (self.status_url, reverse("shop:drop_status", args=[999])):
+            response = self.client.get(url)
+            self.assertEqual(response.json(), {"admitted": False, "active": False})
+            self.assertEqual(dict(response.cookies), {})
+
+    def test_a_pass_only_works_with_its_own_ticket(self):
+        with patch("shop.drops._now", side_effect=[1000.0, 1002.0]):
+            self.poll()
+            self.assertTrue(self.poll()["admitted"])
+        request = MagicMock(COOKIES={k: m.value for k, m in self.client.cookies.items()})
+        self.assertTrue(drops.is_admitted(request, self.drop.id))
+
+        # someone else's pass, presented with a different ticket (or none), is refused
+        other = self.client_class()
+        other.cookies[drops.pass_cookie(self.drop.id)] = self.client.cookies[drops.pass_cookie(self.drop.id)].value
+        self.assertNotContains(other.get(self.drop.get_absolute_url()), "Add to cart")
+        with patch("shop.drops._now", return_value=1002.0):
+            self.poll(other)  # takes ticket 2
+        self.assertNotContains(other.get(self.drop.get_absolute_url()), "Add to cart")
+
+    @override_settings(RATELIMIT_ENABLED=True, RATE_LIMITS={"drop_ticket": {"rate": "1/h", "burst": 2, "key": "ip"}})
+    def test_cookieless_clients_cannot_stack_tickets(self):
+        states = [self.poll(self.client_class()) for _ in range(3)]  # a fresh cookie jar each time
+        self.assertEqual([s.get("ahead") for s in states[:2]], [0, 1])
+        self.assertEqual(states[2]["retry_seconds"], 3600)
+        self.assertEqual(drops.take_ticket(self.drop.id), 3)  # the refused poll took no place
+
+    def test_redis_moves_the_line_in_one_script_call(self):
+        redis = MagicMock()
+        redis.eval.return_value = ["3.5", 10]
+        with patch("shop.drops.redis_client", return_value=redis):
+            self.assertEqual(drops.advance(self.drop.id, 30), (3, 10))
+        script, numkeys, issued_key, line_key, rate, ttl = redis.eval.call_args.args
+        self.assertEqual((numkeys, rate), (2, 0.5))
+        self.assertTrue(issued_key.endswith(f"shop:drop:{self.drop.id}:issued"))
+
+
+class AdmissionCheckTests(DropTestCase):
+    def test_cart_add_sends_queue_jumpers_to_the_waiting_room_without_a_query(self):
+        drops.drop_rates()  # cached, as it is after the first visitor
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("cart:cart_add", args=[self.drop.id]), {"quantity": 1})
+        self.assertRedirects(response, reverse("shop:drop_waiting", args=[self.drop.id]), target_status_code=200)
+
+    def test_admitted_shoppers_can_add_and_check_out(self):
+        with patch("shop.drops._now", side_effect=[1000.0, 1002.0]):
+            self.poll()
+            self.assertTrue(self.poll()["admitted"])
+        self.client.post(reverse("cart:cart_add", args=[self.drop.id]), {"quantity": 1})
+        self.assertIn(str(self.drop.id), self.client.session["cart"])
+        self.assertEqual(self.client.get(reverse("orders:order_create")).status_code, 200)
+
+        # waiting room by id sends admitted shoppers on to the product
+        self.assertRedirects(
+            self.client.get(reverse("shop:drop_waiting", args=[self.drop.id])), self.drop.get_absolute_url(),
+        )
+
+    def test_checkout_needs_a_current_admission(self):
+        with patch("shop.drops._now", side_effect=[1000.0, 1002.0]):
+            self.poll()
+            self.poll()
+        self.client.post(reverse("cart:cart_add", args=[self.drop.id]), {"quantity": 1})
+
+        with self.settings(DROP_ADMISSION_SECONDS=0):  # the pass has run out
+            response = self.client.get(reverse("orders:order_create"))
+        self.assertRedirects(response, reverse("shop:drop_waiting", args=[self.drop.id]), fetch_redirect_response=False)
@@ -0,0 +1,66 @@
+import re
+
+from django.core.cache import cache
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop import catalog
+from shop.models import Category, Team
+
+TEMPLATE = '{% load fragments %}{% fragment "sidebar" slug %}{{ label }}:{{ slug }}{% endfragment %}'
+
+
+@override_settings(FRAGMENT_CACHE={"sidebar": 60})
+class FragmentTagTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def render(self, source=TEMPLATE, **context):
+        return Template(source).render(Context(context))
+
+    def test_cached_until_the_catalog_changes(self):
+        self.assertEqual(self.render(label="a", slug="x"), "a:x")
+        self.assertEqual(self.render(label="b", slug="x"), "a:x")
+        self.assertEqual(self.render(label="b", slug="y"), "b:y")  # vary_on
+
+        catalog.invalidate()
+        self.assertEqual(self.render(label="b", slug="x"), "b:x")
+
+    def test_editing_the_template_changes_the_key(self):
+        self.render(label="a", slug="x")
+        edited = TEMPLATE.replace("{{ label }}:", "{{ label }}=")
+        self.assertEqual(self.render(edited, label="b", slug="x"), "b=x")
+
+    def test_unlisted_fragments_are_not_cached(self):
+        with self.settings(FRAGMENT_CACHE={}):
+            self.render(label="a", slug="x")
+            self.assertEqual(self.render(label="b", slug="x"), "b:x")
+
+    def test_needs_a_name(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% load fragments %}{% fragment %}{% endfragment %}")
+
+
+@override_settings(PERF_SAMPLE_RATE=1.0)
+class FragmentServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        Category.objects.create(name="Shirts", slug="shirts")
+        Team.objects.create(name="Rovers")
+
+    def fragment_timing(self):
+        timing = self.client.get(reverse("shop:product_list"))["Server-Timing"]
+        match = re.search(r'frag-saved;dur=([\d.]+);desc="(\d+) hits, (\d+) misses"', timing)
+        return float(match.group(1)), int(match.group(2)), int(match.group(3))
+
+    def test_reports_the_render_time_saved(self):
+        saved, hits, misses = self.fragment_timing()
+        self.assertEqual((saved, hits), (0.0, 0))
+        self.assertEqual(misses, 3)  # header, sidebar, popular teams
+
+        saved, hits, misses = self.fragment_timing()
+        self.assertEqual((hits, misses), (3, 0))
+        self.assertGreater(saved, 0)
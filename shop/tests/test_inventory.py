@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from shop import inventory
+from shop.models import Category, Product, ProductVariant, StockShard
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.product = Product.objects.create(category=category, name="Home", slug="home", price="50.00")
+        self.medium = ProductVariant.objects.create(product=self.product, size="M", stock=3)
+
+    def stock(self, variant):
+        return inventory.with_available(ProductVariant.objects.filter(pk=variant.pk)).get().available
+
+    def test_take_is_one_conditional_update(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(inventory.take(self.medium.id, 2))
+        with self.assertRaises(inventory.OutOfStock) as raised:
+            inventory.take(self.medium.id, 2)
+        self.assertEqual((raised.exception.variant_id, raised.exception.quantity), (self.medium.id, 2))
+        self.assertEqual(self.stock(self.medium), 1)
+
+        inventory.put_back(self.medium.id, 2)
+        self.assertEqual(self.stock(self.medium), 3)
+
+    def test_spread_and_gather(self):
+        self.medium.stock = 10
+        self.medium.save()
+        inventory.spread(self.medium, 4)
+
+        self.assertEqual(
+            list(StockShard.objects.filter(variant=self.medium).values_list("index", "stock")),
+            [(0, 3), (1, 3), (2, 2), (3, 2)],
+        )
+        self.medium.refresh_from_db()
+        self.assertEqual((self.medium.stock, self.medium.shards), (0, 4))
+        self.assertEqual(self.stock(self.medium), 10)
+
+        inventory.spread(self.medium, 0)
+        self.medium.refresh_from_db()
+        self.assertEqual((self.medium.stock, self.medium.shards), (10, 0))
+        self.assertFalse(StockShard.objects.exists())
+
+    def test_sharded_takes_move_on_when_a_shard_runs_dry(self):
+        self.medium.stock = 4
+        self.medium.save()
+        inventory.spread(self.medium, 2)
+
+        with patch("shop.inventory.random.randrange", return_value=1):
+            self.assertEqual(inventory.take(self.medium.id, 2, shards=2), 1)
+            self.assertEqual(inventory.take(self.medium.id, 2, shards=2), 0)  # shard 1 is empty
+            with self.assertRaises(inventory.OutOfStock):
+                inventory.take(self.medium.id, 1, shards=2)
+
+        inventory.put_back(self.medium.id, 2, shard=1)
+        self.assertEqual(StockShard.objects.get(variant=self.medium, index=1).stock, 2)
+
+    def test_put_back_after_a_gather_lands_on_the_variant(self):
+        inventory.spread(self.medium, 2)
+        shard = inventory.take(self.medium.id, 1, shards=2)
+        inventory.spread(self.medium, 0)
+        inventory.put_back(self.medium.id, 1, shard=shard)
+        self.assertEqual(self.stock(self.medium), 3)
+
+    def test_restock_never_goes_negative(self):
+        inventory.restock(self.medium.id, 5)
+        self.assertEqual(self.stock(self.medium), 8)
+        inventory.restock(self.medium.id, -20)
+        self.assertEqual(self.stock(self.medium), 0)
+
+    def test_product_page_offers_sizes_in_stock(self):
+        ProductVariant.objects.create(product=self.product, size="XL", stock=0, position=5)
+        response = self.client.get(self.product.get_absolute_url())
+        self.assertEqual([v.size for v in response.context["sizes"]], ["M", "XL"])
+        self.assertEqual(list(response.context["cart_product_form"].fields["variant"].choices), [(self.medium.id, "M")])
+
+        ProductVariant.objects.filter(pk=self.medium.pk).update(stock=0)
+        self.assertContains(self.client.get(self.product.get_absolute_url()), "Sold out")
+
+
+class VariantAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.product = Product.objects.create(category=category, name="Home", slug="home", price="50.00")
+        self.medium = ProductVariant.objects.create(product=self.product, size="M", stock=3)
+
+    def test_stock_edits_apply_as_deltas(self):
+        url = reverse("admin:shop_product_change", args=[self.product.id])
+        form = {
+            "category": self.product.category_id, "name": "Home", "slug": "home", "price": "50.00",
+            "available": "on", "drop_rate": 60,
+            "variants-TOTAL_FORMS": 1, "variants-INITIAL_FORMS": 1,
+            "variants-0-id": self.medium.id, "variants-0-product": self.product.id,
+            "variants-0-size": "M", "variants-0-position": 1, "variants-0-stock": 10,
+            "initial-variants-0-stock": 3,
+        }
+        ProductVariant.objects.filter(pk=self.medium.pk).update(stock=1)  # two sold while the form was open
+
+        self.assertEqual(self.client.post(url, form).status_code, 302)
+
+        self.medium.refresh_from_db()
+        self.assertEqual((self.medium.stock, self.medium.position), (8, 1))
+
+    def test_spread_action(self):
+        self.client.post(reverse("admin:shop_productvariant_changelist"), {
+            "action": "spread_stock", "_selected_action": [self.medium.id],
+        })
+        self.medium.refresh_from_db()
+        self.assertEqual((self.medium.shards, StockShard.objects.filter(variant=self.medium).count()), (8, 8))
@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from orders import rollups
+from orders.models import DailySales, DailySalesBreakdown, Order, OrderItem
+from shop import inventory
+from shop.models import Category, Product, ProductCard, ProductVariant, StockShard, Team
+from shop.seeding import clear_seeded_data
+
+SMALL = dict(teams=20, categories=3, products=200, users=30, orders=300, sessions=40, batch_size=50)
+
+
+def seed(**options):
+    call_command("seed_perf_data", stdout=StringIO(), **{**SMALL, **options})
+
+
+class SeedPerfDataTests(TestCase):
+    def test_creates_requested_volumes(self):
+        seed()
+        self.assertEqual(Team.objects.count(), 20)
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 200)
+        self.assertEqual(ProductCard.objects.count(), Product.objects.filter(available=True).count())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(Session.objects.count(), 40)
+        self.assertGreaterEqual(OrderItem.objects.count(), 300)
+        self.assertTrue(User.objects.filter(addresses__isnull=False).exists())
+        # historical dates, not all "now"
+        self.assertGreater(Order.objects.dates("created", "day").count(), 30)
+
+    def test_order_items_are_skewed_towards_popular_products(self):
+        seed()
+        counts = list(
+            OrderItem.objects.values("product").annotate(n=Count("id")).order_by("-n").values_list("n", flat=True)
+        )
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+    def test_same_seed_same_data_and_clear_keeps_real_rows(self):
+        cat = Category.objects.create(name="Real", slug="real")
+        Product.objects.create(category=cat, name="Real shirt", slug="real-shirt", price="10.00")
+
+        seed(seed=7)
+        first = list(Product.objects.filter(slug__startswith="perf-").order_by("slug").values_list("name", "price"))
+        seed(seed=7, clear=True)
+        second = list(Product.objects.filter(slug__startswith="perf-").order_by("slug").values_list("name", "price"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertTrue(Product.objects.filter(slug="real-shirt").exists())
+
+    def test_clear_removes_sizes_and_rollups_of_seeded_rows(self):
+        cat = Category.objects.create(name="Real", slug="real")
+        shirt = Product.objects.create(category=cat, name="Real shirt", slug="real-shirt", price="10.00")
+        real_size = ProductVariant.objects.create(product=shirt, size="M", stock=4)
+        real_order = Order.objects.create(
+            first_name="ann", last_name="lee", email="ann@example.com",
+            address="1 Street", postal_code="sw1a1aa", city="London", paid=True,
+        )
+        OrderItem.objects.create(order=real_order, product=shirt, price="10.00", quantity=2)
+
+        seed()
+        for product in Product.objects.filter(slug__startswith="perf-")[:10]:
+            variant = ProductVariant.objects.create(product=product, size="M", stock=8)
+            inventory.spread(variant, 2)
+        rollups.rebuild()
+        self.assertGreater(DailySales.objects.count(), 1)
+
+        clear_seeded_data(batch_size=7)
+
+        self.assertEqual(list(ProductVariant.objects.all()), [real_size])
+        self.assertFalse(StockShard.objects.exists())
+        self.assertEqual(list(Product.objects.all()), [shirt])
+        self.assertEqual(list(Order.objects.all()), [real_order])
+        self.assertFalse(User.objects.exists())
+        self.assertEqual(list(DailySalesBreakdown.objects.values_list("category_id", "units")), [(cat.id, 2)])
+        self.assertEqual(list(DailySales.objects.values_list("orders", "units")), [(1, 2)])
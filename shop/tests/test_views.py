@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
@@ -41,6 +42,7 @@ class ProductListViewTests(TestCase):
 
 class ProductDetailViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         cat = Category.objects.create(name="Liverpool FC", slug="liverpool-fc")
         team = Team.objects.create(name="Liverpool")
         self.p = Product.objects.create(
@@ -1,14 +1,19 @@
 # shop/urls.py
 from django.urls import path
+from myshop.asyncviews import pick
 from . import views
 
+product_list = pick(views.product_list, views.product_list_async)
+
 app_name = "shop"
 
 urlpatterns = [
-    path("product/<int:id>/<slug:slug>/", views.product_detail, name="product_detail"),
-    path("team/<slug:team_slug>/", views.product_list, name="product_list_by_team"),  
+    path("product/<int:id>/<slug:slug>/", pick(views.product_detail, views.product_detail_async), name="product_detail"),
+    path("team/<slug:team_slug>/", product_list, name="product_list_by_team"),  
     path("contact/", views.contact, name="contact"),
-    path("search/", views.search, name="search"),
-    path("", views.product_list, name="product_list"),
-    path("<slug:category_slug>/", views.product_list, name="product_list_by_category"),  
+    path("search/", pick(views.search, views.search_async), name="search"),
+    path("drop/<int:id>/", views.drop_waiting, name="drop_waiting"),
+    path("drop/<int:id>/status/", views.drop_status, name="drop_status"),
+    path("", product_list, name="product_list"),
+    path("<slug:category_slug>/", product_list, name="product_list_by_category"),  
 ]
@@ -1,13 +1,20 @@
 # shop/views.py
-from django.shortcuts import get_object_or_404, render, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, get_object_or_404, render, redirect
 from django.conf import settings
 from django.contrib import messages
-from django.core.mail import send_mail
 from .forms import ContactForm
 from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import never_cache
 
 from cart.forms import CartAddProductForm
-from .models import Category, Product, Team
+from mailer.dispatch import queue_mail
+from myshop.asyncviews import arender
+from myshop.ratelimit import ratelimit
+from . import catalog, drops, inventory
+from .cards import cards
+from .models import Category, Product, ProductCard, Team
 
 
 def home(request):
@@ -21,24 +28,19 @@ def contact(request):
             email = form.cleaned_data["email"]
             message = form.cleaned_data["message"]
 
-            subject = f"Contact form message from {name}"
-            body = (
-                f"From: {name} <{email}>\n\n"
-                f"Message:\n{message}"
-            )
-
             # who receives the email (set your address here)
             to_email = getattr(settings, "DEFAULT_FROM_EMAIL", None) or getattr(settings, "EMAIL_HOST_USER", None)
             if not to_email:
                 # fallback: show message but don't error
                 messages.warning(request, "Email settings not configured; message not sent. (Set DEFAULT_FROM_EMAIL or EMAIL_HOST_USER)")
             else:
-                send_mail(
-                    subject=subject,
-                    message=body,
+                # queued, never sent inside the request; the mail worker drains it
+                queue_mail(
+                    "contact",
+                    {"name": name, "email": email, "message": message},
+                    [to_email],
                     from_email=to_email,   # use a verified sender (e.g., your SMTP user)
-                    recipient_list=[to_email],
-                    fail_silently=False,
+                    reply_to=[email],
                 )
                 messages.success(request, "Thanks! Your message has been sent.")
 
@@ -49,71 +51,132 @@ def contact(request):
     return render(request, "shop/contact.html", {"form": form})
 
 
+def _page_number(request) -> int:
+    try:
+        return max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        return 1
+
+
+def _listing_context(category, team, page):
+    """Sidebar, teams strip and product page; the first pages come from the catalog cache."""
+    products, has_next = catalog.listing(category, team, page)
+    return {
+        "category": category,
+        "team": team,
+        "categories": catalog.categories(),
+        "products": products,
+        "popular_teams": catalog.popular_teams(),
+        "page": page,
+        "has_next": has_next,
+    }
+
+
 def product_list(request, category_slug=None, team_slug=None):
     """
-    List products, optionally filtered by category or team.
+    List products, optionally filtered by category or team, a page at a time.
     Also provides a small set of popular teams for quick filtering.
     """
     category = None
     team = None
 
-    # Base queryset
-    products_qs = (
-        Product.objects.filter(available=True)
-        .select_related("category", "team")
-    )
-
     # Optional filters
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
-        products_qs = products_qs.filter(category=category)
 
     if team_slug:
         team = get_object_or_404(Team, slug=team_slug)
-        products_qs = products_qs.filter(team=team)
 
-    # Popular teams (simple approach: distinct teams that have available products)
-    popular_teams = (
-        Team.objects.filter(products__available=True)
-        .order_by("name")
-        .distinct()[:8]
-    )
+    context = _listing_context(category, team, _page_number(request))
+    return render(request, "shop/product/list.html", context)
 
-    context = {
-        "category": category,
-        "team": team,
-        "categories": Category.objects.all(),
-        "products": products_qs,
-        "popular_teams": popular_teams,
+
+async def product_list_async(request, category_slug=None, team_slug=None):
+    """product_list for ASGI: filters through the async ORM, the cached catalog in a thread."""
+    category = await aget_object_or_404(Category, slug=category_slug) if category_slug else None
+    team = await aget_object_or_404(Team, slug=team_slug) if team_slug else None
+    context = await sync_to_async(_listing_context)(category, team, _page_number(request))
+    return await arender(request, "shop/product/list.html", context)
+
+
+def _sizes_context(sizes) -> dict:
+    in_stock = [variant for variant in sizes if variant.available > 0]
+    return {
+        "sizes": sizes,
+        "sold_out": bool(sizes) and not in_stock,
+        "cart_product_form": CartAddProductForm(variants=in_stock),
     }
-    return render(request, "shop/product/list.html", context)
 
 
 def product_detail(request, id, slug):
-    product = get_object_or_404(Product, id=id, slug=slug, available=True)
-    cart_product_form = CartAddProductForm()
+    product = catalog.product(id)
+    if product is None or product.slug != slug:
+        raise Http404("No Product matches the given query.")
+    if product.drop_mode and not drops.is_admitted(request, id):
+        return drops.waiting_room(product)
     return render(
         request,
         "shop/product/detail.html",
-        {
-            "product": product,
-            "cart_product_form": cart_product_form,
-        },
+        {"product": product, **_sizes_context(inventory.variants_for(id))},
     )
 
-def search(request):
-    q = (request.GET.get("q") or "").strip()
-    products = Product.objects.none()
 
-    if q:
-        products = Product.objects.filter(
-            Q(name__icontains=q) |
-            Q(description__icontains=q) |
-            Q(category__name__icontains=q) |
-            Q(team__name__icontains=q)
-        ).filter(available=True).select_related("category", "team")
+async def product_detail_async(request, id, slug):
+    # the cache client is sync; a hit is a memory lookup, a miss one query
+    product = await sync_to_async(catalog.product)(id)
+    if product is None or product.slug != slug:
+        raise Http404("No Product matches the given query.")
+    if product.drop_mode and not drops.is_admitted(request, id):
+        return drops.waiting_room(product)
+    sizes = await sync_to_async(inventory.variants_for)(id)  # stock isn't cached: it changes with every sale
+    return await arender(
+        request,
+        "shop/product/detail.html",
+        {"product": product, **_sizes_context(sizes)},
+    )
+
+
+def drop_waiting(request, id):
+    """The holding page by id alone, where cart_add and order_create send queue-jumpers."""
+    product = catalog.product(id)
+    if product is None:
+        raise Http404("No Product matches the given query.")
+    if not product.drop_mode or drops.is_admitted(request, id):
+        return redirect(product)
+    return drops.waiting_room(product)
+
+
+@never_cache
+def drop_status(request, id):
+    """Polled by the holding page; cache and cookies only, never the database."""
+    state, ticket, new = drops.status(request, id)
+    response = JsonResponse(state)
+    if new:
+        drops.give_ticket(response, id, ticket)
+    if state["admitted"]:
+        drops.admit(response, id, ticket)
+    return response
 
-    categories = Category.objects.all()
+
+def _search_queryset(q):
+    if not q:
+        return Product.objects.none()
+    return Product.objects.filter(
+        Q(name__icontains=q) |
+        Q(description__icontains=q) |
+        Q(category__name__icontains=q) |
+        Q(team__name__icontains=q)
+    ).filter(available=True).select_related("category", "team")
+
+
+def _search_cards(q):
+    return cards(ProductCard.objects.filter(product_id__in=_search_queryset(q).values("id")))
+
+
+@ratelimit("search")
+def search(request):
+    q = (request.GET.get("q") or "").strip()
+    products = _search_cards(q)
 
     return render(
         request,
@@ -121,6 +184,20 @@ def search(request):
         {
             "q": q,
             "products": products,
-            "categories": categories,
+            "categories": catalog.categories(),
         },
-    )
\ No newline at end of file
+    )
+
+
+@ratelimit("search")
+async def search_async(request):
+    q = (request.GET.get("q") or "").strip()
+    return await arender(
+        request,
+        "shop/search.html",
+        {
+            "q": q,
+            "products": await sync_to_async(_search_cards)(q),
+            "categories": await sync_to_async(catalog.categories)(),
+        },
+    )